@@ -0,0 +1,363 @@
+"""
+Map-reduce AI analysis of fetched remarks.
+Remarks are split into chunks that fit a token budget, each chunk is summarized
+by the LLM concurrently (the number of calls in flight backs off when the
+provider rate-limits us) and the partial summaries are reduced into one themed
+report, in several rounds if they don't fit one prompt. Backends are pluggable:
+OpenAIBackend talks to the chat completions API and LocalBackend is an offline
+stand-in for tests and benchmarks (FDBK_AI_BACKEND=local).
+
+Model answers are cached on disk (FDBK_AI_CACHE_DIR, default
+~/.fdbckfndr/ai_cache) keyed by a hash of the prompt version, model and chunk
+contents. Chunk boundaries are content-defined, so re-analyzing a report, or one
+that overlaps an earlier one, only pays for the chunks that changed.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from intercom_http import backoff_delay
+
+# Bump when the prompts change so cached chunk results aren't reused
+PROMPT_VERSION = "2"
+DEFAULT_MODEL = os.environ.get("FDBK_OPENAI_MODEL", "gpt-4o-mini")
+# Prompt tokens per chunk; leaves room for instructions and the answer in a 128k context
+CHUNK_TOKENS = int(os.environ.get("FDBK_AI_CHUNK_TOKENS", "6000"))
+MAX_CONCURRENT_CALLS = int(os.environ.get("FDBK_AI_MAX_CONCURRENCY", "4"))
+MAP_MAX_TOKENS = 400
+REDUCE_MAX_TOKENS = 1200
+MAX_RETRIES = 5
+AI_CACHE_DIR = os.environ.get("FDBK_AI_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".fdbckfndr", "ai_cache")
+# Cached answers older than this are dropped when the cache is opened
+AI_CACHE_MAX_AGE_DAYS = float(os.environ.get("FDBK_AI_CACHE_DAYS", "90"))
+# Assumed tokens per remark when picking how often content-defined chunk boundaries occur
+TYPICAL_REMARK_TOKENS = 40
+
+REPORT_SECTIONS = ("Overall sentiment, Top themes (ranked, with approximate counts), Actionable insights, "
+                   "Notable quotes or outliers")
+# Near-duplicate remarks are sent once, prefixed with how many there were
+WEIGHT_NOTE = "A line starting with [xN] stands for N near-identical remarks; weight it accordingly. "
+MAP_PROMPT = ("You are analyzing customer feedback remarks left on support conversations (Intercom ratings 1-5). "
+              + WEIGHT_NOTE +
+              "For the remarks below, list the main themes with a rough count of remarks for each, the overall "
+              "sentiment, and concrete, actionable issues. Be concise; use bullet points.")
+REDUCE_PROMPT = ("You are combining partial analyses of customer feedback remarks, each covering a different slice of "
+                 f"the same report. Merge them into one report with these sections: {REPORT_SECTIONS}. Merge duplicate "
+                 "themes and add up their counts.")
+# Small reports fit one chunk and go straight to the final report
+REPORT_PROMPT = ("You are analyzing customer feedback remarks left on support conversations (Intercom ratings 1-5). "
+                 + WEIGHT_NOTE +
+                 f"Write a report with these sections: {REPORT_SECTIONS}.")
+
+
+class RateLimited(Exception):
+    """The backend asked us to slow down; retry_after is in seconds when the provider said"""
+
+    def __init__(self, message="", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English)"""
+    return math.ceil(len(text) / 4) + 1
+
+
+def _is_boundary(text, divisor):
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % divisor == 0
+
+
+def group_by_budget(texts, budget):
+    """Split texts into consecutive groups of at most budget tokens (oversized texts are truncated)"""
+    groups, current, used = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if tokens > budget:
+            text = text[:budget * 4]
+            tokens = budget
+        if current and used + tokens > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def chunk_remarks(remarks, budget=CHUNK_TOKENS):
+    """Remarks as one-line strings, in chunks of at most budget tokens
+
+    A chunk also ends after any remark whose hash hits a fixed divisor, so the
+    boundaries depend on content rather than position: adding or removing a few
+    remarks only changes the chunks around them, and the rest stay cacheable.
+    """
+    divisor = max(2, budget // (2 * TYPICAL_REMARK_TOKENS))
+    chunks = []
+    current = []
+    for remark in remarks:
+        line = " ".join(str(remark).split())
+        if not line:
+            continue
+        current.append(line)
+        if _is_boundary(line, divisor):
+            chunks.extend(group_by_budget(current, budget))
+            current = []
+    if current:
+        chunks.extend(group_by_budget(current, budget))
+    return chunks
+
+
+def weighted_lines(weighted):
+    """Remark lines for (text, count) pairs, marking near-duplicate counts"""
+    return [f"[x{count}] {text}" if count > 1 else text for text, count in weighted]
+
+
+class OpenAIBackend:
+    """Chat completions via the openai package"""
+    name = "openai"
+
+    def __init__(self, api_key, model=DEFAULT_MODEL):
+        from openai import OpenAI
+        self.model = model
+        self.cache_id = f"openai:{model}"
+        # Retries are ours, so rate limits feed the concurrency limiter
+        self.client = OpenAI(api_key=api_key, max_retries=0)
+
+    def complete(self, system, prompt, max_tokens):
+        import openai
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+                max_tokens=max_tokens,
+                temperature=0.3,
+            )
+        except openai.RateLimitError as e:
+            retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+            raise RateLimited(str(e), float(retry_after) if retry_after else None)
+        return response.choices[0].message.content.strip()
+
+
+class LocalBackend:
+    """Offline stand-in: counts frequent words in remarks, and adds up those counts when reducing"""
+    name = "local"
+    STOPWORDS = {"the", "and", "for", "that", "this", "with", "was", "you", "are", "but", "not", "have",
+                 "they", "were", "very", "just", "about", "from"}
+
+    cache_id = "local"
+
+    def __init__(self, delay=0.0):
+        # Simulated per-call latency in seconds
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def complete(self, system, prompt, max_tokens):
+        time.sleep(self.delay)
+        with self._lock:
+            self.calls += 1
+        if system is MAP_PROMPT or system is REPORT_PROMPT:
+            remarks = prompt.split("\n", 1)[-1].lower()
+            words = Counter(word for word in re.findall(r"[a-z']{3,}", remarks) if word not in self.STOPWORDS)
+        else:
+            # Reducing: merge the "- word: count" lines of the partial analyses
+            words = Counter()
+            for word, count in re.findall(r"^- ([^:\n]+): (\d+)$", prompt, re.MULTILINE):
+                words[word] += int(count)
+        lines = [f"- {word}: {count}" for word, count in words.most_common(8)]
+        return "Themes (local backend):\n" + "\n".join(lines)
+
+
+def backend_from_env(api_key=None):
+    """LocalBackend when FDBK_AI_BACKEND=local, otherwise OpenAI; raises ValueError without a key"""
+    if os.environ.get("FDBK_AI_BACKEND", "").lower() == "local":
+        return LocalBackend(float(os.environ.get("FDBK_AI_LOCAL_DELAY", "0")))
+    api_key = api_key or os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        raise ValueError("No OpenAI API key. Set OPENAI_API_KEY, or FDBK_AI_BACKEND=local for offline analysis.")
+    return OpenAIBackend(api_key)
+
+
+class AnalysisCache:
+    """Model answers on disk, one small JSON file per prompt hash"""
+
+    def __init__(self, directory=None, max_age_days=AI_CACHE_MAX_AGE_DAYS):
+        self.directory = directory or AI_CACHE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune(max_age_days)
+
+    @staticmethod
+    def key_for(model, system, prompt, max_tokens):
+        identity = json.dumps([PROMPT_VERSION, model, system, prompt, max_tokens], ensure_ascii=False)
+        return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self.path(key), "r", encoding="utf-8") as f:
+                return json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, text):
+        path = self.path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": PROMPT_VERSION, "created_at": time.time(), "text": text}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def prune(self, max_age_days):
+        cutoff = time.time() - max_age_days * 86400
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class AdaptiveLimiter:
+    """Concurrency cap that halves on rate limits and creeps back up on success"""
+
+    def __init__(self, limit):
+        self.max_limit = limit
+        self.limit = limit
+        self.active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def throttled(self):
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+    def succeeded(self):
+        with self._cond:
+            self._successes += 1
+            if self.limit < self.max_limit and self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+
+class AnalysisPipeline:
+    """Chunk, summarize chunks in parallel, then reduce into one report"""
+
+    def __init__(self, backend, emit=print, chunk_tokens=CHUNK_TOKENS, concurrency=MAX_CONCURRENT_CALLS, cache=None):
+        self.backend = backend
+        # Optional AnalysisCache; identical prompts are answered from it without a model call
+        self.cache = cache
+        self.cache_hits = 0
+        self.emit = emit
+        self.chunk_tokens = chunk_tokens
+        self.concurrency = concurrency
+        self.limiter = AdaptiveLimiter(concurrency)
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+
+    def _call(self, system, prompt, max_tokens):
+        if self.cache is None:
+            return self._call_model(system, prompt, max_tokens)
+        key = AnalysisCache.key_for(self.backend.cache_id, system, prompt, max_tokens)
+        cached = self.cache.get(key)
+        if cached is not None:
+            with self._calls_lock:
+                self.cache_hits += 1
+            return cached
+        result = self._call_model(system, prompt, max_tokens)
+        self.cache.put(key, result)
+        return result
+
+    def _call_model(self, system, prompt, max_tokens):
+        attempt = 0
+        while True:
+            try:
+                with self.limiter:
+                    result = self.backend.complete(system, prompt, max_tokens)
+                self.limiter.succeeded()
+                with self._calls_lock:
+                    self.calls += 1
+                return result
+            except RateLimited as e:
+                if attempt >= MAX_RETRIES:
+                    raise
+                self.limiter.throttled()
+                delay = backoff_delay(attempt, e.retry_after)
+                self.emit(f"⏳ 🤖 Rate limited, retrying in {delay:.1f}s (max {self.limiter.limit} calls at once)")
+                time.sleep(delay)
+                attempt += 1
+
+    def summarize_chunk(self, chunk):
+        prompt = "Feedback remarks, one per line:\n" + "\n".join(chunk)
+        return self._call(MAP_PROMPT, prompt, MAP_MAX_TOKENS)
+
+    def map_chunks(self, chunks):
+        """Partial summaries, in chunk order"""
+        done = 0
+        lock = threading.Lock()
+
+        def run(chunk):
+            nonlocal done
+            summary = self.summarize_chunk(chunk)
+            with lock:
+                done += 1
+                self.emit(("CURRENT_ACTIVITY", f"🤖 Analyzed {done}/{len(chunks)} chunks"))
+            return summary
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ai-chunk") as executor:
+            return list(executor.map(run, chunks))
+
+    def _reduce_group(self, partials, max_tokens):
+        prompt = "\n\n".join(f"Partial analysis {i}:\n{text}" for i, text in enumerate(partials, 1))
+        return self._call(REDUCE_PROMPT, prompt, max_tokens)
+
+    def reduce(self, partials):
+        """Merge partial summaries, in rounds while they don't fit one prompt"""
+        while True:
+            groups = group_by_budget(partials, self.chunk_tokens)
+            if len(groups) == 1 or len(groups) == len(partials):
+                return self._reduce_group(partials, REDUCE_MAX_TOKENS)
+            self.emit(f"🤖 Reducing {len(partials)} partial analyses in {len(groups)} groups...")
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ai-reduce") as executor:
+                partials = list(executor.map(lambda group: self._reduce_group(group, MAP_MAX_TOKENS), groups))
+
+    def analyze(self, remarks):
+        """The final themed report for a list of remark strings"""
+        started = time.monotonic()
+        chunks = chunk_remarks(remarks, self.chunk_tokens)
+        if not chunks:
+            return "No remarks to analyze."
+        self.emit(f"🤖 Analyzing {sum(map(len, chunks))} remarks in {len(chunks)} chunk{'s' if len(chunks) != 1 else ''} "
+                  f"({self.backend.name}, up to {self.concurrency} at once)...")
+        if len(chunks) == 1:
+            report = self._call(REPORT_PROMPT, "Feedback remarks, one per line:\n" + "\n".join(chunks[0]), REDUCE_MAX_TOKENS)
+        else:
+            partials = self.map_chunks(chunks)
+            self.emit(("CURRENT_ACTIVITY", "🤖 Writing the final report..."))
+            report = self.reduce(partials)
+        reused = f", {self.cache_hits} answers reused from cache" if self.cache_hits else ""
+        self.emit(f"✅ 🤖 Analysis done in {time.monotonic() - started:.1f}s with {self.calls} model calls{reused}.")
+        return report
@@ -4,11 +4,31 @@ This is a separate web version - the desktop app (win8.py) remains unchanged.
 """
 import streamlit as st
 import requests
-import json
+import copy
+import os
+import sys
+import time
 import pandas as pd
 from datetime import datetime, timedelta
-from deep_translator import GoogleTranslator
-import time
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+import insights
+import metrics
+
+from async_engine import AsyncFetchEngine, EventLoopThread
+from fetch_engine import (ALL_RATINGS, FetchEngine, describe_preview, describe_progress, describe_ratings,
+                          format_duration, normalize_ratings)
+from checkpoints import CheckpointStore, make_run_query, run_key_for
+from intercom_http import INTERCOM_API_BASE, send_with_retry
+from jobs import JobRunner
+from scheduler import PRIORITY_INTERACTIVE, RequestScheduler, user_key_for_token
+from rollups import compute_rollups, csat_label, name_lookup, scorecard_rows
+from sampling import SampleEstimator, describe_estimate
+from search import RemarkIndex
+from timings import STAGE_LABELS, ordered_stages
+from trends import TrendStore, trend_scope
+from watch import WATCH_INTERVAL_SECONDS, FetchWatcher
+from webhooks import WebhookWatcher, receiver_from_env
 
 # Page config MUST be first
 st.set_page_config(
@@ -179,6 +199,30 @@ if 'dark_mode' not in st.session_state:
     st.session_state.dark_mode = False
 if 'terminal_log' not in st.session_state:
     st.session_state.terminal_log = []
+if 'active_job_id' not in st.session_state:
+    st.session_state.active_job_id = None
+if 'collected_job_id' not in st.session_state:
+    st.session_state.collected_job_id = None
+if 'preview_estimate' not in st.session_state:
+    st.session_state.preview_estimate = None
+if 'insights_report' not in st.session_state:
+    st.session_state.insights_report = None
+    st.session_state.insights_marker = None
+if 'trend_request' not in st.session_state:
+    st.session_state.trend_request = None
+    st.session_state.trend_job_id = None
+if 'search_index' not in st.session_state:
+    st.session_state.search_index = None
+    st.session_state.search_source = None
+if 'rollups' not in st.session_state:
+    st.session_state.rollups = None
+    st.session_state.rollups_marker = None
+if 'last_fetch' not in st.session_state:
+    st.session_state.last_fetch = None
+    st.session_state.watch_seen = 0
+if 'sample_estimate' not in st.session_state:
+    st.session_state.sample_estimate = None
+    st.session_state.sample_job_id = None
 
 def add_log(message, level="info"):
     """Add a log message to the log container"""
@@ -212,6 +256,8 @@ def fetch_teams_and_admins(token, log_container=None):
     team_map = {}
     team_admins_map = {}
     headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+    scheduler = get_request_scheduler()
+    user_key = user_key_for_token(token)
     
     add_log("On the hunt for teammates...", "info")
     if log_container:
@@ -219,8 +265,9 @@ def fetch_teams_and_admins(token, log_container=None):
     
     # Fetch teams
     try:
-        teams_url = "https://api.intercom.io/teams"
-        teams_response = requests.get(teams_url, headers=headers)
+        teams_url = f"{INTERCOM_API_BASE}/teams"
+        with scheduler.slot(user_key, PRIORITY_INTERACTIVE):
+            teams_response = send_with_retry("GET", teams_url, headers=headers)
         teams_response.raise_for_status()
         teams_data = teams_response.json()
         for team in teams_data.get('teams', []):
@@ -235,11 +282,12 @@ def fetch_teams_and_admins(token, log_container=None):
             add_terminal_log(f"🦊 Note: Couldn't sniff out teams (that's okay, we'll keep hunting): {e}", log_container)
     
     # Fetch admins
-    url = "https://api.intercom.io/admins"
+    url = f"{INTERCOM_API_BASE}/admins"
     params = {"page": 1}
     try:
         while True:
-            response = requests.get(url, headers=headers, params=params)
+            with scheduler.slot(user_key, PRIORITY_INTERACTIVE):
+                response = send_with_retry("GET", url, headers=headers, params=params)
             response.raise_for_status()
             data = response.json()
             for admin in data.get('admins', []):
@@ -272,360 +320,392 @@ def fetch_teams_and_admins(token, log_container=None):
             add_terminal_log("🦊 ⚠️ Check your token - might need more permissions", log_container)
         return None, None, None
 
-def translate_if_non_english(text, log_container=None):
-    """Translate text if not English"""
-    if not text:
-        return text
+def run_fetch_job(job, token, query, admin_map, team_map, translations_cache, resume=False):
+    """Background job target: run the search and collect results on the job"""
+    checkpoint = get_checkpoint_store().open(query, resume=resume)
+    team_id = query["team_id"]
+    team_admins_map = {team_id: checkpoint.query["team_admin_ids"]} if team_id else {}
+    engine = AsyncFetchEngine(token, job.put, translations_cache=translations_cache, results=job.results,
+                              scheduler=get_request_scheduler(), user_key=query["user_key"], checkpoint=checkpoint,
+                              hedge=os.environ.get("FDBK_HEDGE_REQUESTS") == "1", cancel_token=job.cancel_token,
+                              trend_store=get_trend_store())
     try:
-        if text in st.session_state.translations_cache:
-            return st.session_state.translations_cache[text]
-        translator = GoogleTranslator(source='auto', target='en')
-        translated = translator.translate(text)
-        if translated.lower() == text.lower():
-            st.session_state.translations_cache[text] = text
-            return text
-        st.session_state.translations_cache[text] = translated
-        if log_container:
-            add_terminal_log(f"🦊 Translation: {translated[:60]}{'...' if len(translated) > 60 else ''}", log_container)
-        return translated
-    except Exception as e:
-        if log_container:
-            add_terminal_log(f"🦊 Translation error (no worries, using original): {e}", log_container)
-        return text
-
-def process_query_batch(intercom_url, intercom_headers, payload, batch_num, progress_bar=None, status_text=None, log_container=None):
-    """Process a single batch query"""
-    batch_results = []
-    page = 1
-    
-    while True:
-        try:
-            if status_text:
-                status_text.text(f"🦊 Batch {batch_num} - Fetching page {page}...")
-            if log_container:
-                add_terminal_log(f"🦊 Batch {batch_num} - Fetching page {page}...", log_container)
-            
-            response = requests.post(intercom_url, headers=intercom_headers, data=json.dumps(payload))
-            response.raise_for_status()
-            data = response.json()
-            
-            conversations = data.get("conversations", [])
-            if not conversations:
-                break
-            
-            if status_text:
-                status_text.text(f"🦊 Batch {batch_num} - Processing {len(conversations)} conversations from page {page}...")
-            if log_container:
-                add_terminal_log(f"🦊 Batch {batch_num} - Processing {len(conversations)} conversations from page {page}...", log_container)
-            
-            for idx, convo in enumerate(conversations, 1):
-                if (convo.get("conversation_rating") and convo["conversation_rating"].get("remark") is not None):
-                    remark = convo['conversation_rating'].get('remark')
-                    rating = convo['conversation_rating'].get('rating', 'N/A')
-                    convo_id = convo.get('id', 'Unknown')
-                    convo_date = convo.get('created_at', 0)
-                    readable_date = datetime.fromtimestamp(convo_date).strftime('%Y-%m-%d %H:%M') if convo_date else 'N/A'
-                    
-                    if log_container:
-                        add_terminal_log(f"  🦊 Batch {batch_num} - Conversation {idx}/{len(conversations)} (ID: {convo_id[:8]}...): Rating {rating}", log_container)
-                    
-                    translated_remark = translate_if_non_english(remark, log_container)
-                    
-                    report_item = {
-                        "id": convo_id,
-                        "rating": rating,
-                        "date": convo_date,
-                        "remark": remark
-                    }
-                    if translated_remark != remark:
-                        report_item["translated_remark"] = translated_remark
-                    batch_results.append(report_item)
-            
-            pages_data = data.get("pages", {})
-            if pages_data.get("next"):
-                next_cursor = pages_data["next"].get("starting_after")
-                if next_cursor:
-                    payload["pagination"] = {"per_page": 49, "starting_after": next_cursor}
-                    page += 1
-                else:
-                    break
-            else:
-                break
-        except requests.exceptions.RequestException as e:
-            error_msg = f"🦊 Oof! INTERCOM API ERROR in batch {batch_num}: {e}"
-            if log_container:
-                add_terminal_log(f"❌ {error_msg}", log_container)
-            if status_text:
-                status_text.error(error_msg)
+        # The job thread just waits; the fetch itself runs on the shared event loop
+        get_fetch_loop().run(engine.run_api_search_async(query["admin_id"], query["start_date"], query["end_date"],
+                                                         team_id, admin_map, team_map, team_admins_map,
+                                                         ratings=query.get("ratings"), max_results=query.get("max_results")))
+    finally:
+        checkpoint.release()
+    job.interrupted = engine.interrupted or engine.cancelled
+
+def run_trend_backfill_job(job, token, user_key, admin_id, team_id, team_admin_ids, ranges):
+    """Background job target: fetch the days the trend store is missing, ratings only"""
+    team_admins_map = {team_id: team_admin_ids} if team_id else {}
+    for start_date_str, end_date_str in ranges:
+        if job.cancel_token.cancelled:
             break
-    
-    if log_container:
-        add_terminal_log(f"✅ 🦊 Batch {batch_num} complete! Found {len(batch_results)} remarks. Nice catch!", log_container)
-    return batch_results
+        engine = AsyncFetchEngine(token, job.put, scheduler=get_request_scheduler(), user_key=user_key,
+                                  cancel_token=job.cancel_token, trend_store=get_trend_store(), translate=False)
+        get_fetch_loop().run(engine.run_api_search_async(admin_id, start_date_str, end_date_str, team_id,
+                                                         {}, {}, team_admins_map))
+        if engine.interrupted or engine.cancelled:
+            job.interrupted = True
+            break
+
+def run_watch_job(job, token, query, results, since, interval, translations_cache):
+    """Background job target: poll for remarks newer than the fetch it extends until cancelled"""
+    job.results.extend(results)
+    team_id = query["team_id"]
+    team_admins_map = {team_id: query["team_admin_ids"]} if team_id else {}
+    options = dict(translations_cache=translations_cache, results=job.results, per_page=150,
+                   scheduler=get_request_scheduler(), user_key=query["user_key"], cancel_token=job.cancel_token)
+    receiver = get_webhook_receiver()
+    # With a webhook receiver configured, new ratings are pushed to us instead of polled for
+    watcher = WebhookWatcher(token, job.put, receiver, **options) if receiver else FetchWatcher(token, job.put, **options)
+    watcher.watch(query["admin_id"], team_id, team_admins_map, query.get("ratings"), since, interval)
+
+def run_sample_job(job, token, user_key, admin_id, team_id, team_admin_ids, start_date_str, end_date_str, state=None):
+    """Background job target: estimate the range from random time slices, or refine an earlier estimate"""
+    sampler = SampleEstimator(token, job.put, state=state, scheduler=get_request_scheduler(), user_key=user_key,
+                              cancel_token=job.cancel_token)
+    if state is None:
+        sampler.sample(admin_id, start_date_str, end_date_str, team_id, {team_id: team_admin_ids} if team_id else {})
+    else:
+        sampler.refine()
+
+def preview_fetch(token, admin_id, start_date_str, end_date_str, team_id, ratings=None):
+    """Dry-run a fetch: probe its size and estimate calls, translations and time"""
+    lines = []
+    engine = FetchEngine(token, lines.append, translations_cache=st.session_state.translations_cache,
+                         scheduler=get_request_scheduler(), user_key=user_key_for_token(token))
+    estimate = engine.preview(admin_id, start_date_str, end_date_str, team_id, st.session_state.team_admins_map, ratings)
+    if estimate is None:
+        errors = [line for line in lines if isinstance(line, str) and line.startswith("❌")]
+        return {"error": errors[-1] if errors else "Preview failed."}
+    return estimate
+
+def submit_fetch_job(token, query, resume=False):
+    """Start a background fetch for this session and remember its id"""
+    job_id = get_job_runner().submit(
+        run_fetch_job,
+        description=query["label"],
+        key=run_key_for(query),
+        token=token,
+        query=query,
+        admin_map=dict(st.session_state.admin_map),
+        team_map=dict(st.session_state.team_map),
+        translations_cache=st.session_state.translations_cache,
+        resume=resume
+    )
+    st.session_state.active_job_id = job_id
+    st.session_state.final_report_data = []
+    st.session_state.last_fetch = {"query": query, "job_id": job_id, "since": time.time()}
+    st.query_params["job"] = job_id
+
+def submit_watch_job(token, interval):
+    """Keep the last fetch's results current; new remarks are appended to them"""
+    last_fetch = st.session_state.last_fetch
+    query = last_fetch["query"]
+    job_id = get_job_runner().submit(
+        run_watch_job,
+        description=f"Watching {query['label']}",
+        key=f"watch:{run_key_for(query)}",
+        token=token,
+        query=query,
+        results=list(st.session_state.final_report_data),
+        since=last_fetch["since"],
+        interval=interval,
+        translations_cache=st.session_state.translations_cache
+    )
+    last_fetch["job_id"] = job_id
+    st.session_state.active_job_id = job_id
+    st.session_state.watch_seen = 0
+    st.query_params["job"] = job_id
+
+def is_watch_job(job):
+    return (job.key or "").startswith("watch:")
 
-def run_api_search(token, admin_id, start_date_str, end_date_str, team_id=None, admin_map=None, team_map=None, log_container=None):
-    """Run the API search"""
+@st.cache_resource
+def get_checkpoint_store():
+    """Checkpoints let interrupted fetches resume instead of starting over"""
+    return CheckpointStore()
+
+@st.cache_resource
+def get_trend_store():
+    """Daily rating aggregates that every clean fetch adds to"""
+    return TrendStore()
+
+@st.cache_resource
+def get_request_scheduler():
+    """Process-wide scheduler for every outgoing Intercom request"""
+    return RequestScheduler.from_env()
+
+@st.cache_resource
+def get_fetch_loop():
+    """Process-wide event loop that every session's fetches run on"""
+    return EventLoopThread()
+
+@st.cache_resource
+def get_job_runner():
+    """Process-wide job runner shared by every session"""
+    return JobRunner(max_workers=int(os.environ.get("FDBK_JOB_WORKERS", "4")))
+
+@st.cache_resource
+def get_webhook_receiver():
+    """Rating webhook listener per FDBK_WEBHOOK_PORT, shared by every session; None if not configured"""
     try:
-        start_ts = str(int(datetime.strptime(start_date_str, "%Y-%m-%d").timestamp()))
-        end_date_dt = datetime.strptime(end_date_str, "%Y-%m-%d") + timedelta(days=1)
-        end_ts = str(int(end_date_dt.timestamp()))
-    except Exception as e:
-        error_msg = f"!!! Date conversion error: {e}"
-        add_log(error_msg, "error")
-        if log_container:
-            add_terminal_log(f"❌ {error_msg}", log_container)
-        return []
-    
-    intercom_url = "https://api.intercom.io/conversations/search"
-    intercom_headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept": "application/json",
-        "Content-Type": "application/json"
-    }
-    
-    base_filters = [
-        {"field": "created_at", "operator": ">", "value": start_ts},
-        {"field": "created_at", "operator": "<", "value": end_ts},
-        {"field": "conversation_rating.score", "operator": "IN", "value": [1, 2, 3, 4, 5]}
-    ]
-    
-    # Build search info string
-    search_info = []
-    if team_id and team_map:
-        team_name = [name for name, tid in team_map.items() if tid == team_id]
-        search_info.append(f"team: {team_name[0] if team_name else team_id}")
-    if admin_id and admin_map:
-        admin_name = [name for name, aid in admin_map.items() if aid == admin_id]
-        search_info.append(f"admin: {admin_name[0] if admin_name else admin_id}")
-    search_str = ", ".join(search_info) if search_info else "all conversations"
-    
-    search_msg = f"🦊 On the hunt! Fetching remarks for {search_str} from {start_date_str} to {end_date_str}..."
-    add_log(search_msg, "info")
-    if log_container:
-        add_terminal_log(search_msg, log_container)
-    
-    all_results = []
-    
-    # Handle team selection
-    if team_id:
-        team_admin_ids = st.session_state.team_admins_map.get(team_id, [])
-        if not team_admin_ids:
-            warning_msg = f"🦊 Hmm, no admins in this team? That's sus, fren. Can't hunt without targets!"
-            add_log(warning_msg, "warning")
-            if log_container:
-                add_terminal_log(f"⚠️ {warning_msg}", log_container)
-            return []
-        
-        if admin_id and admin_id in team_admin_ids:
-            # Single admin in team
-            admin_filter = {"field": "admin_assignee_id", "operator": "=", "value": admin_id}
-            query_filters = base_filters + [admin_filter]
-            query_operator = "AND"
+        return receiver_from_env()
+    except (ValueError, OSError) as e:
+        print(f"Webhook receiver not started: {e}", file=sys.stderr)
+        return None
+
+@st.cache_resource
+def start_metrics_exporter():
+    """Expose process metrics per FDBK_METRICS_PORT / FDBK_METRICS_FILE, once per process"""
+    metrics.active_jobs.fn = get_job_runner().active_count
+    return metrics.start_exporters_from_env()
+
+def record_session_metrics():
+    """Report this session's result-set size, re-measuring only when the results change"""
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    data = st.session_state.final_report_data
+    marker = (id(data), len(data))
+    if st.session_state.get('metrics_marker') != marker:
+        st.session_state.metrics_marker = marker
+        st.session_state.result_bytes = metrics.estimate_records_bytes(data)
+    metrics.observe_session_results(ctx.session_id, st.session_state.result_bytes)
+
+def get_offline_insights():
+    """Themes and sentiment for the current results, recomputed only when they change"""
+    data = st.session_state.final_report_data
+    marker = (id(data), len(data))
+    if st.session_state.insights_marker != marker:
+        st.session_state.insights_report = insights.analyze(data)
+        st.session_state.insights_marker = marker
+    return st.session_state.insights_report
+
+def get_rollups():
+    """Count/CSAT rollups for the current results: the job's own, or recomputed if the results changed"""
+    data = st.session_state.final_report_data
+    marker = (id(data), len(data))
+    if st.session_state.rollups_marker != marker:
+        st.session_state.rollups = compute_rollups(data)
+        st.session_state.rollups_marker = marker
+    return st.session_state.rollups
+
+def collect_job_results(job):
+    """Copy a job's results, and the rollups computed with them, into the session"""
+    data = job.result_snapshot()
+    previous = st.session_state.final_report_data
+    st.session_state.final_report_data = data
+    st.session_state.collected_job_id = job.id
+    if job.rollups is not None:
+        st.session_state.rollups = job.rollups
+        st.session_state.rollups_marker = (id(data), len(data))
+    if is_watch_job(job):
+        # A watch only appends to the results it extends: keep their index, get_search_index adds the arrivals
+        extends = previous and len(data) >= len(previous) and data[len(previous) - 1] is previous[-1]
+        if extends and st.session_state.search_source == id(previous):
+            st.session_state.search_source = id(data)
+        return
+    # The job panel indexed its results as they arrived; the session gets its own copy, since the job may keep syncing
+    st.session_state.search_index = job.synced_search_index().copy(len(data))
+    st.session_state.search_source = id(data)
+
+def get_search_index():
+    """Full-text index over the current results, caught up with anything appended since"""
+    data = st.session_state.final_report_data
+    if st.session_state.search_source != id(data):
+        st.session_state.search_index = RemarkIndex()
+        st.session_state.search_source = id(data)
+    st.session_state.search_index.sync(data)
+    return st.session_state.search_index
+
+def search_remarks(index, key):
+    """Search box over an index; returns (query, matching record ids)"""
+    query = st.text_input("🔎 Search remarks", key=key,
+                          placeholder='refund · refun* · "money back" · refund OR bridge')
+    if not query.strip():
+        return "", None
+    started = time.perf_counter()
+    ids = index.search(query)
+    st.caption(f"{len(ids)} matching remark{'s' if len(ids) != 1 else ''} in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return query, ids
+
+def get_active_job():
+    """Return the session's current fetch job, reattaching after a reconnect"""
+    job_id = st.session_state.get('active_job_id') or st.query_params.get("job")
+    if not job_id:
+        return None
+    job = get_job_runner().get(job_id)
+    if job is None:
+        # Job expired or the server restarted
+        st.session_state.active_job_id = None
+        if "job" in st.query_params:
+            del st.query_params["job"]
+        return None
+    st.session_state.active_job_id = job_id
+    return job
+
+def get_trend_job():
+    job_id = st.session_state.trend_job_id
+    return get_job_runner().get(job_id) if job_id else None
+
+def get_sample_job():
+    job_id = st.session_state.sample_job_id
+    return get_job_runner().get(job_id) if job_id else None
+
+def render_sample_estimate(estimate):
+    """Estimated CSAT, remark rate and rating mix with their 95% intervals"""
+    def share(metric):
+        return f"{metric[0]:.1%}" if metric else "-"
+
+    def spread(metric):
+        if not metric or estimate["exact"]:
+            return None
+        return f"±{(metric[2] - metric[1]) / 2:.1%}"
+
+    col_csat, col_remarks, col_read = st.columns(3)
+    col_csat.metric("CSAT", share(estimate["csat"]), spread(estimate["csat"]), delta_color="off")
+    col_remarks.metric("Remark Rate", share(estimate["remark_rate"]), spread(estimate["remark_rate"]), delta_color="off")
+    col_read.metric("Data Read", f"{estimate['fraction_read']:.1%}", f"{estimate['pages']} pages", delta_color="off")
+    distribution = {f"{rating}★": metric for rating, metric in estimate["distribution"].items() if metric}
+    if distribution:
+        st.bar_chart(pd.DataFrame({"Share": [metric[0] for metric in distribution.values()]}, index=list(distribution)))
+    st.caption(" · ".join(describe_estimate(estimate)))
+
+@st.fragment(run_every="1s")
+def sample_job_panel():
+    """Running estimate of a sampling job; reruns the app once it finishes"""
+    job = get_sample_job()
+    if job is None:
+        return
+    if job.finished:
+        st.rerun(scope="app")
+        return
+    col_progress, col_cancel = st.columns([4, 1])
+    with col_progress:
+        st.caption(job.activity or "🎲 Sizing up the months...")
+    with col_cancel:
+        if job.cancel_token.cancelled:
+            st.caption("🛑 Cancelling...")
+        elif st.button("🛑 Cancel", key=f"cancel_{job.id}", use_container_width=True):
+            job.cancel()
+    if job.sample:
+        render_sample_estimate(job.sample)
+
+@st.fragment(run_every="1s")
+def trend_job_panel():
+    """Progress of a running trend backfill; reruns the app once it finishes"""
+    job = get_trend_job()
+    if job is None:
+        return
+    if job.finished:
+        st.rerun(scope="app")
+        return
+    st.progress(min(job.progress, 1.0), text=job.activity or "📈 Backfilling missing days...")
+    if job.progress_detail:
+        st.caption(describe_progress(job.progress_detail))
+
+def render_live_panel(snapshot):
+    """Aggregates streamed from the running fetch, refreshed with the job panel"""
+    with st.container(border=True):
+        st.markdown("**📡 Live Insights**")
+        col_found, col_csat, col_avg = st.columns(3)
+        col_found.metric("Remarks", snapshot["remarks"])
+        col_csat.metric("CSAT", f"{snapshot['csat']:.0%}" if snapshot["csat"] is not None else "-")
+        col_avg.metric("Avg Rating", f"{snapshot['avg_rating']:.2f}" if snapshot["avg_rating"] is not None else "-")
+        col_ratings, col_days = st.columns(2)
+        with col_ratings:
+            st.bar_chart(pd.DataFrame({"Remarks": list(snapshot["histogram"].values())},
+                                      index=[f"{rating}★" for rating in snapshot["histogram"]]))
+        with col_days:
+            if snapshot["days"]:
+                st.line_chart(pd.DataFrame(snapshot["days"], columns=["Day", "Remarks"]).set_index("Day"))
+        if snapshot["top_terms"]:
+            st.caption("Top terms so far: " + ", ".join(f"{term} ({count})" for term, count, _ in snapshot["top_terms"]))
+
+def render_terminal_log(lines):
+    """Render log lines in the terminal-style box"""
+    log_text = "\n".join(lines) if lines else "[Ready] Waiting for activity..."
+    st.markdown(f'<div class="terminal-log">{log_text}</div>', unsafe_allow_html=True)
+
+@st.fragment(run_every="1s")
+def job_status_panel():
+    """Poll the running job and show progress, log and partial results"""
+    job = get_active_job()
+    if job is None:
+        return
+    if job.finished:
+        # A watch can still add arrivals after its last collection
+        if st.session_state.collected_job_id != job.id or len(st.session_state.final_report_data) != len(job.results):
+            collect_job_results(job)
+            st.rerun(scope="app")
+        return
+    if is_watch_job(job):
+        watch_panel(job)
+        return
+    col_progress, col_cancel = st.columns([4, 1])
+    with col_progress:
+        st.progress(min(job.progress, 1.0), text=job.activity or "🦊 Warming up...")
+        if job.progress_detail:
+            st.caption(describe_progress(job.progress_detail))
+    with col_cancel:
+        if job.cancel_token.cancelled:
+            st.caption("🛑 Cancelling...")
+        elif st.button("🛑 Cancel", key=f"cancel_{job.id}", use_container_width=True):
+            job.cancel()
+    if job.live and job.live["remarks"]:
+        render_live_panel(job.live)
+    partial = job.result_snapshot()
+    st.caption(f"Remarks so far: {len(partial)}")
+    with st.expander("📋 Activity Log", expanded=True):
+        render_terminal_log(job.log_lines())
+    if partial:
+        _, ids = search_remarks(job.synced_search_index(), f"search_{job.id}")
+        shown = [partial[i] for i in ids[:200] if i < len(partial)] if ids is not None else partial[-20:]
+        st.dataframe(pd.DataFrame(shown), use_container_width=True, height=200)
+
+def watch_panel(job):
+    """Arrivals of a running watch; new remarks are pulled into the session's results"""
+    watch = job.watch
+    col_info, col_stop = st.columns([4, 1])
+    with col_info:
+        if watch and watch["source"] == "webhook":
+            st.markdown(f"**📬 Listening** · {watch['arrivals']} new remark{'s' if watch['arrivals'] != 1 else ''} · "
+                        f"{watch['deliveries']} webhooks · no search requests · "
+                        f"last checked {datetime.fromtimestamp(watch['polled_at']):%H:%M:%S}")
+        elif watch:
+            st.markdown(f"**👀 Watching** · {watch['arrivals']} new remark{'s' if watch['arrivals'] != 1 else ''} · "
+                        f"{watch['polls']} polls · {watch['requests']} requests · "
+                        f"last poll {datetime.fromtimestamp(watch['polled_at']):%H:%M:%S}")
         else:
-            if admin_id:
-                warning_msg = f"🦊 Oops! That admin isn't in this team. Hunting all team admins instead."
-                add_log(warning_msg, "warning")
-                if log_container:
-                    add_terminal_log(f"⚠️ {warning_msg}", log_container)
-            
-            # Multiple admins - check if we need batching
-            num_admins = len(team_admin_ids)
-            MAX_OR_CONDITIONS = 15
-            
-            info_msg = f"🦊 Team has {num_admins} admins. Building the query..."
-            add_log(info_msg, "info")
-            if log_container:
-                add_terminal_log(info_msg, log_container)
-            
-            if num_admins <= MAX_OR_CONDITIONS:
-                admin_or_conditions = []
-                for aid in team_admin_ids:
-                    admin_or_conditions.append({"field": "admin_assignee_id", "operator": "=", "value": aid})
-                query_filters = base_filters + [
-                    {"operator": "OR", "value": admin_or_conditions}
-                ]
-                query_operator = "AND"
-            else:
-                # Batch processing
-                batch_msg = f"🦊 Big team alert! Splitting {num_admins} admins into batches of {MAX_OR_CONDITIONS}..."
-                add_log(batch_msg, "info")
-                if log_container:
-                    add_terminal_log(batch_msg, log_container)
-                
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                for i in range(0, num_admins, MAX_OR_CONDITIONS):
-                    batch = team_admin_ids[i:i + MAX_OR_CONDITIONS]
-                    batch_num = i // MAX_OR_CONDITIONS + 1
-                    
-                    batch_info = f"🦊 Processing batch {batch_num} with {len(batch)} admins..."
-                    add_log(batch_info, "info")
-                    if log_container:
-                        add_terminal_log(batch_info, log_container)
-                    
-                    admin_or_conditions = []
-                    for aid in batch:
-                        admin_or_conditions.append({"field": "admin_assignee_id", "operator": "=", "value": aid})
-                    
-                    payload = {
-                        "query": {
-                            "operator": "AND",
-                            "value": base_filters + [{"operator": "OR", "value": admin_or_conditions}]
-                        },
-                        "pagination": {"per_page": 49}
-                    }
-                    
-                    batch_results = process_query_batch(intercom_url, intercom_headers, payload, batch_num, progress_bar, status_text, log_container)
-                    all_results.extend(batch_results)
-                    progress_bar.progress(min((i + len(batch)) / num_admins, 1.0))
-                
-                progress_bar.empty()
-                status_text.empty()
-                
-                complete_msg = f"\n🦊 Hunt complete! Found {len(all_results)} total remarks across all batches. That's a lot of feedback!"
-                add_log(complete_msg, "success")
-                if log_container:
-                    add_terminal_log(f"✅ {complete_msg}", log_container)
-                if len(all_results) > 50:
-                    add_log("(That's a lot of feedback to hunt through!)", "info")
-                    if log_container:
-                        add_terminal_log("(That's a lot of feedback to hunt through!)", log_container)
-                
-                return all_results
-    elif admin_id:
-        # No team, just admin
-        admin_filter = {"field": "admin_assignee_id", "operator": "=", "value": admin_id}
-        query_filters = base_filters + [admin_filter]
-        query_operator = "AND"
-    else:
-        # No filters
-        query_filters = base_filters
-        query_operator = "AND"
-    
-    # Single query
-    payload = {
-        "query": {
-            "operator": query_operator,
-            "value": query_filters
-        },
-        "pagination": {"per_page": 49}
-    }
-    
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    results = []
-    page = 1
-    total_convos = 0
-    total_pages = 1
-    is_first_page = True
-    
-    while True:
-        try:
-            page_msg = f"🦊 Fetching page {page}..."
-            if log_container:
-                add_terminal_log(page_msg, log_container)
-            status_text.text(page_msg)
-            
-            response = requests.post(intercom_url, headers=intercom_headers, data=json.dumps(payload))
-            response.raise_for_status()
-            data = response.json()
-            
-            if is_first_page:
-                total_convos = data.get('total_count', 0)
-                total_pages = data.get('pages', {}).get('total_pages', 1)
-                stats_msg = f"🦊 Nice! Found {total_convos} total conversations across {total_pages} pages. Time to dig in!"
-                add_log(stats_msg, "success")
-                if log_container:
-                    add_terminal_log(f"✅ {stats_msg}", log_container)
-                is_first_page = False
-            
-            conversations = data.get("conversations", [])
-            if not conversations:
-                no_more_msg = "🦊 No more conversations to hunt. We got 'em all!"
-                add_log(no_more_msg, "info")
-                if log_container:
-                    add_terminal_log(no_more_msg, log_container)
-                break
-            
-            process_msg = f"🦊 Processing {len(conversations)} conversations from page {page}..."
-            if log_container:
-                add_terminal_log(process_msg, log_container)
-            status_text.text(process_msg)
-            
-            found_on_page = 0
-            for idx, convo in enumerate(conversations, 1):
-                convo_id = convo.get('id', 'Unknown')
-                if (convo.get("conversation_rating") and convo["conversation_rating"].get("remark") is not None):
-                    remark = convo['conversation_rating'].get('remark')
-                    rating = convo['conversation_rating'].get('rating', 'N/A')
-                    convo_date = convo.get('created_at', 0)
-                    readable_date = datetime.fromtimestamp(convo_date).strftime('%Y-%m-%d %H:%M') if convo_date else 'N/A'
-                    
-                    if log_container:
-                        add_terminal_log(f"  🦊 Conversation {idx}/{len(conversations)} (ID: {convo_id[:8]}...): Rating {rating}, Date: {readable_date}", log_container)
-                        add_terminal_log(f"    Processing remark: {remark[:80]}{'...' if len(remark) > 80 else ''}", log_container)
-                    
-                    translated_remark = translate_if_non_english(remark, log_container)
-                    
-                    report_item = {
-                        "id": convo_id,
-                        "rating": rating,
-                        "date": convo_date,
-                        "remark": remark
-                    }
-                    if translated_remark != remark:
-                        report_item["translated_remark"] = translated_remark
-                    results.append(report_item)
-                    found_on_page += 1
-                else:
-                    if log_container:
-                        add_terminal_log(f"  ○ Conversation {idx}/{len(conversations)} (ID: {convo_id[:8]}...): No remark found (nothing to see here)", log_container)
-            
-            page_complete_msg = f"🦊 Page {page} complete! Found {found_on_page} remarks out of {len(conversations)} conversations. Nice catch!"
-            add_log(page_complete_msg, "success")
-            if log_container:
-                add_terminal_log(f"✅ {page_complete_msg}", log_container)
-            
-            pages_data = data.get("pages", {})
-            if pages_data.get("next"):
-                next_cursor = pages_data["next"].get("starting_after")
-                if next_cursor:
-                    payload["pagination"] = {"per_page": 49, "starting_after": next_cursor}
-                    page += 1
-                    progress_bar.progress(min(page / total_pages, 1.0))
-                else:
-                    break
-            else:
-                break
-        except requests.exceptions.RequestException as e:
-            error_msg = f"🦊 Oof! INTERCOM API ERROR: {e}"
-            add_log(error_msg, "error")
-            if log_container:
-                add_terminal_log(f"❌ {error_msg}", log_container)
-            if status_text:
-                status_text.error(error_msg)
-            break
-    
-    progress_bar.empty()
-    status_text.empty()
-    
-    if not results:
-        no_results_msg = "🦊 No remarks found for this query. Maybe try a different date range?"
-        add_log(no_results_msg, "warning")
-        if log_container:
-            add_terminal_log(f"⚠️ {no_results_msg}", log_container)
-    else:
-        complete_msg = f"\n🦊 Hunt complete! Found {len(results)} total remarks."
-        add_log(complete_msg, "success")
-        if log_container:
-            add_terminal_log(f"✅ {complete_msg}", log_container)
-        if len(results) > 100:
-            add_log("(That's a lot of feedback to hunt through!)", "info")
-            if log_container:
-                add_terminal_log("(That's a lot of feedback to hunt through!)", log_container)
-    
-    return results
+            st.markdown("**👀 Watching** · first poll on its way...")
+    with col_stop:
+        if job.cancel_token.cancelled:
+            st.caption("🛑 Stopping...")
+        elif st.button("🛑 Stop", key=f"cancel_{job.id}", use_container_width=True):
+            job.cancel()
+    arrivals = list(job.arrivals)
+    if arrivals:
+        st.dataframe(pd.DataFrame([
+            {"Rating": item["rating"],
+             "Date": datetime.fromtimestamp(item["date"]).strftime('%Y-%m-%d %H:%M') if item["date"] else 'N/A',
+             "Remark": item.get("translated_remark") or item["remark"],
+             "Admin ID": item.get("admin_assignee_id")}
+            for item in reversed(arrivals)
+        ]), use_container_width=True, hide_index=True, height=200)
+    if watch and watch["arrivals"] != st.session_state.watch_seen:
+        # Refresh results, scorecards and search with the new remarks
+        st.session_state.watch_seen = watch["arrivals"]
+        collect_job_results(job)
+        st.rerun(scope="app")
+
+start_metrics_exporter()
+get_webhook_receiver()
+record_session_metrics()
 
 # UI
 st.title("🦊 fdbckfndr")
@@ -687,40 +767,254 @@ with col1:
     with col_date2:
         end_date = st.date_input("End Date", value=datetime.now())
     
-    if st.button("🔍 Fetch Report Data", type="primary", use_container_width=True):
+    # Ratings are pushed into the search query; the limit stops paging as soon as it's met
+    col_ratings, col_limit = st.columns(2)
+    with col_ratings:
+        selected_ratings = st.multiselect("Ratings", ALL_RATINGS, default=ALL_RATINGS, format_func=lambda rating: f"{rating}★")
+    with col_limit:
+        max_results = st.number_input("Max Remarks (0 = no limit)", min_value=0, value=0, step=100)
+    ratings = normalize_ratings(selected_ratings)
+    
+    active_job = get_active_job()
+    fetch_running = active_job is not None and not active_job.finished
+    col_fetch, col_preview = st.columns([3, 1])
+    with col_fetch:
+        fetch_clicked = st.button("🔍 Fetch Report Data", type="primary", use_container_width=True, disabled=fetch_running)
+    with col_preview:
+        preview_clicked = st.button("🔎 Preview Cost", use_container_width=True)
+    if fetch_clicked or preview_clicked:
         if not intercom_token:
             st.error("Please enter your Intercom token in the sidebar.")
         elif not team_id and not admin_id:
             st.error("Please select either a team or an admin (or both).")
+        elif not selected_ratings:
+            st.error("Please select at least one rating.")
+        elif preview_clicked:
+            with st.spinner("🔎 Sniffing out the size of this hunt..."):
+                st.session_state.preview_estimate = preview_fetch(
+                    intercom_token, admin_id, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"), team_id, ratings)
         else:
-            # Create terminal log container
-            st.session_state.terminal_log = []  # Clear previous log
-            with st.expander("📋 Activity Log", expanded=True):
-                log_messages_container = st.empty()
-                # Initialize empty terminal log display
-                if not st.session_state.terminal_log:
-                    log_messages_container.markdown('<div class="terminal-log">[Ready] Waiting for activity...</div>', unsafe_allow_html=True)
-            
             start_date_str = start_date.strftime("%Y-%m-%d")
             end_date_str = end_date.strftime("%Y-%m-%d")
-            
-            results = run_api_search(
-                intercom_token, 
-                admin_id, 
-                start_date_str, 
-                end_date_str, 
+            search_info = [selected_team] if team_id else []
+            if admin_id:
+                search_info.append(selected_admin)
+            if ratings:
+                search_info.append(describe_ratings(ratings))
+            if max_results:
+                search_info.append(f"first {int(max_results)}")
+            query = make_run_query(
+                user_key_for_token(intercom_token),
+                admin_id,
                 team_id,
-                st.session_state.admin_map,
-                st.session_state.team_map,
-                log_messages_container
+                start_date_str,
+                end_date_str,
+                st.session_state.team_admins_map.get(team_id, []) if team_id else [],
+                label=f"{', '.join(search_info)} from {start_date_str} to {end_date_str}",
+                ratings=ratings,
+                max_results=int(max_results) or None
             )
-            
-            st.session_state.final_report_data = results
-            
-            if results:
-                st.success(f"✅ Hunt complete! Found {len(results)} remarks. Nice work!")
+            # Hand the crawl to the background runner so the session stays responsive
+            st.session_state.preview_estimate = None
+            submit_fetch_job(intercom_token, query)
+    
+    estimate = st.session_state.preview_estimate
+    if estimate is not None:
+        if estimate.get("error"):
+            st.error(estimate["error"])
+        else:
+            col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+            col_m1.metric("Conversations", estimate["conversations"])
+            col_m2.metric("API Calls", f"~{estimate['api_calls']}")
+            col_m3.metric("Translations", f"~{estimate['translation_calls']}")
+            col_m4.metric("Est. Time", f"~{format_duration(estimate['estimated_seconds'])}")
+            st.caption(" · ".join(describe_preview(estimate)))
+    
+    active_job = get_active_job()
+    fetch_running = active_job is not None and not active_job.finished
+    if active_job is not None:
+        if not active_job.finished:
+            job_status_panel()
+        else:
+            if active_job.status == "failed":
+                st.error(f"Fetch failed: {active_job.error}")
+            elif is_watch_job(active_job):
+                watch = active_job.watch or {"source": "poll", "arrivals": 0, "polls": 0}
+                if watch["source"] == "webhook":
+                    st.info(f"📬 Stopped listening: {watch['arrivals']} new remarks from {watch['deliveries']} webhooks.")
+                else:
+                    st.info(f"👀 Stopped watching: {watch['arrivals']} new remarks in {watch['polls']} polls.")
+            elif active_job.status == "cancelled":
+                st.warning(f"🛑 Fetch cancelled with {len(active_job.results)} remarks collected. Resume below to continue it later.")
+            elif active_job.interrupted:
+                st.warning(f"⚠️ Fetch interrupted with {len(active_job.results)} remarks collected. Resume below to pick up where it stopped.")
+            elif active_job.results:
+                st.success(f"✅ Hunt complete! Found {len(active_job.results)} remarks. Nice work!")
             else:
                 st.info("No remarks found for this query.")
+            if active_job.run_summary:
+                summary = active_job.run_summary
+                st.caption(f"📈 {summary['requests']} requests · {summary['retries']} retries · "
+                           f"{summary['timeouts']} timeouts · {summary['hedges']} hedged ({summary['hedge_wins']} won)")
+                if summary.get("remark_yield") is not None:
+                    st.caption(f"🎯 Remark yield {summary['remark_yield']:.0%} of {summary['scanned']} conversations scanned"
+                               + (" · stopped early at the remark limit" if summary.get("limit_reached") else ""))
+                if summary.get("stages"):
+                    with st.expander("⏱️ Stage Timings", expanded=False):
+                        st.dataframe(pd.DataFrame([
+                            {"Stage": STAGE_LABELS.get(stage, stage), "Count": stats["count"],
+                             "p50 ms": round(stats["p50"] * 1000, 1), "p95 ms": round(stats["p95"] * 1000, 1),
+                             "Max ms": round(stats["max"] * 1000, 1), "Total s": round(stats["total"], 2)}
+                            for stage, stats in ordered_stages(summary["stages"])
+                        ]), use_container_width=True, hide_index=True)
+            if st.session_state.collected_job_id != active_job.id:
+                # Reconnected to a job that finished while we were away
+                collect_job_results(active_job)
+            with st.expander("📋 Activity Log", expanded=False):
+                render_terminal_log(active_job.log_lines())
+            last_fetch = st.session_state.last_fetch
+            clean_fetch = active_job.status == "done" and not active_job.interrupted
+            if intercom_token and last_fetch and last_fetch["job_id"] == active_job.id and (clean_fetch or is_watch_job(active_job)):
+                # Polls only ask for conversations updated since the fetch (or the last watch) started
+                col_interval, col_watch = st.columns([1, 2])
+                with col_interval:
+                    if get_webhook_receiver() is None:
+                        intervals = sorted({30, 60, 300, 900, WATCH_INTERVAL_SECONDS})
+                        watch_interval = st.selectbox("Poll Every", intervals, index=intervals.index(WATCH_INTERVAL_SECONDS),
+                                                      format_func=format_duration)
+                    else:
+                        # Deliveries wake the watch up; nothing to poll
+                        watch_interval = WATCH_INTERVAL_SECONDS
+                        st.caption(f"📬 Webhooks on {get_webhook_receiver().url}")
+                with col_watch:
+                    st.write("")
+                    if st.button("👀 Watch for New Remarks", use_container_width=True):
+                        if is_watch_job(active_job) and active_job.watch:
+                            last_fetch["since"] = active_job.watch["high_water"]
+                        submit_watch_job(intercom_token, watch_interval)
+                        st.rerun()
+    
+    # Offer to resume fetches that crashed or were interrupted
+    if intercom_token:
+        running_key = active_job.key if fetch_running else None
+        interrupted_runs = [state for state in get_checkpoint_store().list_interrupted(user_key_for_token(intercom_token))
+                            if run_key_for(state["query"]) != running_key]
+        for state in interrupted_runs[:3]:
+            saved_query = state["query"]
+            col_resume_info, col_resume_btn = st.columns([3, 1])
+            with col_resume_info:
+                st.caption(f"↩️ Interrupted: {saved_query['label']} ({state['records_count']} remarks saved)")
+            with col_resume_btn:
+                if st.button("Resume", key=f"resume_{run_key_for(saved_query)}", use_container_width=True, disabled=fetch_running):
+                    submit_fetch_job(intercom_token, saved_query, resume=True)
+                    st.rerun()
+
+    # Long-range trends come from the trend store; only days it hasn't seen are fetched
+    st.subheader("📈 CSAT Trend")
+    col_range, col_freq = st.columns(2)
+    with col_range:
+        trend_days = st.selectbox("Trend Range", [30, 90, 180, 365], index=2, format_func=lambda days: f"Last {days} days")
+    with col_freq:
+        trend_freq = st.radio("Group By", ["Week", "Day"], horizontal=True)
+    trend_job = get_trend_job()
+    trend_running = trend_job is not None and not trend_job.finished
+    if st.button("📈 Show Trend", use_container_width=True, disabled=trend_running):
+        if not intercom_token:
+            st.error("Please enter your Intercom token in the sidebar.")
+        elif not team_id and not admin_id:
+            st.error("Please select either a team or an admin (or both).")
+        else:
+            user_key = user_key_for_token(intercom_token)
+            trend_end = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+            trend_start = (datetime.now() - timedelta(days=trend_days)).strftime("%Y-%m-%d")
+            scope = trend_scope(user_key, admin_id, team_id)
+            st.session_state.trend_request = {"scope": scope, "start": trend_start, "end": trend_end}
+            missing = get_trend_store().missing_ranges(scope, trend_start, trend_end)
+            if missing:
+                st.session_state.trend_job_id = get_job_runner().submit(
+                    run_trend_backfill_job,
+                    description=f"Trend backfill: {len(missing)} missing range(s)",
+                    key=f"trend:{scope}",
+                    token=intercom_token,
+                    user_key=user_key,
+                    admin_id=admin_id,
+                    team_id=team_id,
+                    team_admin_ids=st.session_state.team_admins_map.get(team_id, []) if team_id else [],
+                    ranges=missing
+                )
+                st.rerun()
+    if trend_running:
+        trend_job_panel()
+    elif st.session_state.trend_request:
+        request = st.session_state.trend_request
+        started = time.perf_counter()
+        trend = get_trend_store().trend(request["scope"], request["start"], request["end"], freq=trend_freq[0])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if trend_job is not None and trend_job.status == "failed":
+            st.error(f"Trend backfill failed: {trend_job.error}")
+        missing = get_trend_store().missing_ranges(request["scope"], request["start"], request["end"])
+        if missing:
+            st.warning(f"{len(missing)} stretch(es) of days are still missing; click Show Trend to fetch them.")
+        if trend["ratings"].sum():
+            st.line_chart(trend[["csat"]].rename(columns={"csat": "CSAT"}))
+            st.dataframe(trend[["ratings", "remarks", "csat", "avg_rating"]].rename(
+                columns={"ratings": "Ratings", "remarks": "Remarks", "csat": "CSAT", "avg_rating": "Avg Rating"}),
+                use_container_width=True)
+        else:
+            st.info("No ratings in this range.")
+        st.caption(f"⚡ {request['start']} to {request['end']} served from the trend store in {elapsed_ms:.0f} ms, no API calls.")
+
+    # Quick estimates read random time slices from every month instead of every page
+    st.subheader("🎲 Quick Estimate")
+    sample_job = get_sample_job()
+    sample_running = sample_job is not None and not sample_job.finished
+    if sample_job is not None and sample_job.finished and sample_job.sample:
+        st.session_state.sample_estimate = sample_job.sample
+    sample_estimate = st.session_state.sample_estimate
+    col_sample, col_refine = st.columns(2)
+    with col_sample:
+        sample_clicked = st.button("🎲 Estimate by Sampling", use_container_width=True, disabled=sample_running,
+                                   help="CSAT, remark rate and rating mix for the dates above, from a few pages per month")
+    with col_refine:
+        refine_clicked = st.button("➕ Refine Estimate", use_container_width=True,
+                                   disabled=sample_running or sample_estimate is None or sample_estimate["exact"],
+                                   help="Read as many slices again; refining until every slice is read is a full crawl")
+    if (sample_clicked or refine_clicked) and not intercom_token:
+        st.error("Please enter your Intercom token in the sidebar.")
+    elif sample_clicked or refine_clicked:
+        user_key = user_key_for_token(intercom_token)
+        if sample_clicked:
+            # No team or admin samples the whole workspace
+            sample_range = (admin_id, team_id, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
+            state = None
+        else:
+            sample_range = tuple(sample_estimate["range"])
+            # The job mutates its state; the session keeps the last finished round
+            state = copy.deepcopy(sample_estimate["state"])
+        st.session_state.sample_job_id = get_job_runner().submit(
+            run_sample_job,
+            description=f"Sampling {sample_range[2]} to {sample_range[3]}",
+            key=f"sample:{user_key}",
+            token=intercom_token,
+            user_key=user_key,
+            admin_id=sample_range[0],
+            team_id=sample_range[1],
+            team_admin_ids=st.session_state.team_admins_map.get(sample_range[1], []) if sample_range[1] else [],
+            start_date_str=sample_range[2],
+            end_date_str=sample_range[3],
+            state=state
+        )
+        st.rerun()
+    if sample_running:
+        sample_job_panel()
+    else:
+        if sample_job is not None and sample_job.status == "failed":
+            st.error(f"Sampling failed: {sample_job.error}")
+        elif sample_job is not None and sample_job.sample is None:
+            errors = [line for line in sample_job.log_lines() if "❌" in line or "⚠️" in line]
+            st.error(errors[-1] if errors else "Sampling found nothing to estimate.")
+        if sample_estimate is not None:
+            render_sample_estimate(sample_estimate)
 
 with col2:
     st.subheader("Results")
@@ -737,12 +1031,16 @@ with col2:
                 "Rating": item['rating'],
                 "Date": readable_date,
                 "Remark": item['remark'],
-                "Translated Remark": item.get('translated_remark', '')
+                "Translated Remark": item.get('translated_remark', ''),
+                "Admin ID": item.get('admin_assignee_id'),
+                "Team ID": item.get('team_assignee_id'),
+                "Cluster ID": item.get('cluster_id')
             }
             df_data.append(row)
         
         df = pd.DataFrame(df_data)
-        st.dataframe(df, use_container_width=True, height=400)
+        _, ids = search_remarks(get_search_index(), "search_results")
+        st.dataframe(df.iloc[[i for i in ids if i < len(df)]] if ids is not None else df, use_container_width=True, height=400)
         
         # Export options
         col_export1, col_export2 = st.columns(2)
@@ -762,5 +1060,46 @@ with col2:
                 st.info("Click the code block above and copy the text")
                 if len(st.session_state.final_report_data) > 20:
                     st.info("(That's a lot of data - hope your clipboard can handle it!)")
+        
+        with st.expander("🏅 Scorecards", expanded=False):
+            rollups = get_rollups()
+            overall = rollups["overall"]
+            label = csat_label(rollups)
+            col_csat, col_avg = st.columns(2)
+            col_csat.metric(label, f"{overall['csat']:.0%}" if overall["csat"] is not None else "-")
+            if overall["csat_basis"] == "remarks":
+                st.caption("These results don't include the ratings scanned without a remark, so CSAT only covers remarks.")
+            col_avg.metric("Avg Rating", f"{overall['avg_rating']:.2f}" if overall["avg_rating"] is not None else "-")
+            tab_admins, tab_teams, tab_weeks, tab_days = st.tabs(["By admin", "By team", "By week", "By day"])
+            with tab_admins:
+                st.dataframe(pd.DataFrame(scorecard_rows(rollups["admin"], name_lookup(st.session_state.admin_map))),
+                             use_container_width=True, hide_index=True)
+            with tab_teams:
+                st.dataframe(pd.DataFrame(scorecard_rows(rollups["team"], name_lookup(st.session_state.team_map))),
+                             use_container_width=True, hide_index=True)
+            for tab, name in ((tab_weeks, "week"), (tab_days, "day")):
+                with tab:
+                    trend = rollups[name][["remarks", "rated", "csat", "avg_rating"]].rename(
+                        columns={"remarks": "Remarks", "rated": "Ratings", "csat": label, "avg_rating": "Avg Rating"})
+                    st.line_chart(trend[[label]])
+                    st.dataframe(trend, use_container_width=True)
+
+        with st.expander("🧩 Themes & Sentiment (offline)", expanded=False):
+            report = get_offline_insights()
+            sentiment = report["sentiment"]
+            col_pos, col_neu, col_neg = st.columns(3)
+            col_pos.metric("Positive", sentiment["positive"])
+            col_neu.metric("Neutral", sentiment["neutral"])
+            col_neg.metric("Negative", sentiment["negative"])
+            st.caption(insights.sentiment_summary(report).replace("\n", " · "))
+            if report["themes"]:
+                st.dataframe(pd.DataFrame([
+                    {"Theme": theme["label"], "Remarks": theme["count"], "Share": f"{theme['share']:.0%}",
+                     "Avg Rating": round(theme["avg_rating"], 2) if theme["avg_rating"] is not None else None,
+                     "Sentiment": round(theme["sentiment"], 2), "Example": theme["examples"][0]}
+                    for theme in report["themes"]
+                ]), use_container_width=True, hide_index=True)
+            if report["keywords"]:
+                st.caption("Top keywords: " + ", ".join(term for term, _ in report["keywords"][:15]))
     else:
         st.info("Fetch data to see results here.")
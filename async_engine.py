@@ -0,0 +1,379 @@
+"""
+Asyncio fetch engine for Feedback Finder.
+Runs the same searches as FetchEngine, but on an event loop with aiohttp: the
+shards of a team search are paginated concurrently and the remarks on a page
+are translated concurrently, so many requests can be in flight without a
+thread each. Request slots still come from a RequestScheduler, which caps
+concurrency per workspace (token) and overall. Frontends hand coroutines to an
+EventLoopThread: the desktop app owns one, the web version shares one across
+sessions.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+import aiohttp
+import requests
+
+import metrics
+from cancellation import FetchCancelled
+from fetch_engine import INTERCOM_SEARCH_URL, TRANSLATION_CONCURRENCY, FetchEngine, extract_report_item
+from intercom_http import DEFAULT_DEADLINE, DEFAULT_TIMEOUT, MAX_RETRIES, RETRY_STATUSES, backoff_delay, retry_after_seconds
+from profiling import profile_run
+from scheduler import RequestScheduler
+
+# Connections each event loop keeps open to Intercom, across every run on it
+MAX_CONNECTIONS = int(os.environ.get("FDBK_ASYNC_MAX_CONNECTIONS", "100"))
+CANCEL_POLL_SECONDS = 0.2
+
+# Failures the async engine treats like requests.RequestException in the threaded one
+REQUEST_ERRORS = (requests.exceptions.RequestException, aiohttp.ClientError, asyncio.TimeoutError)
+
+_sessions = {}
+
+
+async def shared_session():
+    """One aiohttp session (and connection pool) per event loop"""
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS))
+        _sessions[loop] = session
+    return session
+
+
+class SearchResponse:
+    """A fully read response, shaped like the bits of requests.Response the engine uses"""
+
+    def __init__(self, status_code, text, headers):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {INTERCOM_SEARCH_URL}", response=self)
+
+
+async def send_with_retry_async(session, method, url, stats=None, timeout=DEFAULT_TIMEOUT, deadline=DEFAULT_DEADLINE, max_retries=MAX_RETRIES, **kwargs):
+    """Async send_with_retry: same retry, backoff and stats rules, on aiohttp"""
+    client_timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        retry_after = None
+        attempt_started = time.monotonic()
+        if stats:
+            stats.count("requests")
+        try:
+            async with session.request(method, url, timeout=client_timeout, **kwargs) as resp:
+                response = SearchResponse(resp.status, await resp.text(), resp.headers)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            timed_out = isinstance(e, asyncio.TimeoutError)
+            if stats and timed_out:
+                stats.count("timeouts")
+            metrics.observe_request(url, "timeout" if timed_out else "error")
+            if attempt >= max_retries:
+                raise
+            failure = e
+        else:
+            elapsed = time.monotonic() - attempt_started
+            if stats:
+                stats.record_latency(elapsed)
+            metrics.observe_request(url, response.status_code, elapsed)
+            if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                return response
+            retry_after = retry_after_seconds(response)
+            failure = None
+
+        delay = backoff_delay(attempt, retry_after)
+        if time.monotonic() - started + delay > deadline:
+            if failure is not None:
+                raise failure
+            return response
+        if stats:
+            stats.count("retries")
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def post_hedged_async(session, url, stats, hedge_slot=None, **kwargs):
+    """Async post_hedged; the losing request is cancelled instead of left running"""
+    hedge_after = stats.p95()
+    if hedge_after is None:
+        return await send_with_retry_async(session, "POST", url, stats, **kwargs)
+
+    first = asyncio.ensure_future(send_with_retry_async(session, "POST", url, stats, **kwargs))
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+
+    release = hedge_slot() if hedge_slot is not None else None
+    if hedge_slot is not None and release is None:
+        # No free scheduler slot for a duplicate; hedging must not exceed the caps
+        return await first
+    stats.count("hedges")
+    hedge = asyncio.ensure_future(send_with_retry_async(session, "POST", url, stats, **kwargs))
+    if release is not None:
+        hedge.add_done_callback(lambda _: release())
+    pending = {first, hedge}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        stats.count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class EventLoopThread:
+    """An event loop on a daemon thread that synchronous code hands coroutines to"""
+
+    def __init__(self, name="fetch-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, coro):
+        """Schedule a coroutine; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        """Run a coroutine on the loop and block until it finishes"""
+        return self.submit(coro).result()
+
+    def close(self):
+        """Close the loop's HTTP session and stop the loop"""
+        session = _sessions.pop(self.loop, None)
+        if session is not None and not session.closed:
+            self.run(session.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class AsyncFetchEngine(FetchEngine):
+    """FetchEngine whose pages, shards and translations run concurrently on an event loop"""
+
+    def __init__(self, token, emit, scheduler=None, **kwargs):
+        # Without a shared scheduler, a private one still bounds this workspace's requests
+        super().__init__(token, emit, scheduler=scheduler or RequestScheduler.from_env(), **kwargs)
+        self._translate_limit = None
+        # Conversation id -> (cluster id, is new), from clustering a page before it's processed
+        self._clustered = {}
+        # Cluster id -> translation task of a new cluster, while it runs
+        self._translating = {}
+        # Shard -> checkpoint write of its last processed page, made off the loop before the next fetch
+        self._unsaved_pages = {}
+        self._checkpoint_lock = None
+
+    def _save_page(self, shard, *page):
+        if self.checkpoint:
+            self._unsaved_pages[shard] = page
+
+    async def _flush_page(self, shard):
+        page = self._unsaved_pages.pop(shard, None)
+        if page is None:
+            return
+        if self._checkpoint_lock is None:
+            self._checkpoint_lock = asyncio.Lock()
+        # The append and fsync run on a worker thread, one shard at a time, so the shared loop keeps going
+        async with self._checkpoint_lock:
+            await asyncio.to_thread(self.checkpoint.record_page, shard, *page)
+
+    async def _post_search_async(self, payload):
+        body = json.dumps(payload)
+        queued = time.perf_counter()
+        async with self.scheduler.aslot(self.user_key, self.priority):
+            self.timings.record("queue_wait", time.perf_counter() - queued)
+            session = await shared_session()
+            with self.timings.time("http_wait"):
+                if self.hedge:
+                    return await post_hedged_async(session, INTERCOM_SEARCH_URL, self.stats,
+                                                   hedge_slot=self._hedge_slot(), headers=self.headers, data=body)
+                return await send_with_retry_async(session, "POST", INTERCOM_SEARCH_URL, stats=self.stats,
+                                                   headers=self.headers, data=body)
+
+    def translate_if_non_english(self, text, translator=None):
+        if translator is None and text not in self.translations_cache:
+            # _prefetch_translations already tried this one and failed; don't block the loop retrying
+            return text
+        return super().translate_if_non_english(text, translator)
+
+    def _add_to_cluster(self, convo, remark):
+        clustered = self._clustered.pop(convo.get("id"), None)
+        return clustered if clustered is not None else super()._add_to_cluster(convo, remark)
+
+    def _observe_translation(self, result):
+        # Counted per remark in _prefetch_translations, before processing reads the cache
+        pass
+
+    def _translate_blocking(self, text):
+        # GoogleTranslator keeps per-call state on the instance, so every call gets its own
+        self._check_cancelled()
+        return self.translate_if_non_english(text, self._new_translator())
+
+    async def _prefetch_translations(self, conversations):
+        """Translate a page's uncached remarks concurrently, so processing the page only hits the cache
+
+        The remarks are clustered here, once; processing the page picks the
+        cluster ids up instead of matching each remark again.
+        """
+        if not self.translate:
+            return
+        items = [(convo["id"], item["remark"]) for convo, item in zip(conversations, map(extract_report_item, conversations))
+                 if item is not None and item["remark"] and convo.get("id")]
+        if self.max_results is not None:
+            items = items[:max(0, self.max_results - len(self.results))]
+        hits = near = 0
+        pending = {}
+        waiting = set()
+        for convo_id, remark in items:
+            cluster_id, is_new = self._clustered[convo_id] = self.duplicates.add(remark)
+            if not is_new:
+                # Near-duplicates reuse their cluster's translation; another shard may still be fetching it
+                near += 1
+                if cluster_id in self._translating:
+                    waiting.add(asyncio.shield(self._translating[cluster_id]))
+            elif remark in self.translations_cache:
+                hits += 1
+                self._set_cluster_translation(cluster_id, remark)
+            else:
+                pending[cluster_id] = remark
+        metrics.translation_lookups.inc(hits, result="hit")
+        metrics.translation_lookups.inc(near, result="near_duplicate")
+        metrics.translation_lookups.inc(len(items) - hits - near, result="miss")
+        if not pending:
+            await asyncio.gather(*waiting)
+            return
+        if self._translate_limit is None:
+            self._translate_limit = asyncio.Semaphore(TRANSLATION_CONCURRENCY)
+
+        async def translate(cluster_id, text):
+            try:
+                async with self._translate_limit:
+                    await asyncio.to_thread(self._translate_blocking, text)
+                self._set_cluster_translation(cluster_id, text)
+            finally:
+                self._translating.pop(cluster_id, None)
+                self.progress.translation_done()
+
+        self.progress.translations_queued(len(pending))
+        self._emit_progress()
+        tasks = {cluster_id: asyncio.ensure_future(translate(cluster_id, text)) for cluster_id, text in pending.items()}
+        self._translating.update(tasks)
+        await asyncio.gather(*tasks.values(), *waiting)
+
+    def _set_cluster_translation(self, cluster_id, remark):
+        """Record a new cluster's translation as soon as it's known, for near-duplicates on other shards"""
+        translated = self.translations_cache.get(remark, remark)
+        self.cluster_translations[cluster_id] = None if translated == remark else translated
+
+    async def _paginate_async(self, payload, shard, batch_num=None):
+        """Async _paginate: fetch every page of one query, checkpointing after each page"""
+        prefix = f"Batch {batch_num} - " if batch_num else ""
+        page = self._start_shard(payload, shard, prefix)
+        if page is None:
+            return 0
+        found = 0
+        is_first_page = True
+
+        while not self.limit_reached():
+            self._check_cancelled()
+            try:
+                self._announce_page(prefix, page)
+                response = await self._post_search_async(payload)
+                self.page_calls += 1
+                response.raise_for_status()
+                with self.timings.time("json_decode"):
+                    data = response.json()
+
+                if is_first_page:
+                    self._on_first_page(data, shard, page, batch_num)
+                    is_first_page = False
+
+                await self._prefetch_translations(data.get("conversations", []))
+                page_found, has_next = self._process_page(data, payload, shard, page, batch_num)
+                # Remarks the result limit cut off were clustered but never processed
+                for convo in data.get("conversations", []):
+                    self._clustered.pop(convo.get("id"), None)
+                await self._flush_page(shard)
+                found += page_found
+                if not has_next:
+                    break
+                page += 1
+            except REQUEST_ERRORS as e:
+                self._report_api_error(e, payload, batch_num)
+                # Leave the shard unfinished so a resume picks up from this page
+                self.interrupted = True
+                break
+
+        return self._end_shard(found, batch_num)
+
+    async def _run_batch_async(self, payload, batch_num, num_batches):
+        self.emit(f"🦊 Processing batch {batch_num} of {num_batches}...")
+        return await self._paginate_async(payload, f"batch-{batch_num}", batch_num)
+
+    async def _search_async(self, admin_id, start_date_str, end_date_str, team_id, admin_map, team_map, team_admins_map):
+        base_filters = self._search_filters(admin_id, start_date_str, end_date_str, team_id, admin_map, team_map)
+        if base_filters is None:
+            return
+        # Planning is a handful of count probes; they run on the threaded client
+        shard_filters = await asyncio.to_thread(self._query_shards, admin_id, team_id, team_admins_map, base_filters)
+        if not shard_filters:
+            return
+
+        payloads = self._shard_payloads(shard_filters)
+        if len(payloads) > 1:
+            self._start_batches(len(payloads))
+            tasks = [asyncio.ensure_future(self._run_batch_async(payload, batch_num, len(payloads)))
+                     for batch_num, payload in enumerate(payloads, 1)]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    await task
+            finally:
+                for task in tasks:
+                    task.cancel()
+        else:
+            self.progress.set_shards(["main"], self._planned_counts(1))
+            await self._paginate_async(payloads[0], "main")
+        # Rollups, the trend store and clearing the checkpoint are blocking work: keep them off the loop
+        await asyncio.to_thread(self._report_finished, len(payloads) > 1)
+
+    async def _watch_cancel(self, task):
+        """Abandon in-flight requests as soon as the run's token is cancelled"""
+        while not task.done():
+            if self.cancel_token.cancelled:
+                task.cancel()
+                return
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+
+    async def run_api_search_async(self, admin_id, start_date_str, end_date_str, team_id=None, admin_map=None, team_map=None, team_admins_map=None,
+                                   ratings=None, max_results=None):
+        """Async run_api_search; call it on the loop that will run the fetch"""
+        self._start_run(ratings, max_results)
+        search = asyncio.ensure_future(self._search_async(admin_id, start_date_str, end_date_str, team_id,
+                                                          admin_map, team_map, team_admins_map))
+        watcher = asyncio.ensure_future(self._watch_cancel(search)) if self.cancel_token is not None else None
+        # cProfile mode profiles the loop thread; profiling falls back to sampling for overlapping runs
+        with profile_run(self.run_id, self.emit):
+            try:
+                await search
+            except (FetchCancelled, asyncio.CancelledError):
+                if self.cancel_token is None or not self.cancel_token.cancelled:
+                    raise
+                await asyncio.to_thread(self._on_cancelled)
+            finally:
+                if watcher is not None:
+                    watcher.cancel()
+        return self.results
@@ -0,0 +1,241 @@
+"""
+Fetch-throughput benchmarks against the local mock Intercom server.
+Starts mock_intercom.py in a subprocess, points the app at it with
+INTERCOM_API_BASE and drives the real fetch paths:
+
+  engine   FetchEngine.run_api_search (threaded, one request at a time)
+  async    AsyncFetchEngine.run_api_search_async on an EventLoopThread (web app path)
+  desktop  ModernIntercomApp.run_api_script (desktop app path, without a window)
+
+    python benchmark.py --conversations 200000 --team --latency lognormal:60,0.4
+    python benchmark.py --json results.json   # keep numbers for regression checks
+    python benchmark.py --smoke               # small, fast run that fails if any scenario breaks
+
+Translation runs against a local stand-in with a fixed delay (--translate-ms)
+so runs don't depend on Google Translate.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+SCENARIOS = ("engine", "async", "desktop")
+
+
+class LocalTranslator:
+    """Stands in for GoogleTranslator: marks non-English text as translated after a delay"""
+    delay = 0.0
+
+    def __init__(self, source="auto", target="en"):
+        pass
+
+    def translate(self, text):
+        time.sleep(self.delay)
+        if text.isascii():
+            return text
+        return f"[en] {text}"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_server(args, port):
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_intercom.py"),
+               "--port", str(port), "--conversations", str(args.conversations), "--admins", str(args.admins),
+               "--teams", str(args.teams), "--days", str(args.days), "--end-date", args.end_date,
+               "--remark-rate", str(args.remark_rate), "--latency", args.latency,
+               "--rate-limit", str(args.rate_limit), "--error-rate", str(args.error_rate),
+               "--body-bytes", str(args.body_bytes)]
+    server = subprocess.Popen(command)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base}/_mock/stats", timeout=1)
+            return server, base
+        except requests.exceptions.ConnectionError:
+            if server.poll() is not None:
+                raise RuntimeError("Mock server exited during startup")
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Mock server didn't start")
+
+
+def load_workspace(base, token):
+    """Teams and admins the way the frontends load them"""
+    headers = {"Authorization": f"Bearer {token}"}
+    teams = requests.get(f"{base}/teams", headers=headers).json()["teams"]
+    admins = requests.get(f"{base}/admins", headers=headers).json()["admins"]
+    team_admins_map = {team["id"]: [str(admin_id) for admin_id in team["admin_ids"]] for team in teams}
+    return teams, admins, team_admins_map
+
+
+class DesktopHarness:
+    """The state ModernIntercomApp.run_api_script reads, without a Tk window"""
+
+    def __init__(self, team_map, admin_map, team_admins_map, checkpoint_dir):
+        from async_engine import EventLoopThread
+        from checkpoints import CheckpointStore
+        from scheduler import RequestScheduler
+        from trends import TrendStore
+        from win8 import ModernIntercomApp
+
+        self.run_api_script = ModernIntercomApp.run_api_script.__get__(self)
+        self.log_queue = queue.Queue()
+        self.final_report_data = []
+        self.translations_cache = {}
+        self.team_map = team_map
+        self.admin_map = admin_map
+        self.team_admins_map = team_admins_map
+        self.checkpoint_store = CheckpointStore(checkpoint_dir)
+        # Kept with the checkpoints so benchmark runs don't touch the user's trend store
+        self.trend_store = TrendStore(os.path.join(checkpoint_dir, "trends.sqlite3"))
+        self.last_fetch = None
+        self.fetch_loop = EventLoopThread()
+        self.request_scheduler = RequestScheduler.from_env()
+        self.cancel_token = None
+
+
+def run_scenario(name, token, admin_id, team_id, args, team_map, admin_map, team_admins_map, loop_thread):
+    """Run one fetch; returns (remarks, client RequestStats or None)"""
+    from async_engine import AsyncFetchEngine
+    from fetch_engine import FetchEngine
+
+    def discard(message):
+        pass
+
+    if name == "engine":
+        engine = FetchEngine(token, discard, per_page=args.per_page)
+        results = engine.run_api_search(admin_id, args.start, args.end_date, team_id, admin_map, team_map, team_admins_map)
+        return len(results), engine.stats
+    if name == "async":
+        engine = AsyncFetchEngine(token, discard, per_page=args.per_page)
+        results = loop_thread.run(engine.run_api_search_async(admin_id, args.start, args.end_date, team_id,
+                                                              admin_map, team_map, team_admins_map))
+        return len(results), engine.stats
+    harness = DesktopHarness(team_map, admin_map, team_admins_map, tempfile.mkdtemp(prefix="fdbk-bench-"))
+    try:
+        harness.fetch_loop.run(harness.run_api_script(token, admin_id, args.start, args.end_date, team_id))
+    finally:
+        harness.fetch_loop.close()
+    return len(harness.final_report_data), None
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Feedback Finder fetches against a local mock Intercom")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--conversations", type=int, default=50000)
+    parser.add_argument("--admins", type=int, default=40)
+    parser.add_argument("--teams", type=int, default=4)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--end-date", default=time.strftime("%Y-%m-%d"))
+    parser.add_argument("--start", help="first day to fetch (default: the whole mock range)")
+    parser.add_argument("--team", action="store_true", help="fetch a whole team instead of one admin")
+    parser.add_argument("--per-page", type=int, default=50)
+    parser.add_argument("--remark-rate", type=float, default=0.35)
+    parser.add_argument("--latency", default="lognormal:60,0.4")
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--body-bytes", type=int, default=0)
+    parser.add_argument("--translate-ms", type=float, default=0.0)
+    parser.add_argument("--no-tracemalloc", action="store_true", help="skip peak memory tracking (it slows runs down)")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--smoke", action="store_true",
+                        help="small workspace without latency; exit non-zero unless every scenario finds the same remarks")
+    args = parser.parse_args()
+    if args.smoke:
+        args.conversations, args.days, args.latency, args.no_tracemalloc, args.team = 3000, 30, "none", True, True
+    if not args.start:
+        args.start = time.strftime("%Y-%m-%d", time.localtime(time.mktime(time.strptime(args.end_date, "%Y-%m-%d")) - (args.days - 1) * 86400))
+
+    port = free_port()
+    server, base = start_mock_server(args, port)
+    # Must be set before the engine modules are imported: they read it once
+    os.environ["INTERCOM_API_BASE"] = base
+    import fetch_engine
+    fetch_engine.GoogleTranslator = LocalTranslator
+    LocalTranslator.delay = args.translate_ms / 1000
+    from async_engine import EventLoopThread
+    if "desktop" in args.scenarios:
+        # Import the Tk app up front so its import time isn't counted in the run
+        import win8  # noqa: F401
+
+    token = "benchmark-token"
+    rows = []
+    loop_thread = EventLoopThread()
+    try:
+        teams, admins, team_admins_map = load_workspace(base, token)
+        team_map = {team["name"]: team["id"] for team in teams}
+        admin_map = {f"{admin['name']} ({admin['email']})": admin["id"] for admin in admins}
+        team_id = teams[0]["id"] if args.team else None
+        admin_id = None if args.team else admins[0]["id"]
+
+        for name in args.scenarios.split(","):
+            requests.post(f"{base}/_mock/reset")
+            if not args.no_tracemalloc:
+                tracemalloc.start()
+            started = time.monotonic()
+            remarks, client_stats = run_scenario(name, token, admin_id, team_id, args,
+                                                 team_map, admin_map, team_admins_map, loop_thread)
+            elapsed = time.monotonic() - started
+            peak = None
+            if not args.no_tracemalloc:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            server_stats = requests.get(f"{base}/_mock/stats").json()
+            latencies = list(client_stats.latencies) if client_stats else []
+            scanned = server_stats["conversations_served"]
+            rows.append({
+                "scenario": name,
+                "remarks": remarks,
+                "conversations": scanned,
+                "seconds": round(elapsed, 3),
+                "conversations_per_second": round(scanned / elapsed, 1) if elapsed else None,
+                "requests": sum(server_stats["requests"].values()),
+                "rate_limited": server_stats["rate_limited"],
+                "retries": client_stats.retries if client_stats else None,
+                # Client-side latency where the engine is reachable, otherwise as served by the mock
+                "p50_ms": round(1000 * (percentile(latencies, 0.5) if latencies else server_stats["latency_p50"] or 0), 1),
+                "p99_ms": round(1000 * (percentile(latencies, 0.99) if latencies else server_stats["latency_p99"] or 0), 1),
+                "latency_source": "client" if latencies else "server",
+                "peak_memory_mb": round(peak / 1024 ** 2, 1) if peak is not None else None,
+            })
+            row = rows[-1]
+            print(f"🦊 {name:8} {row['remarks']:>8} remarks  {row['conversations']:>8} convos  {row['seconds']:>8.2f}s  "
+                  f"{row['conversations_per_second']:>9} conv/s  {row['requests']:>6} req  {row['rate_limited']:>4} 429s  "
+                  f"{row['retries'] if row['retries'] is not None else '-':>4} retries  "
+                  f"p50 {row['p50_ms']}ms p99 {row['p99_ms']}ms ({row['latency_source']})  "
+                  f"peak {row['peak_memory_mb']} MB", flush=True)
+    finally:
+        loop_thread.close()
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": rows}, f, indent=2)
+    if args.smoke:
+        found = {row["scenario"]: row["remarks"] for row in rows}
+        if not all(found.values()) or len(set(found.values())) != 1:
+            sys.exit(f"❌ Smoke run failed: remarks per scenario {found}")
+        print(f"✅ Smoke run passed: every scenario found {rows[0]['remarks']} remarks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Cooperative cancellation for running fetches.
+The engine checks a CancelToken between pages, batches and translations, and
+waits on in-flight requests in short slices so a cancelled run is abandoned
+promptly instead of finishing its current request and backoff.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="cancellable")
+
+
+class FetchCancelled(Exception):
+    """Raised inside a fetch once its token has been cancelled"""
+
+
+class CancelToken:
+    """Shared flag between a UI and the fetch it started
+
+    A token with a parent is also cancelled when the parent is, e.g. one
+    request of a run that can be called off on its own.
+    """
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._parent = parent
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or (self._parent is not None and self._parent.cancelled)
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise FetchCancelled()
+
+    def sleep(self, seconds, poll_interval=0.2):
+        """Sleep that wakes up early (and raises) when cancelled"""
+        if self._parent is None:
+            if self._event.wait(seconds):
+                raise FetchCancelled()
+            return
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.raise_if_cancelled()
+            self._event.wait(min(poll_interval, deadline - time.monotonic()))
+        self.raise_if_cancelled()
+
+
+def call_cancellable(fn, token, *args, poll_interval=0.2, **kwargs):
+    """Run fn in a worker and stop waiting for it as soon as the token is cancelled"""
+    if token is None:
+        return fn(*args, **kwargs)
+    token.raise_if_cancelled()
+    future = _executor.submit(fn, *args, **kwargs)
+    while True:
+        try:
+            return future.result(timeout=poll_interval)
+        except FutureTimeoutError:
+            token.raise_if_cancelled()
@@ -0,0 +1,247 @@
+"""
+On-disk checkpoints for long-running fetches.
+Each run keeps a small JSON state file (per-shard cursors and completion flags)
+and append-only JSONL files of the records collected so far and of the ratings
+scanned without a remark (for the trend store), so an interrupted or crashed
+run can pick up where it stopped without refetching completed pages.
+
+A run being fetched holds a lease: a lock file with its process id, refreshed
+on every save. Leased runs aren't offered for resume and can't be opened a
+second time, so two writers never append to the same records file.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+CHECKPOINT_DIR = os.environ.get("FDBK_CHECKPOINT_DIR") or os.path.join(os.path.expanduser("~"), ".fdbckfndr", "checkpoints")
+CHECKPOINT_VERSION = 1
+# A lease from another process counts as abandoned once it's this old (its run crashed)
+LEASE_STALE_SECONDS = 300
+
+# Run keys leased by this process; another process' leases are judged by their lock file
+_leased = set()
+_leased_lock = threading.Lock()
+
+
+class RunInProgress(RuntimeError):
+    """The run is already being fetched (in this process or another one)"""
+
+# Query fields that identify a run; anything else in the query is descriptive
+_IDENTITY_FIELDS = ("user_key", "admin_id", "team_id", "start_date", "end_date")
+# Identify a run only when set, so checkpoints from before these options keep their keys
+_OPTIONAL_IDENTITY_FIELDS = ("ratings", "max_results")
+
+
+def make_run_query(user_key, admin_id, team_id, start_date, end_date, team_admin_ids=None, label="",
+                   ratings=None, max_results=None):
+    """Describe a run for checkpointing; team admins are pinned so batches line up on resume"""
+    return {
+        "user_key": user_key,
+        "admin_id": admin_id,
+        "team_id": team_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "team_admin_ids": list(team_admin_ids or []),
+        "label": label,
+        "ratings": ratings,
+        "max_results": max_results
+    }
+
+
+def run_key_for(query):
+    """Stable checkpoint key for a query"""
+    identity = {field: query.get(field) for field in _IDENTITY_FIELDS}
+    identity.update({field: query[field] for field in _OPTIONAL_IDENTITY_FIELDS if query.get(field)})
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode("utf-8")).hexdigest()[:20]
+
+
+def _append_lines(path, items):
+    """Append items as JSON lines and fsync; returns the file's new size"""
+    with open(path, "a", encoding="utf-8") as f:
+        for item in items:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def _read_lines(path, size):
+    """JSON lines of a file, up to the size the last saved state recorded"""
+    if not os.path.exists(path):
+        return []
+    # Drop anything written after the last saved state (e.g. a crash mid-page)
+    with open(path, "r+", encoding="utf-8") as f:
+        f.truncate(size)
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class Checkpoint:
+    """Progress of one run; shards are single queries or admin batches"""
+
+    def __init__(self, store, run_key, state):
+        self.store = store
+        self.run_key = run_key
+        self.state = state
+
+    @property
+    def query(self):
+        return self.state["query"]
+
+    def shard(self, name):
+        """Saved progress for a shard: cursor to resume from, next page number, done flag"""
+        return self.state["shards"].get(name, {"cursor": None, "page": 1, "done": False})
+
+    def load_results(self):
+        """Records collected by earlier attempts of this run"""
+        return _read_lines(self.store.records_path(self.run_key), self.state["records_bytes"])
+
+    def load_ratings(self):
+        """Ratings without a remark seen by earlier attempts; None if the checkpoint predates keeping them"""
+        if "ratings_bytes" not in self.state:
+            return None
+        return _read_lines(self.store.ratings_path(self.run_key), self.state["ratings_bytes"])
+
+    def record_page(self, shard_name, items, next_cursor, next_page, unremarked=()):
+        """Persist a finished page: its records and ratings without a remark, then the cursor to continue from"""
+        if items:
+            self.state["records_bytes"] = _append_lines(self.store.records_path(self.run_key), items)
+            self.state["records_count"] += len(items)
+        if unremarked and "ratings_bytes" in self.state:
+            self.state["ratings_bytes"] = _append_lines(self.store.ratings_path(self.run_key), unremarked)
+        self.state["shards"][shard_name] = {
+            "cursor": next_cursor,
+            "page": next_page,
+            "done": next_cursor is None
+        }
+        self.save()
+
+    def save(self):
+        self.state["updated_at"] = time.time()
+        self.store.write_state(self.run_key, self.state)
+        self.store.renew_lease(self.run_key)
+
+    def complete(self):
+        """The run finished cleanly; nothing left to resume"""
+        self.store.discard(self.run_key)
+        self.release()
+
+    def release(self):
+        """The run stopped (finished, interrupted or crashed); it can be resumed again"""
+        self.store.release_lease(self.run_key)
+
+
+class CheckpointStore:
+    """Directory of run checkpoints"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or CHECKPOINT_DIR
+        os.makedirs(self.directory, exist_ok=True)
+
+    def state_path(self, run_key):
+        return os.path.join(self.directory, f"{run_key}.json")
+
+    def records_path(self, run_key):
+        return os.path.join(self.directory, f"{run_key}.records.jsonl")
+
+    def ratings_path(self, run_key):
+        return os.path.join(self.directory, f"{run_key}.ratings.jsonl")
+
+    def lock_path(self, run_key):
+        return os.path.join(self.directory, f"{run_key}.lock")
+
+    def open(self, query, resume=False):
+        """Checkpoint for a query, leased until it's released; resume keeps earlier progress, otherwise start over
+
+        Raises RunInProgress if the run is already being fetched.
+        """
+        run_key = run_key_for(query)
+        self.acquire_lease(run_key)
+        state = self._read_state(run_key) if resume else None
+        if state is None:
+            self.discard(run_key)
+            now = time.time()
+            state = {
+                "version": CHECKPOINT_VERSION,
+                "query": query,
+                "shards": {},
+                "records_count": 0,
+                "records_bytes": 0,
+                "ratings_bytes": 0,
+                "created_at": now,
+                "updated_at": now
+            }
+        checkpoint = Checkpoint(self, run_key, state)
+        checkpoint.save()
+        return checkpoint
+
+    def list_interrupted(self, user_key=None):
+        """States of runs that can be resumed, newest first"""
+        states = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            state = self._read_state(name[:-len(".json")])
+            if state is None:
+                continue
+            if user_key is not None and state["query"].get("user_key") != user_key:
+                continue
+            if self.is_leased(name[:-len(".json")]):
+                # Still being fetched, e.g. by another session with the same token
+                continue
+            states.append(state)
+        return sorted(states, key=lambda s: s["updated_at"], reverse=True)
+
+    def acquire_lease(self, run_key):
+        with _leased_lock:
+            if self.is_leased(run_key):
+                raise RunInProgress("This run is already being fetched; wait for it to finish or cancel it first.")
+            _leased.add(run_key)
+            self.renew_lease(run_key)
+
+    def renew_lease(self, run_key):
+        if run_key in _leased:
+            with open(self.lock_path(run_key), "w", encoding="utf-8") as f:
+                json.dump({"pid": os.getpid(), "renewed_at": time.time()}, f)
+
+    def release_lease(self, run_key):
+        with _leased_lock:
+            _leased.discard(run_key)
+            if os.path.exists(self.lock_path(run_key)):
+                os.remove(self.lock_path(run_key))
+
+    def is_leased(self, run_key):
+        """Whether a live run holds the checkpoint"""
+        if run_key in _leased:
+            return True
+        try:
+            with open(self.lock_path(run_key), "r", encoding="utf-8") as f:
+                lease = json.load(f)
+        except (OSError, ValueError):
+            return False
+        # This process' own leases are all in _leased; a leftover lock file is from a crashed run
+        return lease.get("pid") != os.getpid() and time.time() - lease.get("renewed_at", 0) < LEASE_STALE_SECONDS
+
+    def discard(self, run_key):
+        for path in (self.state_path(run_key), self.records_path(run_key), self.ratings_path(run_key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def write_state(self, run_key, state):
+        path = self.state_path(run_key)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _read_state(self, run_key):
+        try:
+            with open(self.state_path(run_key), "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("version") != CHECKPOINT_VERSION:
+            return None
+        return state
@@ -0,0 +1,147 @@
+"""
+Near-duplicate grouping of remarks with MinHash and LSH.
+Reports are full of remarks that only differ in case, punctuation or a word
+or two ("Thanks!!", "thanks", "Great support, thank you"). The fetch engines
+put every remark through a NearDuplicateIndex as it arrives. A remark close
+enough to one seen before joins that cluster and reuses its translation, and
+AI analysis only sees one representative per cluster with its count as a
+weight. Short remarks are grouped by their normalized text; longer ones by
+MinHash signatures of character shingles, banded for LSH lookups and verified
+against the estimated Jaccard similarity. Signatures live in one matrix so a
+lookup scores all of its candidates in a single numpy comparison, and LSH
+buckets stop growing at MAX_BUCKET clusters so very common remarks don't turn
+every lookup into a scan of the whole index.
+"""
+import re
+import threading
+import zlib
+
+import numpy as np
+
+# Estimated Jaccard similarity at or above which two remarks are near-duplicates
+SIMILARITY_THRESHOLD = 0.8
+# 16 bands of 8 rows: remarks at 0.8 similarity share a band ~95% of the time, at 0.5 ~6%
+NUM_PERM = 128
+BANDS = 16
+# Clusters an LSH bucket holds; later ones are still found through their other bands
+MAX_BUCKET = 256
+SHINGLE_SIZE = 4
+# Remarks with fewer words than this only group with identical normalized text
+MIN_WORDS = 4
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(42)
+_A = _rng.integers(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+_REPEATS_RE = re.compile(r"(\w)\1{2,}")
+
+
+def normalize(text):
+    """Lowercase, no punctuation, runs of a letter capped at two ("thanksss" -> "thankss"), single spaces"""
+    text = _PUNCTUATION_RE.sub(" ", str(text).lower())
+    return " ".join(_REPEATS_RE.sub(r"\1\1", text).split())
+
+
+def signature(normalized):
+    """MinHash signature of a normalized remark's character shingles"""
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # (a*x + b) mod p for every permutation, then the minimum over shingles
+    return ((np.outer(hashes, _A) + _B) % _MERSENNE).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """Incremental clustering: add() each remark, get back its cluster id"""
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, bands=BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.representatives = []  # cluster id -> first remark seen
+        self.counts = []
+        self._exact = {}
+        self._signatures = np.zeros((64, NUM_PERM), dtype=np.uint64)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.representatives)
+
+    def _band_keys(self, sig):
+        return [(band, sig[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _find(self, normalized, sig):
+        cluster = self._exact.get(normalized)
+        if cluster is not None or sig is None:
+            return cluster
+        candidates = {c for key in self._band_keys(sig) for c in self._buckets.get(key, ())}
+        if not candidates:
+            return None
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = (self._signatures[candidates] == sig).mean(axis=1)
+        best = int(similarities.argmax())
+        return int(candidates[best]) if similarities[best] >= self.threshold else None
+
+    def _prepare(self, text):
+        normalized = normalize(text)
+        sig = signature(normalized) if len(normalized.split()) >= MIN_WORDS else None
+        return normalized, sig
+
+    def match(self, text):
+        """Cluster id of a near-duplicate already in the index, or None"""
+        normalized, sig = self._prepare(text)
+        with self._lock:
+            return self._find(normalized, sig)
+
+    def add(self, text):
+        """Returns (cluster id, True if the remark started a new cluster)"""
+        normalized, sig = self._prepare(text)
+        with self._lock:
+            cluster = self._find(normalized, sig)
+            if cluster is not None:
+                self.counts[cluster] += 1
+                self._exact.setdefault(normalized, cluster)
+                return cluster, False
+            cluster = len(self.representatives)
+            self.representatives.append(text)
+            self.counts.append(1)
+            self._exact[normalized] = cluster
+            if sig is not None:
+                if cluster >= len(self._signatures):
+                    grown = np.zeros((max(2 * len(self._signatures), cluster + 1), NUM_PERM), dtype=np.uint64)
+                    grown[:len(self._signatures)] = self._signatures
+                    self._signatures = grown
+                self._signatures[cluster] = sig
+                for key in self._band_keys(sig):
+                    bucket = self._buckets.setdefault(key, [])
+                    if len(bucket) < MAX_BUCKET:
+                        bucket.append(cluster)
+            return cluster, True
+
+
+def assign_clusters(records, text_key="remark"):
+    """Give records without a cluster_id one (e.g. loaded from older checkpoints); returns the index"""
+    index = NearDuplicateIndex()
+    for record in records:
+        record["cluster_id"] = index.add(record[text_key] or "")[0]
+    return index
+
+
+def weighted_remarks(records):
+    """(remark text, count) per near-duplicate cluster, in order of first appearance
+
+    The text is the first member's translation when it has one. Records
+    without a cluster_id count as clusters of their own.
+    """
+    groups = {}
+    for i, record in enumerate(records):
+        key = record.get("cluster_id", f"record-{i}")
+        if key in groups:
+            groups[key][1] += 1
+        else:
+            groups[key] = [record.get("translated_remark", record["remark"]), 1]
+    return [tuple(group) for group in groups.values()]
@@ -0,0 +1,792 @@
+"""
+Intercom fetch engine for Feedback Finder.
+Runs conversation searches without touching any UI, so a fetch can be driven
+from a background job. Progress is reported through an ``emit`` callable using
+the same message protocol as the desktop app's log queue: plain strings are log
+lines, tuples are status updates (``("CURRENT_ACTIVITY", ...)``,
+``("PROGRESS_UPDATE", snapshot)`` from a ProgressModel, ...).
+"""
+import json
+import math
+import time
+from datetime import datetime, timedelta
+
+import requests
+from deep_translator import GoogleTranslator
+
+import metrics
+from cancellation import FetchCancelled, call_cancellable
+from dedupe import NearDuplicateIndex
+from intercom_http import INTERCOM_API_BASE, RequestStats, post_hedged, send_with_retry
+from live import LiveAggregates
+from profiling import new_run_id, profile_run
+from progress import ProgressModel
+from query_planner import QueryPlan, QueryPlanner
+from rollups import assignee_id, compute_rollups
+from scheduler import BULK_PAGE_THRESHOLD, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from timings import StageTimings, format_stage_table
+from trends import trend_scope
+
+INTERCOM_SEARCH_URL = f"{INTERCOM_API_BASE}/conversations/search"
+
+# Conversations pulled by a preview to estimate the remark and cache hit rates
+PREVIEW_SAMPLE_SIZE = 25
+# Fallbacks for wall-time estimates, in seconds
+DEFAULT_PAGE_SECONDS = 1.5
+TRANSLATION_SECONDS = 0.4
+# deep_translator is blocking, so the async engine translates in worker threads, this many per run
+TRANSLATION_CONCURRENCY = 8
+# Live aggregates go to the UI at most this often (and once more when the run ends)
+LIVE_INTERVAL_SECONDS = 0.5
+ALL_RATINGS = [1, 2, 3, 4, 5]
+
+
+def normalize_ratings(ratings):
+    """Sorted rating subset to search for, or None for every rating"""
+    subset = sorted({int(rating) for rating in ratings or []} & set(ALL_RATINGS))
+    return subset if subset and subset != ALL_RATINGS else None
+
+
+def describe_ratings(ratings):
+    return "all ratings" if not ratings else "/".join(str(rating) for rating in ratings) + "★"
+
+
+def build_base_filters(start_date_str, end_date_str, ratings=None):
+    """Date range and rating filters shared by every search; raises ValueError on bad dates
+
+    Intercom's search can't filter on whether a rating has a remark, so that
+    part stays client-side; the rating subset is pushed into the query.
+    """
+    start_ts = str(int(datetime.strptime(start_date_str, "%Y-%m-%d").timestamp()))
+    end_date_dt = datetime.strptime(end_date_str, "%Y-%m-%d") + timedelta(days=1)
+    end_ts = str(int(end_date_dt.timestamp()))
+    return [
+        {"field": "created_at", "operator": ">", "value": start_ts},
+        {"field": "created_at", "operator": "<", "value": end_ts},
+        {"field": "conversation_rating.score", "operator": "IN", "value": normalize_ratings(ratings) or ALL_RATINGS}
+    ]
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60}s"
+    return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+
+
+def describe_preview(estimate):
+    """Human-readable lines for a preview estimate, shared by both frontends"""
+    lines = []
+    if estimate["plan"]:
+        lines.append(f"Plan: {estimate['plan']}")
+    lines.append(f"Conversations to scan: {estimate['conversations']} across {estimate['shards']} "
+                 f"quer{'ies' if estimate['shards'] != 1 else 'y'}")
+    lines.append(f"API calls: ~{estimate['api_calls']} ({estimate['page_calls']} page{'s' if estimate['page_calls'] != 1 else ''})")
+    lines.append(f"Expected remarks: ~{estimate['expected_remarks']} | Translation calls: ~{estimate['translation_calls']} "
+                 f"({estimate['cache_hit_rate']:.0%} cached)")
+    wall = f"Estimated time: ~{format_duration(estimate['estimated_seconds'])}"
+    if estimate["scheduler_slowdown"] > 1:
+        wall += f" (server busy, x{estimate['scheduler_slowdown']:.1f})"
+    lines.append(wall)
+    return lines
+
+
+def describe_progress(snapshot):
+    """One-line progress summary for a PROGRESS_UPDATE snapshot, shared by both frontends"""
+    approx = "~" if snapshot["estimated"] else ""
+    parts = [f"Scanned {snapshot['scanned']} / {approx}{snapshot['total']} conversations"]
+    if snapshot["rate"]:
+        parts.append(f"{snapshot['rate']:.1f} conv/s")
+    parts.append(f"ETR {format_duration(snapshot['etr'])}" if snapshot["etr"] is not None else "ETR calculating...")
+    if snapshot["translation_backlog"]:
+        parts.append(f"{snapshot['translation_backlog']} translations queued")
+    return " | ".join(parts)
+
+
+def extract_report_item(convo):
+    """Return the report fields for a conversation, or None if it has no remark"""
+    rating_data = convo.get("conversation_rating")
+    if not rating_data or rating_data.get("remark") is None:
+        return None
+    return {
+        "id": convo.get('id', 'Unknown'),
+        "rating": rating_data.get('rating', 'N/A'),
+        "date": convo.get('created_at', 0),
+        "remark": rating_data.get('remark'),
+        # Kept so per-admin and per-team rollups don't need another crawl
+        "admin_assignee_id": assignee_id(convo.get('admin_assignee_id')),
+        "team_assignee_id": assignee_id(convo.get('team_assignee_id'))
+    }
+
+
+def extract_rating(convo):
+    """Rating, date and assignees of a rated conversation without a remark, shaped like a report item"""
+    rating_data = convo.get("conversation_rating")
+    if not rating_data:
+        return None
+    return {
+        "rating": rating_data.get('rating', 'N/A'),
+        "date": convo.get('created_at', 0),
+        "admin_assignee_id": assignee_id(convo.get('admin_assignee_id')),
+        "team_assignee_id": assignee_id(convo.get('team_assignee_id'))
+    }
+
+
+class FetchEngine:
+    """Paginates Intercom conversation searches and collects rated remarks"""
+
+    def __init__(self, token, emit, translations_cache=None, results=None, per_page=49, scheduler=None, user_key=None, checkpoint=None, hedge=False, cancel_token=None,
+                 trend_store=None, translate=True):
+        self.token = token
+        # Every message goes through _dispatch so time spent handing off to the UI is measured
+        self._sink = emit
+        self.emit = self._dispatch
+        self.timings = StageTimings()
+        # Optional CancelToken checked between pages, batches and translations
+        self.cancel_token = cancel_token
+        self.cancelled = False
+        # Hedged search requests trade a little extra load for shorter tail latency
+        self.hedge = hedge
+        self.stats = RequestStats()
+        # Optional Checkpoint; progress is saved after every page so the run can be resumed
+        self.checkpoint = checkpoint
+        # Optional TrendStore that clean runs add their daily rating counts to
+        self.trend_store = trend_store
+        self.search_range = None
+        # Trend backfills only need ratings, not translated remarks
+        self.translate = translate
+        # Per-run search options: rating subset (None = all) and an early-stop remark limit
+        self.ratings = None
+        self.max_results = None
+        self.interrupted = False
+        self.start_time = time.monotonic()
+        self.plan = None
+        self.plan_probes = 0
+        self.page_calls = 0
+        self.run_id = None
+        self.progress = ProgressModel(per_page, TRANSLATION_SECONDS / TRANSLATION_CONCURRENCY)
+        # Near-duplicate clusters of this run's remarks, and each cluster's translation (None if English)
+        self.duplicates = NearDuplicateIndex()
+        self.cluster_translations = {}
+        # Histogram, CSAT, per-day counts and top terms, updated page by page
+        self.live = LiveAggregates()
+        self._live_emitted_at = 0.0
+        # Ratings of scanned conversations without a remark; None if a resumed checkpoint didn't keep them
+        self.unremarked_ratings = []
+        # Optional shared RequestScheduler; without one requests go out directly
+        self.scheduler = scheduler
+        self.user_key = user_key or "anonymous"
+        self.priority = PRIORITY_INTERACTIVE
+        self.translations_cache = translations_cache if translations_cache is not None else {}
+        # Results are appended as they arrive so callers can read partial data mid-run
+        self.results = results if results is not None else []
+        # Count/CSAT rollups by admin, team, day and week, computed once the run finishes
+        self.rollups = None
+        self.per_page = per_page
+        self.translator = self._new_translator()
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/json",
+            "Content-Type": "application/json"
+        }
+
+    def _new_translator(self):
+        return GoogleTranslator(source='auto', target='en')
+
+    def translate_if_non_english(self, text, translator=None):
+        """Translate text if not English"""
+        if not text:
+            return text
+        try:
+            if text in self.translations_cache:
+                self._observe_translation("hit")
+                with self.timings.time("translate_cache"):
+                    return self.translations_cache[text]
+            self._observe_translation("miss")
+            with self.timings.time("translate_network"):
+                translated = (translator or self.translator).translate(text)
+            if translated.lower() == text.lower():
+                self.translations_cache[text] = text
+                return text
+            self.translations_cache[text] = translated
+            self.emit(f"🦊 Translation: {translated[:60]}{'...' if len(translated) > 60 else ''}")
+            return translated
+        except Exception as e:
+            self.emit(f"🦊 Translation error (no worries, using original): {e}")
+            return text
+
+    def _observe_translation(self, result):
+        metrics.translation_lookups.inc(result=result)
+
+    def _dispatch(self, message):
+        started = time.perf_counter()
+        self._sink(message)
+        self.timings.record("dispatch", time.perf_counter() - started)
+
+    def _send_search(self, payload):
+        body = json.dumps(payload)
+        if self.hedge:
+            return call_cancellable(post_hedged, self.cancel_token, INTERCOM_SEARCH_URL, self.stats,
+                                    hedge_slot=self._hedge_slot(), headers=self.headers, data=body,
+                                    cancel_token=self.cancel_token)
+        return call_cancellable(send_with_retry, self.cancel_token, "POST", INTERCOM_SEARCH_URL, stats=self.stats,
+                                headers=self.headers, data=body, cancel_token=self.cancel_token)
+
+    def _hedge_slot(self):
+        """How a hedged request gets a scheduler slot for its duplicate; None without a scheduler"""
+        if self.scheduler is None:
+            return None
+        return lambda: self.scheduler.try_acquire(self.user_key, self.priority)
+
+    def _check_cancelled(self):
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+
+    def _post_search(self, payload):
+        """POST a search page, waiting for a scheduler slot when one is configured"""
+        if self.scheduler is None:
+            with self.timings.time("http_wait"):
+                return self._send_search(payload)
+        queued = time.perf_counter()
+        with self.scheduler.slot(self.user_key, self.priority):
+            self.timings.record("queue_wait", time.perf_counter() - queued)
+            with self.timings.time("http_wait"):
+                return self._send_search(payload)
+
+    def _build_report_item(self, convo):
+        with self.timings.time("extract"):
+            report_item = extract_report_item(convo)
+        if report_item is None:
+            return None
+        self._check_cancelled()
+        cluster_id, is_new = self._add_to_cluster(convo, report_item["remark"])
+        report_item["cluster_id"] = cluster_id
+        if not self.translate:
+            return report_item
+        if is_new:
+            translated_remark = self.translate_if_non_english(report_item["remark"])
+            if translated_remark == report_item["remark"]:
+                translated_remark = None
+            self.cluster_translations[cluster_id] = translated_remark
+        else:
+            # Near-duplicates reuse their cluster's translation instead of another translator call
+            self._observe_translation("near_duplicate")
+            translated_remark = self.cluster_translations.get(cluster_id)
+        if translated_remark:
+            report_item["translated_remark"] = translated_remark
+        return report_item
+
+    def _add_to_cluster(self, convo, remark):
+        """(cluster id, True if new) for a remark about to join the results"""
+        return self.duplicates.add(remark)
+
+    def _next_page(self, data, payload):
+        """Advance the payload cursor; return False when there are no more pages"""
+        pages_data = data.get("pages", {})
+        if not pages_data.get("next"):
+            return False
+        next_cursor = pages_data["next"].get("starting_after")
+        if not next_cursor:
+            return False
+        payload["pagination"] = {"per_page": self.per_page, "starting_after": next_cursor}
+        return True
+
+    def _report_api_error(self, e, payload, batch_num=None):
+        where = f" in batch {batch_num}" if batch_num else ""
+        self.emit(f"❌ 🦊 Oof! INTERCOM API ERROR{where}: {e}")
+        if getattr(e, 'response', None) is not None:
+            try:
+                self.emit(f"Error response: {json.dumps(e.response.json(), indent=2)}")
+            except ValueError:
+                self.emit(f"Error details: {e.response.text}")
+            self.emit(f"Request payload was: {json.dumps(payload, indent=2)}")
+
+    def _start_shard(self, payload, shard, prefix):
+        """Apply checkpointed progress to the payload; returns the first page, or None if already done"""
+        if not self.checkpoint:
+            return 1
+        saved = self.checkpoint.shard(shard)
+        if saved["done"]:
+            self.emit(f"🦊 {prefix}Already fetched in an earlier attempt, skipping.")
+            self.progress.shard_done(shard)
+            return None
+        if saved["cursor"]:
+            payload["pagination"] = {"per_page": self.per_page, "starting_after": saved["cursor"]}
+            self.emit(f"🦊 {prefix}Resuming from page {saved['page']}...")
+            return saved["page"]
+        return 1
+
+    def _announce_page(self, prefix, page):
+        page_msg = f"🦊 {prefix}Fetching page {page}..."
+        self.emit(page_msg)
+        self.emit(("CURRENT_ACTIVITY", page_msg))
+
+    def _on_first_page(self, data, shard, page, batch_num):
+        """Read the query size from its first page"""
+        total_pages = data.get('pages', {}).get('total_pages', 1)
+        if total_pages > BULK_PAGE_THRESHOLD:
+            # Long crawls yield to other users' interactive lookups
+            self.priority = PRIORITY_BULK
+        total_convos = data.get('total_count', 0)
+        # A resumed shard already scanned the pages before this one
+        self.progress.shard_started(shard, total_convos, min((page - 1) * self.per_page, total_convos))
+        if not batch_num:
+            self.emit(f"✅ 🦊 Nice! Found {total_convos} total conversations across {total_pages} pages. Time to dig in!")
+        self._emit_progress()
+
+    def _emit_progress(self):
+        self.emit(("PROGRESS_UPDATE", self.progress.snapshot()))
+
+    def _emit_live(self, force=False):
+        now = time.monotonic()
+        if force or now - self._live_emitted_at >= LIVE_INTERVAL_SECONDS:
+            self._live_emitted_at = now
+            self.emit(("LIVE_AGGREGATES", self.live.snapshot()))
+
+    def _process_page(self, data, payload, shard, page, batch_num):
+        """Collect one page's remarks and checkpoint it; returns (remarks found, has next page)"""
+        prefix = f"Batch {batch_num} - " if batch_num else ""
+        conversations = data.get("conversations", [])
+        if not conversations:
+            if not batch_num:
+                self.emit("🦊 No more conversations to hunt. We got 'em all!")
+            self._save_page(shard, [], None, page)
+            self.progress.shard_done(shard)
+            self._emit_progress()
+            return 0, False
+
+        process_msg = f"🦊 {prefix}Processing {len(conversations)} conversations from page {page}..."
+        self.emit(process_msg)
+        self.emit(("CURRENT_ACTIVITY", process_msg))
+
+        page_items = []
+        page_unremarked = []
+        scanned = 0
+        for idx, convo in enumerate(conversations, 1):
+            if self.limit_reached():
+                break
+            scanned = idx
+            convo_id = convo.get('id', 'Unknown')
+            report_item = self._build_report_item(convo)
+            if report_item is not None:
+                convo_date = report_item["date"]
+                remark = report_item["remark"]
+                readable_date = datetime.fromtimestamp(convo_date).strftime('%Y-%m-%d %H:%M') if convo_date else 'N/A'
+                self.emit(f"  🦊 {prefix}Conversation {idx}/{len(conversations)} (ID: {convo_id[:8]}...): Rating {report_item['rating']}, Date: {readable_date}")
+                if not batch_num:
+                    self.emit(f"    Processing remark: {remark[:80]}{'...' if len(remark) > 80 else ''}")
+                self.results.append(report_item)
+                page_items.append(report_item)
+            else:
+                # Every scanned conversation is rated; the trend store's CSAT counts the ones without a remark too
+                rating = extract_rating(convo)
+                if rating is not None:
+                    page_unremarked.append(rating)
+                if not batch_num:
+                    self.emit(f"  ○ Conversation {idx}/{len(conversations)} (ID: {convo_id[:8]}...): No remark found (nothing to see here)")
+
+        if self.unremarked_ratings is not None:
+            self.unremarked_ratings.extend(page_unremarked)
+        metrics.observe_records(len(page_items), scanned)
+        if page_items:
+            with self.timings.time("live_aggregates"):
+                self.live.add(page_items)
+            self._emit_live()
+        self.progress.page_done(shard, scanned, len(page_items))
+        if not batch_num:
+            self.emit(f"✅ 🦊 Page {page} complete! Found {len(page_items)} remarks out of {scanned} conversations. Nice catch!")
+            self.emit(("CURRENT_PAGE_INFO", f"Page {page}: {len(page_items)} remarks found out of {scanned} conversations"))
+
+        has_next = self._next_page(data, payload) and not self.limit_reached()
+        if not has_next:
+            self.progress.shard_done(shard)
+        self._emit_progress()
+        next_cursor = payload["pagination"].get("starting_after") if has_next else None
+        self._save_page(shard, page_items, next_cursor, page + 1, page_unremarked)
+        return len(page_items), has_next
+
+    def _save_page(self, shard, items, next_cursor, next_page, unremarked=()):
+        """Checkpoint a processed page before the next one is fetched"""
+        if self.checkpoint:
+            self.checkpoint.record_page(shard, items, next_cursor, next_page, unremarked)
+
+    def limit_reached(self):
+        return self.max_results is not None and len(self.results) >= self.max_results
+
+    def _end_shard(self, found, batch_num):
+        if batch_num:
+            self.emit(f"✅ 🦊 Batch {batch_num} complete! Found {found} remarks. Nice catch!")
+        return found
+
+    def _paginate(self, payload, shard, batch_num=None):
+        """Fetch every page of one query, checkpointing after each page"""
+        prefix = f"Batch {batch_num} - " if batch_num else ""
+        page = self._start_shard(payload, shard, prefix)
+        if page is None:
+            return 0
+        found = 0
+        is_first_page = True
+
+        while not self.limit_reached():
+            self._check_cancelled()
+            try:
+                self._announce_page(prefix, page)
+                response = self._post_search(payload)
+                self.page_calls += 1
+                response.raise_for_status()
+                with self.timings.time("json_decode"):
+                    data = response.json()
+
+                if is_first_page:
+                    self._on_first_page(data, shard, page, batch_num)
+                    is_first_page = False
+
+                page_found, has_next = self._process_page(data, payload, shard, page, batch_num)
+                found += page_found
+                if not has_next:
+                    break
+                page += 1
+            except requests.exceptions.RequestException as e:
+                self._report_api_error(e, payload, batch_num)
+                # Leave the shard unfinished so a resume picks up from this page
+                self.interrupted = True
+                break
+
+        return self._end_shard(found, batch_num)
+
+    def process_query_batch(self, payload, batch_num):
+        """Process a single batch query"""
+        return self._paginate(payload, f"batch-{batch_num}", batch_num)
+
+    def run_single_query(self, payload):
+        """Process a single query with pagination"""
+        return self._paginate(payload, "main")
+
+    def run_api_search(self, admin_id, start_date_str, end_date_str, team_id=None, admin_map=None, team_map=None, team_admins_map=None,
+                       ratings=None, max_results=None):
+        """Run the API search and return the collected results
+
+        ratings limits the search to those scores; max_results stops paging
+        as soon as that many remarks were collected.
+        """
+        self._start_run(ratings, max_results)
+        with profile_run(self.run_id, self.emit):
+            try:
+                self._search(admin_id, start_date_str, end_date_str, team_id, admin_map, team_map, team_admins_map)
+            except FetchCancelled:
+                self._on_cancelled()
+        return self.results
+
+    def _start_run(self, ratings=None, max_results=None):
+        """Reset per-run state and reload results saved by an interrupted attempt"""
+        self.ratings = normalize_ratings(ratings)
+        self.max_results = max_results or None
+        self.run_id = new_run_id(self.checkpoint.run_key[:12] if self.checkpoint else "")
+        self.start_time = time.monotonic()
+        self.interrupted = False
+        self.cancelled = False
+        self.plan = None
+        self.search_range = None
+        self.page_calls = 0
+        self.progress = ProgressModel(self.per_page, TRANSLATION_SECONDS / TRANSLATION_CONCURRENCY, self.max_results)
+        self.duplicates = NearDuplicateIndex()
+        self.cluster_translations = {}
+        self.live = LiveAggregates()
+        self._live_emitted_at = 0.0
+        self.unremarked_ratings = []
+        if self.checkpoint:
+            self.unremarked_ratings = self.checkpoint.load_ratings()
+            resumed = self.checkpoint.load_results()
+            if resumed:
+                self.adopt(resumed)
+                self.results.extend(resumed)
+                self.progress.found = len(resumed)
+                self.emit(f"↩️ 🦊 Resuming an interrupted run with {len(resumed)} remarks already collected.")
+                self.emit(("RESUMED", len(resumed)))
+
+    def adopt(self, records):
+        """Take over records collected earlier (a resumed run, or the fetch a watch extends)
+
+        They're re-clustered in their original order, so later remarks join the
+        same clusters and reuse their translations, and added to the live
+        aggregates. The caller decides whether they also go into results.
+        """
+        for item in records:
+            cluster_id, is_new = self.duplicates.add(item["remark"])
+            item["cluster_id"] = cluster_id
+            if is_new:
+                self.cluster_translations[cluster_id] = item.get("translated_remark")
+        if records:
+            self.live.add(records)
+
+    def _on_cancelled(self):
+        self.cancelled = True
+        self.emit(f"🛑 🦊 Fetch cancelled. Keeping the {len(self.results)} remarks collected so far.")
+        self._finish_run()
+
+    def _search(self, admin_id, start_date_str, end_date_str, team_id, admin_map, team_map, team_admins_map):
+        base_filters = self._search_filters(admin_id, start_date_str, end_date_str, team_id, admin_map, team_map)
+        if base_filters is None:
+            return self.results
+        shard_filters = self._query_shards(admin_id, team_id, team_admins_map, base_filters)
+        if not shard_filters:
+            return self.results
+
+        payloads = self._shard_payloads(shard_filters)
+        if len(payloads) > 1:
+            self._start_batches(len(payloads))
+            for batch_num, payload in enumerate(payloads, 1):
+                self._check_cancelled()
+                if self.limit_reached():
+                    break
+                self.emit(f"🦊 Processing batch {batch_num} of {len(payloads)}...")
+                self.process_query_batch(payload, batch_num)
+        else:
+            self.progress.set_shards(["main"], self._planned_counts(1))
+            self.run_single_query(payloads[0])
+        self._report_finished(len(payloads) > 1)
+        return self.results
+
+    def _search_filters(self, admin_id, start_date_str, end_date_str, team_id, admin_map, team_map):
+        """Announce the search and build its base filters; None if the dates are invalid"""
+        try:
+            base_filters = build_base_filters(start_date_str, end_date_str, self.ratings)
+        except Exception as e:
+            self.emit(f"❌ !!! Date conversion error: {e}")
+            return None
+
+        # Build search info string
+        search_info = []
+        if team_id and team_map:
+            team_name = [name for name, tid in team_map.items() if tid == team_id]
+            search_info.append(f"team: {team_name[0] if team_name else team_id}")
+        if admin_id and admin_map:
+            admin_name = [name for name, aid in admin_map.items() if aid == admin_id]
+            search_info.append(f"admin: {admin_name[0] if admin_name else admin_id}")
+        search_str = ", ".join(search_info) if search_info else "all conversations"
+        if self.ratings:
+            search_str += f", {describe_ratings(self.ratings)} only"
+        if self.max_results:
+            search_str += f", first {self.max_results} remarks"
+        self.search_range = (admin_id, team_id, start_date_str, end_date_str)
+        self.emit(f"🦊 On the hunt! Fetching remarks for {search_str} from {start_date_str} to {end_date_str}...")
+        return base_filters
+
+    def _shard_payloads(self, shard_filters):
+        return [{"query": {"operator": "AND", "value": filters}, "pagination": {"per_page": self.per_page}}
+                for filters in shard_filters]
+
+    def _planned_counts(self, num_shards):
+        """Shard sizes the query planner already probed, if it probed these shards"""
+        counts = self.plan.shard_counts if self.plan is not None else None
+        return counts if counts and len(counts) == num_shards else None
+
+    def _start_batches(self, num_batches):
+        # Batch processing - multi-shard plans are always scheduled as bulk work
+        self.progress.set_shards([f"batch-{n}" for n in range(1, num_batches + 1)], self._planned_counts(num_batches))
+        self._emit_progress()
+        self.priority = PRIORITY_BULK
+        self.emit(f"🦊 Big team alert! Splitting the hunt into {num_batches} batches...")
+
+    def _report_finished(self, batched):
+        if not self._finish_run():
+            return
+        if batched:
+            self.emit(f"✅ \n🦊 Hunt complete! Found {len(self.results)} total remarks across all batches. That's a lot of feedback!")
+            if len(self.results) > 50:
+                self.emit("(That's a lot of feedback to hunt through!)")
+        elif not self.results:
+            self.emit("⚠️ 🦊 No remarks found for this query. Maybe try a different date range?")
+        else:
+            self.emit(f"✅ \n🦊 Hunt complete! Found {len(self.results)} total remarks.")
+            if len(self.results) > 100:
+                self.emit("(That's a lot of feedback to hunt through!)")
+
+    def _query_shards(self, admin_id, team_id, team_admins_map, base_filters):
+        """Filter lists for each query the search needs; empty if there's nothing to search"""
+        if team_id:
+            team_admin_ids = (team_admins_map or {}).get(team_id, [])
+            if not team_admin_ids:
+                self.emit("⚠️ 🦊 Hmm, no admins in this team? That's sus, fren. Can't hunt without targets!")
+                return []
+
+            if admin_id and admin_id in team_admin_ids:
+                # Single admin in team
+                return [base_filters + [{"field": "admin_assignee_id", "operator": "=", "value": admin_id}]]
+            if admin_id:
+                self.emit("⚠️ 🦊 Oops! That admin isn't in this team. Hunting all team admins instead.")
+
+            self.emit(f"🦊 Team has {len(team_admin_ids)} admins. Building the query...")
+            plan = self._plan_team_query(team_id, team_admin_ids, base_filters)
+            return plan.shard_filters(base_filters)
+        if admin_id:
+            # No team, just admin
+            return [base_filters + [{"field": "admin_assignee_id", "operator": "=", "value": admin_id}]]
+        # No filters
+        return [base_filters]
+
+    def preview(self, admin_id, start_date_str, end_date_str, team_id=None, team_admins_map=None, ratings=None):
+        """Dry run: probe every shard's total_count and estimate what the fetch would cost
+
+        Returns a dict of estimates, or None if the probes failed.
+        """
+        self.stats = RequestStats()
+        self.plan = None
+        self.plan_probes = 0
+        try:
+            base_filters = build_base_filters(start_date_str, end_date_str, ratings)
+        except ValueError as e:
+            self.emit(f"❌ !!! Date conversion error: {e}")
+            return None
+
+        self.emit(f"🔎 🦊 Sniffing out the size of this hunt from {start_date_str} to {end_date_str}...")
+        try:
+            shard_filters = self._query_shards(admin_id, team_id, team_admins_map, base_filters)
+            conversations = 0
+            page_calls = 0
+            sample = []
+            for index, filters in enumerate(shard_filters):
+                # Only the first probe pulls a sample; the rest just need total_count
+                data = self._probe(filters, PREVIEW_SAMPLE_SIZE if index == 0 else 1)
+                if data is None:
+                    self.emit("❌ 🦊 Intercom rejected the preview query.")
+                    return None
+                count = data.get("total_count", 0)
+                conversations += count
+                page_calls += max(1, math.ceil(count / self.per_page))
+                if index == 0:
+                    sample = data.get("conversations", [])
+        except requests.exceptions.RequestException as e:
+            self.emit(f"❌ 🦊 Oof! Preview failed: {e}")
+            return None
+
+        # Scale the sample up to the whole query
+        remarks = [item["remark"] for item in map(extract_report_item, sample) if item is not None]
+        remark_ratio = len(remarks) / len(sample) if sample else 0.0
+        cache_hit_rate = sum(1 for remark in remarks if remark in self.translations_cache) / len(remarks) if remarks else 0.0
+        expected_remarks = round(conversations * remark_ratio)
+        translation_calls = round(expected_remarks * (1 - cache_hit_rate))
+
+        # Shards are paginated concurrently, up to the workspace's request slots; pages
+        # within a shard follow each other's cursors. A busy shared scheduler stretches
+        # every request by its queue depth.
+        page_seconds = max(self.stats.latencies) if self.stats.latencies else DEFAULT_PAGE_SECONDS
+        slowdown = 1.0
+        parallel = 1
+        if self.scheduler is not None:
+            parallel = max(1, min(len(shard_filters), self.scheduler.per_user_concurrency))
+            load = self.scheduler.stats()
+            waiting = load["active"] + sum(load["queued"].values())
+            slowdown = max(1.0, waiting / self.scheduler.max_concurrency)
+        estimated_seconds = (page_calls * page_seconds * slowdown / parallel
+                             + translation_calls * TRANSLATION_SECONDS / TRANSLATION_CONCURRENCY)
+
+        estimate = {
+            "shards": len(shard_filters),
+            "conversations": conversations,
+            "page_calls": page_calls,
+            "api_calls": page_calls + self.plan_probes,
+            "expected_remarks": expected_remarks,
+            "translation_calls": translation_calls,
+            "cache_hit_rate": cache_hit_rate,
+            "estimated_seconds": estimated_seconds,
+            "scheduler_slowdown": slowdown,
+            "preview_requests": self.stats.requests,
+            "plan": self.plan.describe() if self.plan else None
+        }
+        for line in describe_preview(estimate):
+            self.emit(f"🔎 {line}")
+        return estimate
+
+    def _probe(self, filters, per_page=1):
+        """Fetch one small page; returns None if Intercom rejects the query shape"""
+        payload = {"query": {"operator": "AND", "value": filters}, "pagination": {"per_page": per_page}}
+        response = self._post_search(payload)
+        if response.status_code == 400:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def probe_count(self, filters):
+        """Cheap total_count probe; returns None if Intercom rejects the query shape"""
+        data = self._probe(filters)
+        return None if data is None else data.get("total_count", 0)
+
+    def _plan_team_query(self, team_id, team_admin_ids, base_filters):
+        """Pick how to search a whole team, reusing the saved plan when resuming"""
+        saved = self.checkpoint.state.get("plan") if self.checkpoint else None
+        if saved:
+            self.plan = QueryPlan.from_dict(saved)
+            self.emit(f"🧭 Resuming with the saved query plan: {self.plan.describe()}")
+            return self.plan
+        planner = QueryPlanner(self.probe_count, self.per_page, self.emit)
+        self.plan = planner.plan(team_id, team_admin_ids, base_filters)
+        self.plan_probes = planner.probes
+        self.emit(f"🧭 Query plan: {self.plan.describe()} after {planner.probes} count probes")
+        if self.checkpoint:
+            self.checkpoint.state["plan"] = self.plan.to_dict()
+            self.checkpoint.save()
+        return self.plan
+
+    def _finish_run(self):
+        """Clear the checkpoint after a clean run; return False if the run was interrupted"""
+        if self.plan is not None and self.plan.estimated_calls is not None:
+            self.emit(f"🧭 Plan {self.plan.name}: estimated {self.plan.estimated_calls} page calls, actual {self.page_calls}")
+        if len(self.duplicates) < len(self.results):
+            self.emit(f"🧬 {len(self.results)} remarks fall into {len(self.duplicates)} near-duplicate clusters; "
+                      f"each cluster was translated once.")
+        scanned = self.progress.snapshot()["scanned"]
+        if scanned:
+            wasted = scanned - self.progress.found
+            self.emit(f"🎯 Remark yield: {self.progress.found} of {scanned} conversations scanned had a remark "
+                      f"({self.progress.found / scanned:.0%}); {wasted} were fetched without one.")
+        if self.limit_reached():
+            self.emit(f"🛑 Stopped early: reached the limit of {self.max_results} remarks.")
+        self._emit_live(force=True)
+        with self.timings.time("rollups"):
+            self.rollups = compute_rollups(self.results, self.unremarked_ratings)
+        self.emit(("ROLLUPS", self.rollups))
+        self.emit(self.stats.summary())
+        stages = self.timings.summary()
+        self.emit("⏱️ Stage timings:\n" + "\n".join(format_stage_table(stages)))
+        self.emit(("RUN_SUMMARY", {
+            "requests": self.stats.requests,
+            "retries": self.stats.retries,
+            "timeouts": self.stats.timeouts,
+            "hedges": self.stats.hedges,
+            "hedge_wins": self.stats.hedge_wins,
+            "stages": stages,
+            "run_id": self.run_id,
+            "scanned": scanned,
+            "remark_yield": self.progress.found / scanned if scanned else None,
+            "limit_reached": self.limit_reached()
+        }))
+        if self.cancelled:
+            # Keep the checkpoint so a cancelled run can still be resumed later
+            return False
+        if self.interrupted:
+            self.emit(f"⚠️ 🦊 Run interrupted with {len(self.results)} remarks collected so far. Resume to pick up where it stopped.")
+            return False
+        if self.checkpoint:
+            self.checkpoint.complete()
+        # Rating subsets and early stops don't cover whole days, so they stay out of the trend store
+        if self.trend_store is not None and self.search_range is not None and not self.ratings and not self.max_results:
+            self._record_trends()
+        return True
+
+    def _record_trends(self):
+        admin_id, team_id, start_date_str, end_date_str = self.search_range
+        if self.unremarked_ratings is None:
+            self.emit("⚠️ Trend store not updated: this run resumed a checkpoint that only kept remarks, not every rating.")
+            return
+        try:
+            days = self.trend_store.record_fetch(trend_scope(self.user_key, admin_id, team_id), start_date_str,
+                                                 end_date_str, self.results, self.unremarked_ratings)
+        except Exception as e:
+            # The fetch itself succeeded; a broken trend store shouldn't fail it
+            self.emit(f"⚠️ Couldn't update the trend store: {e}")
+            return
+        if days:
+            self.emit(f"📈 Trend store updated with {days} day{'s' if days != 1 else ''} of ratings.")
@@ -0,0 +1,273 @@
+"""
+Offline theme and sentiment analysis of fetched remarks.
+Remarks are tokenized once into a sparse TF-IDF matrix (CSR arrays in NumPy,
+unigrams plus adjacent-word phrases), clustered into themes with spherical
+k-means and scored with a small sentiment lexicon that understands negation
+("not helpful"). Everything runs locally in a few vectorized passes, so 100k
+remarks take seconds on one core and nothing leaves the machine.
+"""
+import math
+import re
+import time
+
+import numpy as np
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further get got had has have having he her here hers him
+his how i if in into is it its itself just let me more most my myself now of off on once only or other our ours out
+over own really same she should so some such than that the their theirs them then there these they this those
+through to too under until up us very was we were what when where which while who whom why will with would you your
+yours yourself im ive id dont didnt doesnt isnt wasnt cant couldnt wont thats thanks thank hi hello please ok okay
+""".split())
+NEGATIONS = frozenset("not no never dont didnt doesnt isnt wasnt cant couldnt wont nothing without hardly".split())
+
+# Lexicon weights; a negation within the previous two words flips the sign
+SENTIMENT_LEXICON = {
+    **dict.fromkeys("""great excellent amazing awesome perfect fantastic wonderful love loved best brilliant superb
+                    outstanding""".split(), 2.0),
+    **dict.fromkeys("""good helpful quick fast friendly nice kind easy clear solved resolved fixed thorough patient
+                    polite professional efficient useful happy pleased appreciate appreciated satisfied works
+                    smooth responsive""".split(), 1.0),
+    **dict.fromkeys("""slow unhelpful confusing confused rude wait waiting waited delay delayed broken bug issue
+                    problem problems difficult hard annoying unclear unresolved disappointed frustrating frustrated
+                    useless poor bad wrong missing error fail failed""".split(), -1.0),
+    **dict.fromkeys("""terrible awful horrible worst hate hated unacceptable ridiculous scam furious""".split(), -2.0),
+}
+# Compound score below/above these is negative/positive
+SENTIMENT_THRESHOLD = 0.15
+TOKEN_RE = re.compile(r"[a-z][a-z']+")
+MAX_FEATURES = 5000
+KMEANS_ITERATIONS = 12
+
+
+def tokenize(text):
+    """Lowercase words with stopwords dropped; words after a negation are prefixed with 'not_'"""
+    tokens = []
+    negate = 0
+    for word in TOKEN_RE.findall(text.lower()):
+        word = word.replace("'", "")
+        if word in NEGATIONS:
+            negate = 2
+            continue
+        if word in STOPWORDS or len(word) < 3:
+            continue
+        tokens.append(f"not_{word}" if negate else word)
+        negate = max(negate - 1, 0)
+    return tokens
+
+
+def _terms(tokens):
+    """Unigrams plus adjacent-word phrases"""
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _lexicon_weight(term):
+    if term.startswith("not_"):
+        return -SENTIMENT_LEXICON.get(term[4:], 0.0)
+    return SENTIMENT_LEXICON.get(term, 0.0)
+
+
+def _row_sums(values, indptr):
+    """Sum of values within each CSR row (empty rows give 0)"""
+    sums = np.zeros(len(indptr) - 1, dtype=values.dtype)
+    lengths = np.diff(indptr)
+    nonempty = lengths > 0
+    if values.size:
+        sums[nonempty] = np.add.reduceat(values, indptr[:-1][nonempty])
+    return sums
+
+
+def vectorize(texts, min_df=2, max_df=0.5, max_features=MAX_FEATURES):
+    """TF-IDF matrix of texts as L2-normalized CSR arrays
+
+    Returns (indptr, indices, data, vocabulary, sentiment) where sentiment is
+    each text's raw lexicon score before filtering rare and common terms.
+    """
+    vocab = {}
+    doc_ids = []
+    term_ids = []
+    unigram_counts = []
+    for doc, text in enumerate(texts):
+        tokens = tokenize(text)
+        unigram_counts.append(len(tokens))
+        for term in _terms(tokens):
+            term_ids.append(vocab.setdefault(term, len(vocab)))
+            doc_ids.append(doc)
+    n_docs = len(texts)
+    terms = np.array(list(vocab), dtype=object)
+    term_ids = np.asarray(term_ids, dtype=np.int64)
+    doc_ids = np.asarray(doc_ids, dtype=np.int64)
+
+    # Sentiment over every unigram (phrases have no lexicon weight), normalized by length
+    weights = np.fromiter((_lexicon_weight(term) for term in terms), dtype=np.float64, count=len(terms))
+    raw = np.bincount(doc_ids, weights=weights[term_ids], minlength=n_docs) if n_docs else np.zeros(0)
+    sentiment = raw / np.sqrt(np.maximum(np.asarray(unigram_counts, dtype=np.float64), 1.0))
+
+    # Term counts per (doc, term), then document frequencies
+    pairs, counts = np.unique(doc_ids * max(len(terms), 1) + term_ids, return_counts=True)
+    pair_docs, pair_terms = pairs // max(len(terms), 1), pairs % max(len(terms), 1)
+    df = np.bincount(pair_terms, minlength=len(terms))
+    keep = (df >= min_df) & (df <= max(max_df * n_docs, min_df))
+    if keep.sum() > max_features:
+        # Most frequent surviving terms
+        cutoff = np.sort(df[keep])[-max_features]
+        keep &= df >= cutoff
+    remap = np.full(len(terms), -1, dtype=np.int64)
+    remap[keep] = np.arange(int(keep.sum()))
+    mask = remap[pair_terms] >= 0
+    pair_docs, indices, counts = pair_docs[mask], remap[pair_terms[mask]], counts[mask]
+
+    idf = np.log((1 + n_docs) / (1 + df[keep])) + 1
+    data = (1 + np.log(counts)) * idf[indices]
+    indptr = np.zeros(n_docs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pair_docs, minlength=n_docs), out=indptr[1:])
+    norms = np.sqrt(_row_sums(data ** 2, indptr))
+    data /= np.repeat(np.where(norms > 0, norms, 1), np.diff(indptr))
+    return indptr, indices, data, terms[keep], sentiment
+
+
+def _similarities(indptr, indices, data, centroids, block_rows=8192):
+    """Cosine similarity of every row to every centroid: (k, n_docs), in row blocks to bound memory"""
+    n_docs = len(indptr) - 1
+    sims = np.zeros((len(centroids), n_docs))
+    for start in range(0, n_docs, block_rows):
+        stop = min(start + block_rows, n_docs)
+        lo, hi = indptr[start], indptr[stop]
+        if lo == hi:
+            continue
+        products = centroids[:, indices[lo:hi]] * data[lo:hi]
+        block_ptr = indptr[start:stop + 1] - lo
+        nonempty = np.flatnonzero(np.diff(block_ptr) > 0)
+        sims[:, start + nonempty] = np.add.reduceat(products, block_ptr[nonempty], axis=1)
+    return sims
+
+
+def spherical_kmeans(indptr, indices, data, n_features, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cluster L2-normalized sparse rows by cosine similarity; empty rows get label -1"""
+    rng = np.random.default_rng(seed)
+    nonempty = np.flatnonzero(np.diff(indptr) > 0)
+    k = min(k, len(nonempty))
+    labels = np.full(len(indptr) - 1, -1, dtype=np.int64)
+    if k == 0:
+        return labels, np.zeros((0, n_features))
+    row_of = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    # k-means++ seeding: each new seed is drawn away from rows the earlier seeds already cover
+    centroids = np.zeros((k, n_features))
+    closest = np.zeros(len(indptr) - 1)
+    row = rng.choice(nonempty)
+    for i in range(k):
+        centroids[i, indices[indptr[row]:indptr[row + 1]]] = data[indptr[row]:indptr[row + 1]]
+        closest = np.maximum(closest, _similarities(indptr, indices, data, centroids[i:i + 1])[0])
+        distance = np.clip(1 - closest[nonempty], 0, None) ** 2
+        if i + 1 < k:
+            row = rng.choice(nonempty, p=distance / distance.sum()) if distance.sum() > 0 else rng.choice(nonempty)
+    for _ in range(iterations):
+        new_labels = _similarities(indptr, indices, data, centroids).argmax(axis=0)
+        new_labels[np.diff(indptr) == 0] = -1
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        assigned = labels[row_of]
+        sums = np.bincount(assigned * n_features + indices, weights=data, minlength=k * n_features)
+        centroids = sums.reshape(k, n_features)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids = np.divide(centroids, norms, out=np.zeros_like(centroids), where=norms > 0)
+    return labels, centroids
+
+
+def default_theme_count(n_docs):
+    return int(min(12, max(2, round(math.sqrt(n_docs / 20)))))
+
+
+def analyze(records, k=None, text_key=None):
+    """Themes, keywords and sentiment for report records (dicts with remark and rating)
+
+    Records are read in English: their translated_remark when they have one,
+    else the remark (text_key picks one field instead).
+
+    Returns a dict: remarks, themes (label, terms, count, share, avg_rating,
+    sentiment, examples), keywords, sentiment (positive/neutral/negative counts
+    and mean score), rating_sentiment, labels and scores (per record) and seconds.
+    """
+    started = time.perf_counter()
+    if text_key is None:
+        texts = [str(record.get("translated_remark") or record.get("remark") or "") for record in records]
+    else:
+        texts = [str(record.get(text_key) or "") for record in records]
+    n_docs = len(texts)
+    indptr, indices, data, terms, scores = vectorize(texts)
+    ratings = np.array([record.get("rating") if isinstance(record.get("rating"), (int, float)) else np.nan
+                        for record in records], dtype=np.float64)
+
+    weights = np.bincount(indices, weights=data, minlength=len(terms))
+    keywords = [(terms[i], float(weights[i])) for i in np.argsort(weights)[::-1][:20] if weights[i] > 0]
+
+    k = k or default_theme_count(n_docs)
+    labels, centroids = spherical_kmeans(indptr, indices, data, len(terms), k)
+    themes = []
+    if len(centroids):
+        sims = _similarities(indptr, indices, data, centroids)
+        for cluster in range(len(centroids)):
+            members = np.flatnonzero(labels == cluster)
+            if not len(members):
+                continue
+            top_terms = [terms[i] for i in np.argsort(centroids[cluster])[::-1][:5] if centroids[cluster, i] > 0]
+            closest = members[np.argsort(sims[cluster, members])[::-1][:3]]
+            member_ratings = ratings[members]
+            themes.append({
+                "label": ", ".join(top_terms[:3]),
+                "terms": top_terms,
+                "count": int(len(members)),
+                "share": len(members) / n_docs,
+                "avg_rating": float(np.nanmean(member_ratings)) if np.isfinite(member_ratings).any() else None,
+                "sentiment": float(scores[members].mean()),
+                "examples": [texts[i] for i in closest],
+            })
+    themes.sort(key=lambda theme: theme["count"], reverse=True)
+
+    rated = ratings[np.isfinite(ratings)]
+    return {
+        "remarks": n_docs,
+        "themes": themes,
+        "keywords": keywords,
+        "sentiment": {
+            "positive": int((scores > SENTIMENT_THRESHOLD).sum()),
+            "neutral": int((np.abs(scores) <= SENTIMENT_THRESHOLD).sum()),
+            "negative": int((scores < -SENTIMENT_THRESHOLD).sum()),
+            "mean": float(scores.mean()) if n_docs else 0.0,
+        },
+        "rating_sentiment": {
+            "positive": int((rated >= 4).sum()),
+            "neutral": int((rated == 3).sum()),
+            "negative": int((rated <= 2).sum()),
+        },
+        "labels": labels,
+        "scores": scores,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _split(counts, total):
+    return " | ".join(f"{name.capitalize()}: {counts[name]} ({counts[name] / total * 100:.1f}%)"
+                      for name in ("positive", "neutral", "negative"))
+
+
+def sentiment_summary(report):
+    """One line for the Insights tab: remark text sentiment and rating split"""
+    total = max(report["remarks"], 1)
+    return f"Text: {_split(report['sentiment'], total)}\nRatings: {_split(report['rating_sentiment'], total)}"
+
+
+def format_report(report):
+    """Plain-text themes report"""
+    lines = [f"Themes in {report['remarks']} remarks (offline analysis, {report['seconds']:.1f}s)", ""]
+    for i, theme in enumerate(report["themes"], 1):
+        rating = f", avg rating {theme['avg_rating']:.1f}" if theme["avg_rating"] is not None else ""
+        lines.append(f"{i}. {theme['label']} - {theme['count']} remarks ({theme['share']:.0%}){rating}, "
+                     f"sentiment {theme['sentiment']:+.2f}")
+        for example in theme["examples"]:
+            lines.append(f"     \"{example[:120]}{'...' if len(example) > 120 else ''}\"")
+    if report["keywords"]:
+        lines += ["", "Top keywords: " + ", ".join(term for term, _ in report["keywords"][:15])]
+    return "\n".join(lines)
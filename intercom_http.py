@@ -0,0 +1,188 @@
+"""
+HTTP helpers for talking to Intercom.
+Every request gets a timeout, transient failures (connection errors, timeouts,
+429 and 5xx responses) are retried with jittered exponential backoff, and search
+page fetches can optionally be hedged: if a request runs past the observed p95
+latency a duplicate is fired and whichever answers first wins.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+import metrics
+from cancellation import CancelToken
+
+# Point at a local stand-in (see mock_intercom.py) to test or benchmark without the real API
+INTERCOM_API_BASE = os.environ.get("INTERCOM_API_BASE", "https://api.intercom.io").rstrip("/")
+
+# (connect, read) timeout in seconds for a single attempt
+DEFAULT_TIMEOUT = (5, 30)
+# Give up retrying once a request has been going this long, in seconds
+DEFAULT_DEADLINE = 120
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 20.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Hedging needs enough latency samples for a meaningful p95
+HEDGE_MIN_SAMPLES = 20
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class RequestStats:
+    """Counters for one run, reported in the run summary"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.latencies = deque(maxlen=500)
+        self._lock = threading.Lock()
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def record_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def p95(self):
+        """95th percentile latency, or None until there are enough samples"""
+        with self._lock:
+            if len(self.latencies) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def summary(self):
+        return (f"📈 Requests: {self.requests} | Retries: {self.retries} | Timeouts: {self.timeouts} | "
+                f"Hedged: {self.hedges} (won {self.hedge_wins})")
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, honoring a server-provided wait"""
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def retry_after_seconds(response):
+    """Seconds to wait from Retry-After or Intercom's X-RateLimit-Reset header"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+    reset_at = response.headers.get("X-RateLimit-Reset")
+    if reset_at:
+        try:
+            return max(float(reset_at) - time.time(), 0)
+        except ValueError:
+            pass
+    return None
+
+
+def send_with_retry(method, url, stats=None, timeout=DEFAULT_TIMEOUT, deadline=DEFAULT_DEADLINE, max_retries=MAX_RETRIES, cancel_token=None, **kwargs):
+    """Send a request, retrying transient failures; returns the final response"""
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        retry_after = None
+        attempt_started = time.monotonic()
+        if stats:
+            stats.count("requests")
+        try:
+            response = requests.request(method, url, timeout=timeout, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            timed_out = isinstance(e, requests.exceptions.Timeout)
+            if stats and timed_out:
+                stats.count("timeouts")
+            metrics.observe_request(url, "timeout" if timed_out else "error")
+            if attempt >= max_retries:
+                raise
+            failure = e
+        else:
+            elapsed = time.monotonic() - attempt_started
+            if stats:
+                stats.record_latency(elapsed)
+            metrics.observe_request(url, response.status_code, elapsed)
+            if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                return response
+            retry_after = retry_after_seconds(response)
+            failure = None
+
+        delay = backoff_delay(attempt, retry_after)
+        if time.monotonic() - started + delay > deadline:
+            if failure is not None:
+                raise failure
+            return response
+        if stats:
+            stats.count("retries")
+        if cancel_token is not None:
+            # Stop retrying in the background once the run has been cancelled
+            cancel_token.sleep(delay)
+        else:
+            time.sleep(delay)
+        attempt += 1
+
+
+def _send_attempt(url, stats, token, release=None, **kwargs):
+    try:
+        return send_with_retry("POST", url, stats, cancel_token=token, **kwargs)
+    finally:
+        if release is not None:
+            release()
+
+
+def post_hedged(url, stats, hedge_slot=None, cancel_token=None, **kwargs):
+    """POST with retries, firing a duplicate if the first runs past the p95 latency
+
+    hedge_slot, when given, asks the request scheduler for a slot of the
+    duplicate's own (a release callable, or None if none is free right now);
+    without a free slot the request simply isn't hedged, so hedging never
+    exceeds the scheduler's caps. The losing request stops retrying.
+    """
+    hedge_after = stats.p95()
+    if hedge_after is None:
+        return send_with_retry("POST", url, stats=stats, cancel_token=cancel_token, **kwargs)
+
+    tokens = {"first": CancelToken(parent=cancel_token)}
+    first = _hedge_executor.submit(_send_attempt, url, stats, tokens["first"], **kwargs)
+    done, _ = wait([first], timeout=hedge_after)
+    if done:
+        return first.result()
+
+    release = hedge_slot() if hedge_slot is not None else None
+    if hedge_slot is not None and release is None:
+        return first.result()
+    stats.count("hedges")
+    tokens["hedge"] = CancelToken(parent=cancel_token)
+    hedge = _hedge_executor.submit(_send_attempt, url, stats, tokens["hedge"], release, **kwargs)
+    futures = {first: tokens["first"], hedge: tokens["hedge"]}
+    pending = set(futures)
+    error = None
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        stats.count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        for future in pending:
+            futures[future].cancel()
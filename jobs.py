@@ -0,0 +1,155 @@
+"""
+Background job runner for Feedback Finder.
+Fetches run on a process-wide thread pool instead of inside the Streamlit script,
+so a long crawl doesn't hold the session hostage and survives browser refreshes.
+Each job collects log lines, progress and partial results that the UI polls.
+"""
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cancellation import CancelToken
+from search import RemarkIndex
+from watch import WATCH_ARRIVALS_SHOWN
+
+# How long finished jobs stay available for reconnecting sessions
+JOB_TTL_SECONDS = 60 * 60
+
+
+class FetchJob:
+    """State for a single background fetch, safe to read from the UI thread"""
+
+    def __init__(self, job_id, description="", key=None):
+        self.id = job_id
+        self.description = description
+        # Jobs with the same key (e.g. the same checkpointed query) never run twice at once
+        self.key = key
+        self.status = "queued"  # queued -> running -> done | failed | cancelled
+        self.cancel_token = CancelToken()
+        self.results = []
+        # Full-text index over a fetch's results; see synced_search_index()
+        self.search_index = RemarkIndex()
+        self.log = deque(maxlen=500)
+        self.activity = ""
+        self.progress = 0.0
+        # Latest ProgressModel snapshot: scanned/total, conv/s, ETR, translation backlog
+        self.progress_detail = None
+        self.run_summary = {}
+        # Latest LiveAggregates snapshot while the run is going
+        self.live = None
+        # rollups.compute_rollups() output for the finished run
+        self.rollups = None
+        # Watch jobs: the latest WATCH_UPDATE totals and the newest arrivals
+        self.watch = None
+        self.arrivals = deque(maxlen=WATCH_ARRIVALS_SHOWN)
+        # Sampling jobs: the latest SAMPLE_ESTIMATE
+        self.sample = None
+        self.error = None
+        # Set by the job target when the run stopped before finishing
+        self.interrupted = False
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def put(self, message):
+        """Accept engine messages (same protocol as the desktop log queue)"""
+        with self._lock:
+            if isinstance(message, tuple):
+                msg_type = message[0]
+                if msg_type == "CURRENT_ACTIVITY":
+                    self.activity = message[1]
+                elif msg_type == "PROGRESS_UPDATE":
+                    self.progress_detail = message[1]
+                    self.progress = message[1]["fraction"]
+                elif msg_type == "RUN_SUMMARY":
+                    self.run_summary = message[1]
+                elif msg_type == "LIVE_AGGREGATES":
+                    self.live = message[1]
+                elif msg_type == "ROLLUPS":
+                    self.rollups = message[1]
+                elif msg_type == "WATCH_UPDATE":
+                    self.watch = {key: value for key, value in message[1].items() if key != "new"}
+                    self.arrivals.extend(message[1]["new"])
+                elif msg_type == "SAMPLE_ESTIMATE":
+                    self.sample = message[1]
+            else:
+                timestamp = time.strftime("%H:%M:%S")
+                self.log.append(f"[{timestamp}] {message}")
+
+    def synced_search_index(self):
+        """The job's index, caught up with its results. Called from the UI thread: put() runs
+        on the engine's thread, which for async jobs is the loop shared by every session"""
+        self.search_index.sync(self.results)
+        return self.search_index
+
+    def log_lines(self):
+        with self._lock:
+            return list(self.log)
+
+    def result_snapshot(self):
+        # list() of a list that another thread only appends to is safe under the GIL
+        return list(self.results)
+
+
+class JobRunner:
+    """Process-wide executor that runs fetches as background jobs with ids"""
+
+    def __init__(self, max_workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch-job")
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, target, description="", key=None, **kwargs):
+        """Run target(job, **kwargs) in the background and return the job id
+
+        If a job with the same key is still running, its id is returned instead
+        of starting a duplicate.
+        """
+        self._prune()
+        with self._lock:
+            if key is not None:
+                for existing in self.jobs.values():
+                    if existing.key == key and not existing.finished:
+                        return existing.id
+            job = FetchJob(uuid.uuid4().hex[:12], description, key)
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, target, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def active_count(self):
+        """Jobs queued or running"""
+        with self._lock:
+            return sum(not job.finished for job in self.jobs.values())
+
+    def _run(self, job, target, kwargs):
+        job.status = "running"
+        try:
+            target(job, **kwargs)
+            job.status = "cancelled" if job.cancel_token.cancelled else "done"
+        except Exception as e:
+            job.error = str(e)
+            job.put(f"❌ Job failed: {e}")
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        with self._lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job.finished_at and job.finished_at < cutoff]
+            for job_id in expired:
+                del self.jobs[job_id]
@@ -0,0 +1,101 @@
+"""
+Streaming aggregates for a running fetch.
+LiveAggregates takes each processed page's records and keeps a rating
+histogram, running CSAT, per-day counts and the most frequent terms, all in
+bounded memory and O(page) work, so both frontends can show partial insight
+seconds into a multi-minute pull. Top terms come from a Space-Saving sketch
+(Metwally et al.): at most TERM_CAPACITY counters, and any term whose true
+count exceeds remarks / TERM_CAPACITY is guaranteed to be tracked.
+"""
+import threading
+from datetime import datetime
+
+from insights import tokenize
+from rollups import CSAT_MIN_RATING, RATINGS
+
+TERM_CAPACITY = 300
+TOP_TERMS = 15
+
+
+class SpaceSaving:
+    """Bounded heavy-hitters counter: (term, count, overestimate) for the most frequent terms"""
+
+    def __init__(self, capacity=TERM_CAPACITY):
+        self.capacity = capacity
+        self.counters = {}  # term -> [count, error]
+
+    def add(self, term):
+        counter = self.counters.get(term)
+        if counter is not None:
+            counter[0] += 1
+        elif len(self.counters) < self.capacity:
+            self.counters[term] = [1, 0]
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as possible overestimate
+            victim = min(self.counters, key=lambda t: self.counters[t][0])
+            smallest = self.counters.pop(victim)[0]
+            self.counters[term] = [smallest + 1, smallest]
+
+    def top(self, n):
+        ranked = sorted(self.counters.items(), key=lambda item: -item[1][0])[:n]
+        return [(term, count, error) for term, (count, error) in ranked]
+
+
+class LiveAggregates:
+    """Thread-safe running aggregates over the records collected so far"""
+
+    def __init__(self):
+        self.remarks = 0
+        self.histogram = {rating: 0 for rating in RATINGS}
+        self.days = {}
+        self.terms = SpaceSaving()
+        self._lock = threading.Lock()
+
+    def add(self, records):
+        # Tokenize outside the lock; it's the expensive part
+        prepared = [(record.get("rating"), record.get("date"),
+                     set(tokenize(record.get("translated_remark") or record.get("remark") or "")))
+                    for record in records]
+        with self._lock:
+            for rating, timestamp, terms in prepared:
+                self.remarks += 1
+                if rating in self.histogram:
+                    self.histogram[rating] += 1
+                if timestamp:
+                    day = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+                    self.days[day] = self.days.get(day, 0) + 1
+                # Terms count once per remark: "how many remarks mention it"
+                for term in terms:
+                    self.terms.add(term)
+
+    def snapshot(self):
+        """Dict for ("LIVE_AGGREGATES", snapshot) messages"""
+        with self._lock:
+            rated = sum(self.histogram.values())
+            return {
+                "remarks": self.remarks,
+                "histogram": dict(self.histogram),
+                "csat": sum(self.histogram[r] for r in RATINGS if r >= CSAT_MIN_RATING) / rated if rated else None,
+                "avg_rating": sum(r * n for r, n in self.histogram.items()) / rated if rated else None,
+                "days": sorted(self.days.items()),
+                "top_terms": self.terms.top(TOP_TERMS),
+            }
+
+
+def format_live(snapshot, width=24):
+    """Text view of a snapshot for the desktop Insights tab"""
+    if not snapshot["remarks"]:
+        return "Waiting for the first remarks..."
+    lines = []
+    if snapshot["csat"] is not None:
+        lines.append(f"{snapshot['remarks']} remarks so far · CSAT {snapshot['csat']:.0%} · avg rating {snapshot['avg_rating']:.2f}")
+    biggest = max(snapshot["histogram"].values()) or 1
+    for rating in reversed(RATINGS):
+        count = snapshot["histogram"][rating]
+        lines.append(f"{rating}★ {'█' * round(count / biggest * width):<{width}} {count}")
+    if snapshot["top_terms"]:
+        lines.append("Top terms: " + ", ".join(f"{term} ({count})" for term, count, _ in snapshot["top_terms"][:10]))
+    if snapshot["days"]:
+        busiest = max(snapshot["days"], key=lambda day: day[1])
+        lines.append(f"{len(snapshot['days'])} days so far, busiest {busiest[0]} ({busiest[1]} remarks)")
+    return "\n".join(lines)
@@ -0,0 +1,287 @@
+"""
+Process-wide metrics in OpenMetrics text format.
+The HTTP helpers, fetch engines and web app record into one registry; an
+operator exposes it for a scraper with FDBK_METRICS_PORT (a small local HTTP
+listener serving /metrics) and/or FDBK_METRICS_FILE (rewritten every
+FDBK_METRICS_INTERVAL seconds, for node_exporter's textfile collector or similar).
+"""
+import http.server
+import os
+import sys
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# records/sec is averaged over this window
+RATE_WINDOW_SECONDS = 60
+# Per-session gauges are dropped once a session hasn't reported for this long
+SESSION_TTL_SECONDS = 60 * 60
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class _Metric:
+    kind = "unknown"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple((name, labels[name]) for name in self.label_names)
+
+    def header(self):
+        return [f"# TYPE {self.name} {self.kind}", f"# HELP {self.name} {self.help}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def expose(self):
+        with self._lock:
+            values = dict(self._values)
+        return self.header() + [f"{self.name}_total{_format_labels(key)} {value}" for key, value in values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, label_names=(), fn=None):
+        super().__init__(name, help_text, label_names)
+        # Optional callable returning the value (unlabelled gauges only), read at scrape time
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def expose(self):
+        if self.fn is not None:
+            values = {(): self.fn()}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return self.header() + [f"{self.name}{_format_labels(key)} {value}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def expose(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        lines = self.header()
+        for key, (counts, total) in values.items():
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {counts[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {counts[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+        return lines
+
+
+class RateWindow:
+    """Events per second over a sliding window"""
+
+    def __init__(self, seconds=RATE_WINDOW_SECONDS):
+        self.seconds = seconds
+        self._events = deque()
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        with self._lock:
+            self._events.append((time.monotonic(), amount))
+
+    def rate(self):
+        cutoff = time.monotonic() - self.seconds
+        with self._lock:
+            while self._events and self._events[0][0] < cutoff:
+                self._events.popleft()
+            return sum(amount for _, amount in self._events) / self.seconds
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.expose())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+_records_rate = RateWindow()
+_session_seen = {}
+_session_lock = threading.Lock()
+
+http_requests = REGISTRY.register(Counter(
+    "fdbk_intercom_requests", "Intercom API requests by endpoint and response status", ("endpoint", "status")))
+http_latency = REGISTRY.register(Histogram(
+    "fdbk_intercom_request_duration_seconds", "Intercom API request latency by endpoint", ("endpoint",)))
+translation_lookups = REGISTRY.register(Counter(
+    "fdbk_translation_lookups", "Remark translations by whether the cache already had them", ("result",)))
+REGISTRY.register(Gauge(
+    "fdbk_translation_cache_hit_ratio", "Share of translation lookups answered from cache",
+    fn=lambda: _hit_ratio()))
+records_collected = REGISTRY.register(Counter(
+    "fdbk_records", "Rated remarks collected by fetches"))
+conversations_scanned = REGISTRY.register(Counter(
+    "fdbk_conversations_scanned", "Conversations read from search pages"))
+REGISTRY.register(Gauge(
+    "fdbk_records_per_second", f"Remarks collected per second over the last {RATE_WINDOW_SECONDS}s",
+    fn=lambda: round(_records_rate.rate(), 3)))
+webhook_deliveries = REGISTRY.register(Counter(
+    "fdbk_webhook_deliveries", "Intercom webhook deliveries by outcome (accepted, duplicate, ignored, rejected)", ("result",)))
+active_jobs = REGISTRY.register(Gauge(
+    "fdbk_active_jobs", "Fetch jobs queued or running"))
+session_result_bytes = REGISTRY.register(Gauge(
+    "fdbk_session_result_bytes", "Approximate memory held by a session's result set", ("session",)))
+
+
+def _hit_ratio():
+    hits = translation_lookups.value(result="hit")
+    total = hits + translation_lookups.value(result="miss")
+    return round(hits / total, 4) if total else 0
+
+
+def endpoint_for(url):
+    """Low-cardinality endpoint label from a request URL"""
+    return urlparse(url).path or "/"
+
+
+def observe_request(url, status, seconds=None):
+    """Record one request attempt; status is the HTTP code or 'timeout'/'error'"""
+    endpoint = endpoint_for(url)
+    http_requests.inc(endpoint=endpoint, status=status)
+    if seconds is not None:
+        http_latency.observe(seconds, endpoint=endpoint)
+
+
+def observe_records(records, conversations):
+    records_collected.inc(records)
+    conversations_scanned.inc(conversations)
+    _records_rate.add(records)
+
+
+def observe_session_results(session_id, size_bytes):
+    now = time.monotonic()
+    session_result_bytes.set(size_bytes, session=session_id)
+    with _session_lock:
+        _session_seen[session_id] = now
+        stale = [sid for sid, seen in _session_seen.items() if now - seen > SESSION_TTL_SECONDS]
+        for sid in stale:
+            del _session_seen[sid]
+    for sid in stale:
+        session_result_bytes.remove(session=sid)
+
+
+def estimate_records_bytes(records):
+    """Rough size of a list of report dicts, counting the dicts and their values"""
+    total = sys.getsizeof(records)
+    for record in records:
+        total += sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+    return total
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.expose().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve /metrics from a daemon thread; returns the server"""
+    server = http.server.ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_file_dump(path, interval=15):
+    """Rewrite the exposition to path every interval seconds (atomically)"""
+    def dump():
+        tmp_path = f"{path}.tmp"
+        while True:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(REGISTRY.expose())
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Metrics dump to {path} failed: {e}", file=sys.stderr)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=dump, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_exporters_from_env():
+    """Start whichever exporters the operator configured; returns a description"""
+    started = []
+    port = os.environ.get("FDBK_METRICS_PORT")
+    if port:
+        host = os.environ.get("FDBK_METRICS_HOST", "127.0.0.1")
+        start_http_server(int(port), host)
+        started.append(f"http://{host}:{port}/metrics")
+    path = os.environ.get("FDBK_METRICS_FILE")
+    if path:
+        start_file_dump(path, float(os.environ.get("FDBK_METRICS_INTERVAL", "15")))
+        started.append(path)
+    return started
@@ -0,0 +1,376 @@
+"""
+Local stand-in for the parts of the Intercom API that Feedback Finder uses.
+Serves /teams, /admins and /conversations/search (with cursor pagination) over
+synthetic conversations, with configurable latency, rate limiting and errors,
+so fetches can be benchmarked and regression-tested without the real API.
+
+    python mock_intercom.py --conversations 1000000 --latency lognormal:80,0.5
+    INTERCOM_API_BASE=http://127.0.0.1:8111 streamlit run app.py
+
+Conversations are generated from a seed and never stored as JSON: the searchable
+fields live in NumPy arrays, and a page's conversations are built when served.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import random
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+
+import numpy as np
+from aiohttp import web
+
+DEFAULT_PORT = 8111
+ADMIN_ID_BASE = 5000000
+TEAM_ID_BASE = 7000000
+CONVERSATION_ID_BASE = 100000000000
+# Intercom's documented search limits
+MAX_PER_PAGE = 150
+MAX_GROUP_FILTERS = 15
+ADMINS_PER_PAGE = 60
+QUERY_CACHE_SIZE = 64
+
+REMARK_PHRASES = {
+    "en": ["Great support, thanks!", "Took way too long to get an answer.", "The agent was really helpful",
+           "Still not fixed.", "Quick and friendly", "I had to explain my issue three times"],
+    "es": ["Muy buena atención, gracias", "Tardaron demasiado en responder", "El agente fue muy amable",
+           "Sigue sin funcionar"],
+    "de": ["Sehr hilfreicher Support", "Die Antwort kam viel zu spät", "Problem immer noch nicht gelöst"],
+    "fr": ["Service rapide et efficace", "Personne n'a compris mon problème", "Merci pour votre aide"],
+    "pt": ["Atendimento excelente", "Demorou muito para resolver", "Ainda estou com o problema"],
+    "ja": ["とても親切な対応でした", "返信が遅すぎます", "問題はまだ解決していません"],
+}
+DEFAULT_LANGUAGES = "en:0.7,es:0.1,de:0.06,fr:0.06,pt:0.05,ja:0.03"
+
+
+class QueryError(Exception):
+    """A search Intercom would reject with a 400"""
+
+
+def parse_latency(spec):
+    """Latency sampler from 'none', 'fixed:MS', 'uniform:LO,HI' or 'lognormal:MEDIAN_MS,SIGMA'; returns seconds"""
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",")] if args else []
+    if kind == "none":
+        return lambda: 0.0
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def parse_weights(spec):
+    pairs = [item.split(":") for item in spec.split(",") if item]
+    names = [name for name, _ in pairs]
+    weights = np.array([float(weight) for _, weight in pairs])
+    return names, weights / weights.sum()
+
+
+class SyntheticWorkspace:
+    """Deterministic teams, admins and rated conversations for one fake workspace"""
+
+    def __init__(self, conversations=100000, admins=40, teams=4, days=365, end_date=None,
+                 remark_rate=0.35, languages=DEFAULT_LANGUAGES, remark_words=(3, 40), body_bytes=0, seed=7):
+        self.seed = seed
+        self.admins = admins
+        self.teams = teams
+        self.remark_words = remark_words
+        self.body_bytes = body_bytes
+        self.languages, language_weights = parse_weights(languages)
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end_ts = int((end + timedelta(days=1)).timestamp())
+        start_ts = end_ts - days * 86400
+
+        rng = np.random.default_rng(seed)
+        self.created_at = np.sort(rng.integers(start_ts, end_ts, size=conversations, dtype=np.int64))
+        self.updated_at = self.created_at + rng.integers(60, 3 * 86400, size=conversations, dtype=np.int64)
+        self.admin = rng.integers(0, admins, size=conversations, dtype=np.int32)
+        self.team = self.admin % teams
+        self.rating = rng.choice(np.arange(1, 6, dtype=np.int8), size=conversations, p=[0.08, 0.05, 0.1, 0.22, 0.55])
+        self.has_remark = rng.random(conversations) < remark_rate
+        self.language = rng.choice(len(self.languages), size=conversations, p=language_weights).astype(np.int8)
+        self._queries = OrderedDict()
+
+    def __len__(self):
+        return len(self.created_at)
+
+    def team_list(self):
+        return [{"type": "team", "id": str(TEAM_ID_BASE + t), "name": f"Team {t + 1}",
+                 "admin_ids": [ADMIN_ID_BASE + a for a in range(t, self.admins, self.teams)]}
+                for t in range(self.teams)]
+
+    def admin_list(self):
+        return [{"type": "admin", "id": str(ADMIN_ID_BASE + a), "name": f"Admin {a + 1}",
+                 "email": f"admin{a + 1}@example.com", "team_ids": [TEAM_ID_BASE + a % self.teams]}
+                for a in range(self.admins)]
+
+    def _remark(self, index):
+        rng = random.Random(self.seed * 1000003 + index)
+        phrases = REMARK_PHRASES[self.languages[self.language[index]]]
+        words = rng.randint(*self.remark_words)
+        text = []
+        while sum(len(phrase.split()) for phrase in text) < words:
+            text.append(rng.choice(phrases))
+        return " ".join(text)
+
+    def conversation(self, index):
+        index = int(index)
+        rating = {"rating": int(self.rating[index]), "remark": self._remark(index) if self.has_remark[index] else None,
+                  "created_at": int(self.updated_at[index])}
+        convo = {
+            "type": "conversation",
+            "id": str(CONVERSATION_ID_BASE + index),
+            "created_at": int(self.created_at[index]),
+            "updated_at": int(self.updated_at[index]),
+            "admin_assignee_id": ADMIN_ID_BASE + int(self.admin[index]),
+            "team_assignee_id": str(TEAM_ID_BASE + int(self.team[index])),
+            "conversation_rating": rating,
+        }
+        if self.body_bytes:
+            # Real conversations carry a lot more than the fields we read
+            convo["source"] = {"type": "conversation", "body": "x" * self.body_bytes}
+        return convo
+
+    def _field(self, field):
+        if field == "created_at":
+            return self.created_at, int
+        if field == "updated_at":
+            return self.updated_at, int
+        if field == "admin_assignee_id":
+            return self.admin, lambda value: int(value) - ADMIN_ID_BASE
+        if field == "team_assignee_id":
+            return self.team, lambda value: int(value) - TEAM_ID_BASE
+        if field == "conversation_rating.score":
+            return self.rating, int
+        raise QueryError(f"Unsupported search field: {field}")
+
+    def _mask(self, node, depth=0):
+        operator = node.get("operator")
+        if operator in ("AND", "OR"):
+            values = node.get("value") or []
+            if depth >= 2:
+                raise QueryError("Search filters can be nested at most two levels deep")
+            if len(values) > MAX_GROUP_FILTERS:
+                raise QueryError(f"A filter group can contain at most {MAX_GROUP_FILTERS} filters")
+            masks = [self._mask(value, depth + 1) for value in values]
+            if not masks:
+                return np.ones(len(self), dtype=bool)
+            combine = np.logical_and if operator == "AND" else np.logical_or
+            return combine.reduce(masks)
+
+        column, convert = self._field(node.get("field"))
+        value = node.get("value")
+        try:
+            if operator == "IN":
+                return np.isin(column, [convert(item) for item in value])
+            if operator == "NIN":
+                return ~np.isin(column, [convert(item) for item in value])
+            target = convert(value)
+        except (TypeError, ValueError):
+            raise QueryError(f"Invalid value for {node.get('field')}: {value!r}")
+        if operator == "=":
+            return column == target
+        if operator == "!=":
+            return column != target
+        if operator == ">":
+            return column > target
+        if operator == "<":
+            return column < target
+        raise QueryError(f"Unsupported operator: {operator}")
+
+    def search(self, query):
+        """Indices of the conversations matching a search query, cached per query"""
+        key = json.dumps(query, sort_keys=True)
+        if key in self._queries:
+            self._queries.move_to_end(key)
+            return self._queries[key]
+        matches = np.flatnonzero(self._mask(query))
+        self._queries[key] = matches
+        if len(self._queries) > QUERY_CACHE_SIZE:
+            self._queries.popitem(last=False)
+        return matches
+
+
+class RateLimiter:
+    """Intercom-style limit: a per-minute budget per token, enforced in 10 second windows"""
+
+    def __init__(self, per_minute):
+        self.per_window = max(1, per_minute // 6) if per_minute else None
+        self.windows = {}
+
+    def check(self, token):
+        """Returns (allowed, remaining, reset_at)"""
+        now = time.time()
+        window_start = now - now % 10
+        reset_at = int(window_start + 10)
+        if self.per_window is None:
+            return True, None, reset_at
+        start, used = self.windows.get(token, (window_start, 0))
+        if start != window_start:
+            start, used = window_start, 0
+        if used >= self.per_window:
+            return False, 0, reset_at
+        self.windows[token] = (start, used + 1)
+        return True, self.per_window - used - 1, reset_at
+
+
+def _encode_cursor(offset):
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise QueryError("Invalid starting_after cursor")
+
+
+def _error(status, code, message, headers=None):
+    return web.json_response({"type": "error.list", "errors": [{"code": code, "message": message}]},
+                             status=status, headers=headers)
+
+
+def build_app(workspace, latency="lognormal:80,0.5", rate_limit=0, error_rate=0.0, realtime=False):
+    """aiohttp application serving the fake API for a workspace
+
+    With realtime, conversations are only served once their updated_at has
+    passed, so new ones keep arriving for watch mode to pick up.
+    """
+    sample_latency = parse_latency(latency)
+    limiter = RateLimiter(rate_limit)
+    stats = {}
+
+    def reset_stats():
+        stats.update(requests={}, rate_limited=0, errors=0, conversations_served=0,
+                     handler_seconds=deque(maxlen=100000))
+
+    reset_stats()
+
+    @web.middleware
+    async def intercom_behaviour(request, handler):
+        if request.path.startswith("/_mock/"):
+            return await handler(request)
+        started = time.monotonic()
+        stats["requests"][request.path] = stats["requests"].get(request.path, 0) + 1
+        auth = request.headers.get("Authorization", "")
+        if not auth.startswith("Bearer ") or len(auth) <= len("Bearer "):
+            return _error(401, "unauthorized", "Access Token Invalid")
+        allowed, remaining, reset_at = limiter.check(auth)
+        headers = {"X-RateLimit-Reset": str(reset_at)}
+        if remaining is not None:
+            headers["X-RateLimit-Remaining"] = str(remaining)
+        if not allowed:
+            stats["rate_limited"] += 1
+            return _error(429, "rate_limit_exceeded", "Exceeded rate limit", headers)
+        await asyncio.sleep(sample_latency())
+        if error_rate and random.random() < error_rate:
+            stats["errors"] += 1
+            return _error(503, "service_unavailable", "Injected failure")
+        response = await handler(request)
+        response.headers.update(headers)
+        stats["handler_seconds"].append(time.monotonic() - started)
+        return response
+
+    async def teams(request):
+        return web.json_response({"type": "team.list", "teams": workspace.team_list()})
+
+    async def admins(request):
+        page = int(request.query.get("page", "1"))
+        admin_list = workspace.admin_list()
+        chunk = admin_list[(page - 1) * ADMINS_PER_PAGE:page * ADMINS_PER_PAGE]
+        total_pages = max(1, math.ceil(len(admin_list) / ADMINS_PER_PAGE))
+        pages = {"type": "pages", "page": page, "per_page": ADMINS_PER_PAGE, "total_pages": total_pages}
+        if page < total_pages:
+            pages["next"] = f"{request.url.with_query(page=page + 1)}"
+        return web.json_response({"type": "admin.list", "admins": chunk, "pages": pages})
+
+    async def search(request):
+        try:
+            body = await request.json()
+        except ValueError:
+            return _error(400, "parameter_invalid", "Request body is not JSON")
+        pagination = body.get("pagination") or {}
+        try:
+            per_page = min(int(pagination.get("per_page", 20)), MAX_PER_PAGE)
+            offset = _decode_cursor(pagination["starting_after"]) if pagination.get("starting_after") else 0
+            matches = workspace.search(body.get("query") or {})
+        except QueryError as e:
+            return _error(400, "parameter_invalid", str(e))
+        if realtime:
+            matches = matches[workspace.updated_at[matches] <= time.time()]
+        chunk = matches[offset:offset + per_page]
+        stats["conversations_served"] += len(chunk)
+        total_pages = max(1, math.ceil(len(matches) / per_page))
+        pages = {"type": "pages", "page": offset // per_page + 1, "per_page": per_page, "total_pages": total_pages}
+        if offset + per_page < len(matches):
+            pages["next"] = {"page": pages["page"] + 1, "starting_after": _encode_cursor(offset + per_page)}
+        return web.json_response({
+            "type": "conversation.list",
+            "pages": pages,
+            "total_count": int(len(matches)),
+            "conversations": [workspace.conversation(index) for index in chunk],
+        })
+
+    async def mock_stats(request):
+        ordered = sorted(stats["handler_seconds"])
+
+        def percentile(q):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
+
+        return web.json_response({
+            "requests": stats["requests"],
+            "rate_limited": stats["rate_limited"],
+            "errors": stats["errors"],
+            "conversations_served": stats["conversations_served"],
+            "latency_p50": percentile(0.5),
+            "latency_p99": percentile(0.99),
+        })
+
+    async def mock_reset(request):
+        reset_stats()
+        return web.json_response({"ok": True})
+
+    app = web.Application(middlewares=[intercom_behaviour], client_max_size=1024 ** 2)
+    app.router.add_get("/teams", teams)
+    app.router.add_get("/admins", admins)
+    app.router.add_post("/conversations/search", search)
+    app.router.add_get("/_mock/stats", mock_stats)
+    app.router.add_post("/_mock/reset", mock_reset)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Intercom API for Feedback Finder")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--conversations", type=int, default=100000)
+    parser.add_argument("--admins", type=int, default=40)
+    parser.add_argument("--teams", type=int, default=4)
+    parser.add_argument("--days", type=int, default=365, help="conversations are spread over this many days")
+    parser.add_argument("--end-date", help="last day of data, YYYY-MM-DD (default today)")
+    parser.add_argument("--remark-rate", type=float, default=0.35)
+    parser.add_argument("--languages", default=DEFAULT_LANGUAGES, help="lang:weight,... from " + ",".join(REMARK_PHRASES))
+    parser.add_argument("--body-bytes", type=int, default=0, help="padding added to each conversation")
+    parser.add_argument("--latency", default="lognormal:80,0.5", help="none | fixed:MS | uniform:LO,HI | lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per minute per token, 0 for unlimited")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--realtime", action="store_true", help="only serve conversations whose updated_at has passed")
+    args = parser.parse_args()
+
+    workspace = SyntheticWorkspace(args.conversations, args.admins, args.teams, args.days, args.end_date,
+                                   args.remark_rate, args.languages, body_bytes=args.body_bytes, seed=args.seed)
+    print(f"🦊 Mock Intercom: {len(workspace)} conversations, {args.admins} admins in {args.teams} teams "
+          f"on http://{args.host}:{args.port}", flush=True)
+    web.run_app(build_app(workspace, args.latency, args.rate_limit, args.error_rate, args.realtime),
+                host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Opt-in profiling for fetch runs.
+Set FDBK_PROFILE=1 to capture every fetch with a sampling profiler (all
+threads, written as folded stacks for flame graphs) plus tracemalloc, or
+FDBK_PROFILE=cprofile for a deterministic cProfile of the thread running the
+fetch. cProfile can't tell runs apart on a thread they share (the async
+engine's event loop), so a run that starts while another profiled run is
+active on its thread is sampled instead, and the cProfile report notes how
+many runs overlapped it. Files go to FDBK_PROFILE_DIR (default ~/.fdbckfndr/profiles), named by
+run id:
+
+  <run id>.folded              sampled stacks (flamegraph.pl, speedscope)
+  <run id>.prof                cProfile stats (snakeviz, pstats)
+  <run id>-profile.txt         top functions by cumulative time (cProfile mode)
+  <run id>-allocations.txt     peak traced memory and top allocation sites
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.environ.get("FDBK_PROFILE_DIR", os.path.join(os.path.expanduser("~"), ".fdbckfndr", "profiles"))
+SAMPLE_INTERVAL = float(os.environ.get("FDBK_PROFILE_INTERVAL_MS", "5")) / 1000
+TOP_ALLOCATIONS = 30
+TOP_FUNCTIONS = 40
+
+# tracemalloc is process-wide; concurrent profiled runs share one trace
+_trace_lock = threading.Lock()
+_trace_users = 0
+# Profiled runs active per thread, and runs that overlapped a thread's cProfile
+_thread_runs = Counter()
+_cprofile_overlaps = Counter()
+
+
+def profile_mode():
+    """'sample', 'cprofile' or None, from FDBK_PROFILE"""
+    value = os.environ.get("FDBK_PROFILE", "").strip().lower()
+    if value in ("", "0", "false", "off"):
+        return None
+    return "cprofile" if value == "cprofile" else "sample"
+
+
+def new_run_id(label=""):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return f"{stamp}-{label or uuid.uuid4().hex[:8]}"
+
+
+class StackSampler:
+    """Samples every thread's stack on a timer and counts identical stacks"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_folded(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _start_tracing():
+    global _trace_users
+    with _trace_lock:
+        if _trace_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        _trace_users += 1
+
+
+def _stop_tracing(path):
+    """Write the allocation report, stopping tracemalloc once no run needs it"""
+    global _trace_users
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    with _trace_lock:
+        _trace_users -= 1
+        if _trace_users == 0:
+            tracemalloc.stop()
+    snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Traced memory: {current / 1024 ** 2:.1f} MB current, {peak / 1024 ** 2:.1f} MB peak\n")
+        f.write(f"Top {TOP_ALLOCATIONS} allocation sites still held at the end of the run:\n\n")
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            f.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8} blocks  {frame.filename}:{frame.lineno}\n")
+
+
+@contextmanager
+def profile_run(run_id, emit=None):
+    """Profile the enclosed fetch when FDBK_PROFILE is set; a no-op otherwise"""
+    mode = profile_mode()
+    if mode is None:
+        yield
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, run_id)
+    thread_id = threading.get_ident()
+    with _trace_lock:
+        if _thread_runs[thread_id]:
+            _cprofile_overlaps[thread_id] += 1
+            if mode == "cprofile":
+                mode = "sample"
+                if emit is not None:
+                    emit("🔬 Another profiled run shares this thread; sampling this one instead of cProfile")
+        _thread_runs[thread_id] += 1
+        if mode == "cprofile":
+            _cprofile_overlaps[thread_id] = 0
+    _start_tracing()
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = StackSampler()
+        profiler.start()
+    try:
+        yield
+    finally:
+        with _trace_lock:
+            overlaps = _cprofile_overlaps[thread_id] if mode == "cprofile" else 0
+            _thread_runs[thread_id] -= 1
+            if not _thread_runs[thread_id]:
+                del _thread_runs[thread_id]
+                _cprofile_overlaps.pop(thread_id, None)
+        if mode == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(f"{base}.prof")
+            report = io.StringIO()
+            if overlaps:
+                report.write(f"Note: {overlaps} other profiled run(s) ran on this thread too and are included below\n\n")
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            with open(f"{base}-profile.txt", "w", encoding="utf-8") as f:
+                f.write(report.getvalue())
+        else:
+            profiler.stop()
+            profiler.write_folded(f"{base}.folded")
+        _stop_tracing(f"{base}-allocations.txt")
+        if emit is not None:
+            emit(f"🔬 Profile saved to {base}.* ({mode})")
@@ -0,0 +1,118 @@
+"""
+Progress model for fetch runs.
+The engines report each shard's total_count and every processed page here; the
+model adds them up across concurrent batches, tracks throughput as an EWMA of
+conversations per second and turns that, plus the translation backlog, into the
+progress fraction and ETR both frontends show. Shards that haven't reported a
+total yet are assumed to be the size of the average shard seen so far.
+"""
+import math
+import threading
+import time
+
+# Time constant of the throughput EWMA in seconds: recent pages dominate, one slow page doesn't
+THROUGHPUT_TAU = 15.0
+
+
+class ProgressModel:
+    """Thread-safe run progress, aggregated over every shard of a search"""
+
+    def __init__(self, per_page, translation_seconds=0.0, max_results=None):
+        self.per_page = per_page
+        # Seconds each queued translation adds to the ETR
+        self.translation_seconds = translation_seconds
+        # Runs that stop after this many remarks finish when either limit is hit
+        self.max_results = max_results
+        self.found = 0
+        self.pages = 0
+        self.translation_backlog = 0
+        self.rate = None
+        self._totals = {}
+        self._scanned = {}
+        self._pending = set()
+        self._last_page_at = None
+        self._clock_started = None
+        self._clock_scanned = 0
+        self._lock = threading.Lock()
+
+    def set_shards(self, shards, counts=None):
+        """Declare the run's shards, with total_counts when the planner already probed them"""
+        with self._lock:
+            self._pending = set(shards)
+            for shard, count in zip(shards, counts or []):
+                if count is not None:
+                    self._totals[shard] = count
+
+    def shard_started(self, shard, total_count, already_scanned=0):
+        with self._lock:
+            self._totals[shard] = total_count
+            self._scanned[shard] = already_scanned
+
+    def shard_done(self, shard):
+        """The shard has no more pages; its total is whatever it actually scanned"""
+        with self._lock:
+            self._pending.discard(shard)
+            self._totals[shard] = self._scanned.setdefault(shard, 0)
+
+    def page_done(self, shard, conversations, found):
+        now = time.monotonic()
+        with self._lock:
+            self._scanned[shard] = self._scanned.get(shard, 0) + conversations
+            self.found += found
+            self.pages += 1
+            if self._clock_started is None:
+                # The first page carries connection and planning startup, so it only starts the clock
+                self._clock_started = now
+            elif self.rate is None or now - self._clock_started < THROUGHPUT_TAU:
+                # Too early for an EWMA (concurrent first pages land together): use the plain average
+                self._clock_scanned += conversations
+                self.rate = self._clock_scanned / (now - self._clock_started)
+            else:
+                # EWMA over irregular intervals: each sample weighs by how much time it covers
+                elapsed = max(now - self._last_page_at, 1e-6)
+                alpha = 1 - math.exp(-elapsed / THROUGHPUT_TAU)
+                self.rate += alpha * (conversations / elapsed - self.rate)
+            self._last_page_at = now
+
+    def translations_queued(self, count):
+        with self._lock:
+            self.translation_backlog += count
+
+    def translation_done(self):
+        with self._lock:
+            self.translation_backlog = max(self.translation_backlog - 1, 0)
+
+    def snapshot(self):
+        """Dict for ("PROGRESS_UPDATE", snapshot) messages"""
+        with self._lock:
+            scanned = sum(self._scanned.values())
+            unknown = [shard for shard in self._pending if shard not in self._totals]
+            known = [self._totals[shard] for shard in self._totals]
+            average = sum(known) / len(known) if known else 0
+            total = max(sum(known) + round(average * len(unknown)), scanned)
+            remaining = total - scanned
+            fraction = min(scanned / total, 1.0) if total else 0.0
+            if self.max_results and self.found:
+                # At the yield seen so far, this many more conversations reach the limit
+                needed = max(self.max_results - self.found, 0) * scanned / self.found
+                remaining = min(remaining, math.ceil(needed))
+                fraction = max(fraction, min(self.found / self.max_results, 1.0))
+            etr = None
+            if self.rate:
+                etr = remaining / self.rate + self.translation_backlog * self.translation_seconds
+            elif not remaining and not self.translation_backlog and known:
+                etr = 0
+            return {
+                "scanned": scanned,
+                "total": total,
+                # True while some shard's size is still a guess
+                "estimated": bool(unknown),
+                "found": self.found,
+                "pages": self.pages,
+                "total_pages": self.pages + math.ceil(remaining / self.per_page),
+                "fraction": fraction,
+                "rate": self.rate,
+                "etr": etr,
+                "translation_backlog": self.translation_backlog,
+            }
+
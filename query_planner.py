@@ -0,0 +1,145 @@
+"""
+Query planner for team searches.
+A team can be searched several ways: one ``team_assignee_id`` filter, admin
+OR-groups batched up to the largest clause count Intercom accepts, or one query
+per admin. The planner probes ``total_count`` with ``per_page=1`` requests,
+estimates how many page calls each plan needs and picks the cheapest.
+"""
+import math
+import threading
+
+# Documented Intercom limit for filters in one OR group; the planner starts here
+# and probes for larger groups when a team needs them
+MAX_OR_CONDITIONS = 15
+# Never probe OR groups larger than this
+MAX_OR_PROBE = 60
+
+# Clause limits learned from probes, shared by every run in the process
+_clause_limits = {"good": MAX_OR_CONDITIONS, "bad": None}
+_clause_lock = threading.Lock()
+
+
+def admin_or_group(admin_ids):
+    return {"operator": "OR", "value": [{"field": "admin_assignee_id", "operator": "=", "value": aid} for aid in admin_ids]}
+
+
+def known_clause_limit():
+    """Largest OR group Intercom is known to accept, from the probes so far"""
+    with _clause_lock:
+        return _clause_limits["good"]
+
+
+def _pages(count, per_page):
+    return max(1, math.ceil(count / per_page))
+
+
+class QueryPlan:
+    """A way to search a team: a list of shards, each one paginated query"""
+
+    def __init__(self, name, team_id=None, batches=None, estimated_calls=None, shard_counts=None):
+        self.name = name
+        self.team_id = team_id
+        self.batches = batches or []
+        self.estimated_calls = estimated_calls
+        # total_count of each shard when the probes measured it, for progress reporting
+        self.shard_counts = shard_counts
+
+    def shard_filters(self, base_filters):
+        if self.name == "team_assignee":
+            return [base_filters + [{"field": "team_assignee_id", "operator": "=", "value": self.team_id}]]
+        return [base_filters + [admin_or_group(batch)] for batch in self.batches]
+
+    def describe(self):
+        if self.name == "team_assignee":
+            shape = "one team_assignee_id query"
+        elif self.name == "per_admin":
+            shape = f"{len(self.batches)} per-admin queries"
+        else:
+            sizes = sorted({len(batch) for batch in self.batches}, reverse=True)
+            shape = f"{len(self.batches)} admin OR-batch{'es' if len(self.batches) != 1 else ''} of up to {sizes[0]} admins"
+        estimate = f"~{self.estimated_calls} page calls" if self.estimated_calls is not None else "no estimate"
+        return f"{shape} ({estimate})"
+
+    def to_dict(self):
+        return {"name": self.name, "team_id": self.team_id, "batches": self.batches, "estimated_calls": self.estimated_calls,
+                "shard_counts": self.shard_counts}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data.get("team_id"), data.get("batches"), data.get("estimated_calls"), data.get("shard_counts"))
+
+
+class QueryPlanner:
+    """Chooses the cheapest plan for a team using count probes"""
+
+    def __init__(self, probe_count, per_page, emit):
+        # probe_count(filters) -> total_count, or None if Intercom rejected the query
+        self.probe_count = probe_count
+        self.per_page = per_page
+        self.emit = emit
+        self.probes = 0
+        self._counts = {}
+
+    def _count(self, base_filters, admin_ids):
+        key = tuple(admin_ids)
+        if key not in self._counts:
+            self.probes += 1
+            self._counts[key] = self.probe_count(base_filters + [admin_or_group(admin_ids)])
+        return self._counts[key]
+
+    def clause_limit(self, base_filters, admin_ids):
+        """Largest OR group that Intercom accepts, probing upward only when needed"""
+        with _clause_lock:
+            good, bad = _clause_limits["good"], _clause_limits["bad"]
+        wanted = min(len(admin_ids), MAX_OR_PROBE)
+        if wanted <= good:
+            return good
+        # Try the whole team first, then binary-search between the known bounds
+        candidate = wanted if bad is None else min(wanted, bad - 1)
+        while candidate > good:
+            if self._count(base_filters, admin_ids[:candidate]) is not None:
+                good = candidate
+            else:
+                bad = candidate
+            if good >= wanted or bad is None:
+                break
+            candidate = (good + bad) // 2
+        with _clause_lock:
+            _clause_limits["good"] = max(_clause_limits["good"], good)
+            if bad is not None and (_clause_limits["bad"] is None or bad < _clause_limits["bad"]):
+                _clause_limits["bad"] = bad
+        return good
+
+    def plan(self, team_id, admin_ids, base_filters):
+        limit = self.clause_limit(base_filters, admin_ids)
+        batches = [admin_ids[i:i + limit] for i in range(0, len(admin_ids), limit)]
+        if len(batches) == 1:
+            # A single OR query is already one shard; probing can't beat it
+            return QueryPlan("admin_batches", batches=batches)
+
+        counts = [self._count(base_filters, batch) for batch in batches]
+        if any(count is None for count in counts):
+            # Shouldn't happen once the limit is known, but per-admin always works
+            self.emit("⚠️ 🧭 An admin batch was rejected; falling back to per-admin queries.")
+            return QueryPlan("per_admin", batches=[[aid] for aid in admin_ids])
+        total = sum(counts)
+        batch_calls = sum(_pages(count, self.per_page) for count in counts)
+        candidates = [QueryPlan("admin_batches", batches=batches, estimated_calls=batch_calls, shard_counts=counts)]
+
+        self.probes += 1
+        team_count = self.probe_count(base_filters + [{"field": "team_assignee_id", "operator": "=", "value": team_id}])
+        if team_count == total:
+            candidates.append(QueryPlan("team_assignee", team_id=team_id, estimated_calls=_pages(team_count, self.per_page),
+                                        shard_counts=[team_count]))
+        elif team_count is None:
+            self.emit("🧭 Intercom rejected the team_assignee_id filter; skipping it.")
+        else:
+            # Conversations assigned to the team aren't the same set as those assigned to its admins
+            self.emit(f"🧭 team_assignee_id matches {team_count} conversations vs {total} for the team's admins; not equivalent, skipping it.")
+
+        # Each admin costs at least one call, so this only wins when batches can't be used
+        candidates.append(QueryPlan("per_admin", batches=[[aid] for aid in admin_ids],
+                                    estimated_calls=max(len(admin_ids), batch_calls)))
+        for candidate in candidates:
+            self.emit(f"🧭 Candidate: {candidate.describe()}")
+        return min(candidates, key=lambda candidate: candidate.estimated_calls)
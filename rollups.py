@@ -0,0 +1,155 @@
+"""
+Rating rollups for fetched remarks.
+Every record keeps the conversation's admin_assignee_id and team_assignee_id,
+so per-admin and per-team scorecards come out of one team fetch instead of a
+crawl per admin. compute_rollups() groups the records once with pandas (count,
+CSAT, average rating and the 1-5 histogram by admin, team, day and week) and
+the engines hand the result to the UI with the records. The engines also pass
+the ratings they scanned without a remark, so CSAT covers every rated
+conversation; rollups of remarks alone (e.g. recomputed from loaded results)
+are labelled "CSAT among remarks". Days and weeks are in local time, like the
+date range filters.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Intercom's CSAT: the share of ratings that are 4 or 5
+CSAT_MIN_RATING = 4
+RATINGS = [1, 2, 3, 4, 5]
+UNASSIGNED = "unassigned"
+# Grouping name -> column of the records frame
+GROUPINGS = {"admin": "admin_id", "team": "team_id", "day": "day", "week": "week"}
+# Timezone offsets are whole quarter hours, so every timestamp in a bucket has the same local date
+_OFFSET_BUCKET = 900
+
+
+def assignee_id(value):
+    """Assignee ids as the admin/team maps store them (strings); None when unassigned"""
+    return str(value) if value not in (None, "", 0) else None
+
+
+def local_days(timestamps):
+    """datetime64[D] local dates of unix timestamps, converting each quarter hour once"""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    buckets, inverse = np.unique(timestamps // _OFFSET_BUCKET, return_inverse=True)
+    dates = np.array([datetime.fromtimestamp(int(b) * _OFFSET_BUCKET).date() for b in buckets], dtype="datetime64[D]")
+    return dates[inverse.reshape(-1)]
+
+
+def records_frame(records):
+    """One row per record: admin_id, team_id, rating (NaN if not 1-5), day and week (Monday)"""
+    ratings = pd.to_numeric(pd.Series([r.get("rating") for r in records], dtype=object), errors="coerce")
+    days = local_days([r.get("date") or 0 for r in records]) if records else np.array([], dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday, so (days since epoch + 3) % 7 is the weekday with Monday = 0
+    weekday = (days.astype(np.int64) + 3) % 7
+    return pd.DataFrame({
+        "admin_id": [assignee_id(r.get("admin_assignee_id")) or UNASSIGNED for r in records],
+        "team_id": [assignee_id(r.get("team_assignee_id")) or UNASSIGNED for r in records],
+        "rating": ratings.where(ratings.isin(RATINGS)).astype(float),
+        "day": days,
+        "week": days - weekday.astype("timedelta64[D]"),
+    })
+
+
+def _rollup(frame, key):
+    rated = frame["rating"].notna()
+    grouped = frame.assign(satisfied=frame["rating"] >= CSAT_MIN_RATING, rated=rated).groupby(key)
+    table = grouped.agg(remarks=("remark", "sum"), rated=("rated", "sum"),
+                        satisfied=("satisfied", "sum"), avg_rating=("rating", "mean"))
+    table["remarks"] = table["remarks"].astype(int)
+    table["csat"] = table["satisfied"] / table["rated"].where(table["rated"] > 0)
+    histogram = frame[rated].groupby([key, "rating"]).size().unstack(fill_value=0)
+    histogram = histogram.reindex(index=table.index, columns=[float(r) for r in RATINGS], fill_value=0)
+    for rating in RATINGS:
+        table[f"rating_{rating}"] = histogram[float(rating)].astype(int)
+    return table.drop(columns="satisfied")
+
+
+def compute_rollups(records, unremarked=None):
+    """{"admin"|"team"|"day"|"week": DataFrame, "overall": dict} for a fetch's records
+
+    unremarked are the ratings the fetch scanned without a remark
+    (FetchEngine.unremarked_ratings). With them rated, avg_rating, csat and
+    the histogram cover every rated conversation; without them only the
+    remarks, and overall["csat_basis"] is "remarks" instead of "ratings".
+    Each DataFrame is indexed by the grouping key and has remarks, rated,
+    avg_rating, csat (0-1, NaN without ratings) and rating_1..rating_5 columns.
+    Admins and teams are sorted by remark count, days and weeks by date.
+    """
+    frame = records_frame(list(records) + list(unremarked or []))
+    frame["remark"] = np.arange(len(frame)) < len(records)
+    rollups = {}
+    for name, column in GROUPINGS.items():
+        table = _rollup(frame, column)
+        if name in ("admin", "team"):
+            table = table.sort_values("remarks", ascending=False, kind="stable")
+        rollups[name] = table
+    rated = frame["rating"].dropna()
+    rollups["overall"] = {
+        "remarks": len(records),
+        "rated": len(rated),
+        "csat_basis": "remarks" if unremarked is None else "ratings",
+        "avg_rating": float(rated.mean()) if len(rated) else None,
+        "csat": float((rated >= CSAT_MIN_RATING).mean()) if len(rated) else None,
+    }
+    return rollups
+
+
+def csat_label(rollups):
+    """What the rollups' CSAT is over: every rating, or only the ones with a remark"""
+    return "CSAT" if rollups["overall"].get("csat_basis") == "ratings" else "CSAT among remarks"
+
+
+def scorecard_rows(table, names=None):
+    """Display rows (Name, Remarks, Ratings, CSAT, Avg Rating, 1..5) for an admin or team rollup"""
+    names = names or {}
+    rows = []
+    for key, row in table.iterrows():
+        entry = {
+            "Name": names.get(key, "Unassigned" if key == UNASSIGNED else key),
+            "Remarks": int(row["remarks"]),
+            "Ratings": int(row["rated"]),
+            "CSAT": f"{row['csat']:.0%}" if pd.notna(row["csat"]) else "-",
+            "Avg Rating": round(row["avg_rating"], 2) if pd.notna(row["avg_rating"]) else None,
+        }
+        for rating in RATINGS:
+            entry[f"{rating}★"] = int(row[f"rating_{rating}"])
+        rows.append(entry)
+    return rows
+
+
+def format_scorecards(rollups, admin_names=None, team_names=None, limit=15):
+    """Plain-text scorecards for the desktop Insights tab"""
+    overall = rollups["overall"]
+    if not overall["remarks"]:
+        return "No remarks to score."
+    lines = []
+    label = csat_label(rollups)
+    if overall["csat"] is not None:
+        lines.append(f"Overall: {overall['remarks']} remarks, {overall['rated']} ratings, {label} {overall['csat']:.0%}, "
+                     f"avg rating {overall['avg_rating']:.2f}")
+    for title, name, names in (("By admin", "admin", admin_names), ("By team", "team", team_names)):
+        rows = scorecard_rows(rollups[name].head(limit), names)
+        lines.append("")
+        lines.append(f"{title}:")
+        for row in rows:
+            lines.append(f"  {row['Name']}: {row['Remarks']} remarks, {row['Ratings']} ratings, {label} {row['CSAT']}, "
+                         f"avg {row['Avg Rating']}")
+        if len(rollups[name]) > limit:
+            lines.append(f"  ...and {len(rollups[name]) - limit} more")
+    weeks = rollups["week"]
+    if len(weeks):
+        lines.append("")
+        lines.append("By week:")
+        for week, row in weeks.iterrows():
+            csat = f"{row['csat']:.0%}" if pd.notna(row["csat"]) else "-"
+            lines.append(f"  {pd.Timestamp(week):%Y-%m-%d}: {int(row['remarks'])} remarks, {int(row['rated'])} ratings, "
+                         f"{label} {csat}")
+    return "\n".join(lines)
+
+
+def name_lookup(name_map):
+    """Invert an admin_map/team_map ("Name (email)" -> id) for scorecards"""
+    return {str(item_id): name for name, item_id in (name_map or {}).items()}
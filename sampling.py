@@ -0,0 +1,333 @@
+"""
+Sampling mode: estimate a huge range's ratings from a few pages.
+SampleEstimator splits the range into months (one stratum per month and query
+shard), probes each stratum's total_count, and cuts it into a grid of equal
+time slices sized to hold about one page each. It then reads a random set of
+slices per month, proportional to the month's size, and estimates the rating
+distribution, remark rate and CSAT over every rated conversation with 95%
+confidence intervals (stratified ratio estimates, slices as clusters).
+
+Refining reads another round of unread slices from the same grid, so the
+intervals shrink with every round and the estimate turns exact once every
+slice has been read: refining all the way is a full crawl. The sampler's state
+is a plain dict, so a frontend can keep it between rounds.
+"""
+import math
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import numpy as np
+import requests
+
+from cancellation import FetchCancelled
+from fetch_engine import ALL_RATINGS, LIVE_INTERVAL_SECONDS, FetchEngine, build_base_filters, format_duration
+from rollups import CSAT_MIN_RATING
+
+# Pages a sampling round reads (about one per slice), before the per-month minimum
+SAMPLE_PAGES = int(os.environ.get("FDBK_SAMPLE_PAGES", "40"))
+# Slices every month gets, so each month has a variance estimate of its own
+SAMPLE_MIN_SLICES = 2
+# Probes and slices in flight at once (the request scheduler still applies)
+SAMPLE_CONCURRENCY = 4
+# 95% normal interval
+CONFIDENCE_Z = 1.96
+# Per-slice counts: rated conversations, one column per rating, remarks
+_RATED, _REMARKS = 0, len(ALL_RATINGS) + 1
+
+
+def month_strata(start_date_str, end_date_str):
+    """[(month label, start ts, end ts), ...] covering the range, cut at month boundaries"""
+    start = datetime.strptime(start_date_str, "%Y-%m-%d")
+    end = datetime.strptime(end_date_str, "%Y-%m-%d") + timedelta(days=1)
+    strata = []
+    while start < end:
+        next_month = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+        stop = min(next_month, end)
+        strata.append((start.strftime("%Y-%m"), int(start.timestamp()), int(stop.timestamp())))
+        start = stop
+    return strata
+
+
+def _interval(estimate, variance):
+    half = CONFIDENCE_Z * math.sqrt(max(variance, 0.0))
+    return [estimate, max(0.0, estimate - half), min(1.0, estimate + half)]
+
+
+def _stratum_estimate(stratum):
+    """Ratio estimates and their variances for one stratum; None if nothing rated was read"""
+    counts = np.array(list(stratum["read"].values()), dtype=float)
+    rated = counts[:, _RATED]
+    if not rated.sum():
+        return None
+    # Column per metric: each rating's share, remark rate, CSAT
+    ys = np.column_stack([counts[:, 1:_REMARKS], counts[:, _REMARKS],
+                          counts[:, CSAT_MIN_RATING:_REMARKS].sum(axis=1)])
+    ratios = ys.sum(axis=0) / rated.sum()
+    read, slices = len(counts), stratum["slices"]
+    fpc = 1 - read / slices
+    if read > 1:
+        # Ratio estimator over cluster samples
+        residuals = ys - np.outer(rated, ratios)
+        variances = fpc * (residuals ** 2).sum(axis=0) / (read - 1) / (read * rated.mean() ** 2)
+    else:
+        # One slice has no spread to measure; fall back to a binomial variance
+        variances = fpc * ratios * (1 - ratios) / rated.sum()
+    return ratios, variances
+
+
+def summarize(state, elapsed=None):
+    """Estimate dict for a sampler state, shared by both frontends"""
+    strata = [stratum for stratum in state["strata"] if stratum["count"]]
+    total = sum(stratum["count"] for stratum in strata)
+    scanned = sum(int(sum(counts[_RATED] for counts in stratum["read"].values())) for stratum in strata)
+    estimates = [(stratum["count"], _stratum_estimate(stratum)) for stratum in strata if stratum["read"]]
+    estimates = [(count, estimate) for count, estimate in estimates if estimate is not None]
+    covered = sum(count for count, _ in estimates)
+    intervals = [None] * (len(ALL_RATINGS) + 2)
+    if covered:
+        # Months not sampled yet are left out of the weights rather than guessed
+        weights = np.array([count / covered for count, _ in estimates])
+        ratios = np.array([estimate[0] for _, estimate in estimates])
+        variances = np.array([estimate[1] for _, estimate in estimates])
+        values = weights @ ratios
+        spreads = (weights ** 2) @ variances
+        intervals = [_interval(float(value), float(spread)) for value, spread in zip(values, spreads)]
+    slices = sum(stratum["slices"] for stratum in strata)
+    slices_read = sum(len(stratum["read"]) for stratum in strata)
+    return {
+        "range": state["range"],
+        "conversations": total,
+        "scanned": scanned,
+        "fraction_read": scanned / total if total else 1.0,
+        "pages": state["pages"],
+        "full_crawl_pages": sum(math.ceil(stratum["count"] / state["per_page"]) for stratum in strata),
+        "requests": state["requests"],
+        "months": len({stratum["label"] for stratum in state["strata"]}),
+        "months_sampled": len({stratum["label"] for stratum in strata if stratum["read"]}),
+        "slices": slices,
+        "slices_read": slices_read,
+        "exact": slices_read == slices,
+        "distribution": {rating: intervals[n] for n, rating in enumerate(ALL_RATINGS)},
+        "remark_rate": intervals[-2],
+        "csat": intervals[-1],
+        "estimated_remarks": round(intervals[-2][0] * total) if intervals[-2] else None,
+        "elapsed": elapsed,
+        "state": state
+    }
+
+
+def _format_metric(metric, exact):
+    if metric is None:
+        return "-"
+    if exact:
+        return f"{metric[0]:.1%}"
+    return f"{metric[0]:.1%} ({metric[1]:.1%}-{metric[2]:.1%})"
+
+
+def describe_estimate(estimate):
+    """Human-readable lines for a sampling estimate, shared by both frontends"""
+    exact = estimate["exact"]
+    lines = [f"{'Exact' if exact else 'Estimated'} over {estimate['conversations']} rated conversations "
+             f"({estimate['months']} month{'s' if estimate['months'] != 1 else ''}):"]
+    lines.append(f"CSAT {_format_metric(estimate['csat'], exact)} · "
+                 f"remark rate {_format_metric(estimate['remark_rate'], exact)}"
+                 + (f" (~{estimate['estimated_remarks']} remarks)" if estimate["estimated_remarks"] is not None else ""))
+    lines.append("Ratings: " + " · ".join(f"{rating}★ {_format_metric(metric, exact)}"
+                                          for rating, metric in estimate["distribution"].items()))
+    read = (f"Read {estimate['scanned']} conversations ({estimate['fraction_read']:.1%} of the range) in "
+            f"{estimate['pages']} pages (a full crawl is ~{estimate['full_crawl_pages']}), {estimate['requests']} requests")
+    if estimate.get("elapsed") is not None:
+        read += f", {format_duration(estimate['elapsed'])}"
+    lines.append(read)
+    if not exact:
+        coverage = f"{estimate['slices_read']}/{estimate['slices']} time slices"
+        if estimate["months_sampled"] < estimate["months"]:
+            coverage += f", {estimate['months'] - estimate['months_sampled']} month(s) not sampled yet"
+        lines.append(f"95% intervals from {coverage}; refine to narrow them.")
+    return lines
+
+
+class SampleEstimator(FetchEngine):
+    """FetchEngine that reads random time slices instead of every page
+
+    Emits ("SAMPLE_ESTIMATE", estimate) as slices come in and once more when
+    the round ends; estimate["state"] is what refine() continues from.
+    """
+
+    def __init__(self, token, emit, state=None, seed=None, **kwargs):
+        # Counting ratings needs no translations, and bigger pages mean fewer slices
+        kwargs.setdefault("translate", False)
+        kwargs.setdefault("per_page", 150)
+        super().__init__(token, emit, **kwargs)
+        self.state = state
+        self.rng = random.Random(seed)
+        self.estimate = None
+
+    def sample(self, admin_id, start_date_str, end_date_str, team_id=None, team_admins_map=None, pages=SAMPLE_PAGES):
+        """Probe the range's months and read a first round of slices; returns the estimate, or None"""
+        self.start_time = time.monotonic()
+        try:
+            if not self._plan(admin_id, start_date_str, end_date_str, team_id, team_admins_map):
+                return None
+            return self._round(pages)
+        except FetchCancelled:
+            self.cancelled = True
+            self.emit("🛑 🦊 Sampling cancelled.")
+        except requests.exceptions.RequestException as e:
+            self.emit(f"❌ 🦊 Oof! Sampling failed: {e}")
+        return self.estimate
+
+    def refine(self, pages=None):
+        """Read another round of unread slices, by default as many pages as were read so far"""
+        self.start_time = time.monotonic()
+        try:
+            return self._round(pages or max(SAMPLE_PAGES, self.state["pages"]))
+        except FetchCancelled:
+            self.cancelled = True
+            self.emit("🛑 🦊 Refining cancelled; keeping the slices read so far.")
+        except requests.exceptions.RequestException as e:
+            self.emit(f"❌ 🦊 Oof! Refining failed: {e}")
+        return self.estimate
+
+    def _plan(self, admin_id, start_date_str, end_date_str, team_id, team_admins_map):
+        try:
+            base_filters = build_base_filters(start_date_str, end_date_str)
+            strata = month_strata(start_date_str, end_date_str)
+        except ValueError as e:
+            self.emit(f"❌ !!! Date conversion error: {e}")
+            return False
+        self.emit(f"🎲 🦊 Sampling {len(strata)} month{'s' if len(strata) != 1 else ''} from {start_date_str} to {end_date_str}...")
+        shard_filters = self._query_shards(admin_id, team_id, team_admins_map, base_filters)
+        if not shard_filters:
+            return False
+        self.state = {
+            "range": [admin_id, team_id, start_date_str, end_date_str],
+            "per_page": self.per_page,
+            # What each shard adds to the date and rating filters: its admin/team scope
+            "scopes": [filters[len(base_filters):] for filters in shard_filters],
+            "strata": [],
+            "pages": 0,
+            "requests": 0
+        }
+        cells = [(label, start_ts, end_ts, shard) for label, start_ts, end_ts in strata
+                 for shard in range(len(shard_filters))]
+        self.emit(("CURRENT_ACTIVITY", f"🎲 Sizing up {len(strata)} month{'s' if len(strata) != 1 else ''}..."))
+        with ThreadPoolExecutor(max_workers=SAMPLE_CONCURRENCY, thread_name_prefix="sample") as executor:
+            counts = list(executor.map(self._probe_cell, cells))
+        if None in counts:
+            self.emit("❌ 🦊 Intercom rejected the sampling query.")
+            return False
+        for (label, start_ts, end_ts, shard), count in zip(cells, counts):
+            self.state["strata"].append({
+                "label": label, "shard": shard, "start": start_ts, "end": end_ts, "count": count,
+                # Equal time slices of about a page each; never shorter than a second
+                "slices": min(max(1, math.ceil(count / self.per_page)), end_ts - start_ts) if count else 0,
+                "read": {}
+            })
+        # Planner and count probes included
+        self.state["requests"] = self.stats.requests
+        total = sum(stratum["count"] for stratum in self.state["strata"])
+        self.emit(f"🎲 {total} rated conversations in range (~{math.ceil(total / self.per_page)} pages to crawl it all).")
+        return True
+
+    def _probe_cell(self, cell):
+        _, start_ts, end_ts, shard = cell
+        self._check_cancelled()
+        return self.probe_count(self._slice_filters(self.state["scopes"][shard], start_ts, end_ts))
+
+    def _slice_filters(self, scope, start_ts, end_ts):
+        return [
+            {"field": "created_at", "operator": ">", "value": str(start_ts - 1)},
+            {"field": "created_at", "operator": "<", "value": str(end_ts)},
+            {"field": "conversation_rating.score", "operator": "IN", "value": ALL_RATINGS}
+        ] + scope
+
+    def _allocate(self, pages):
+        """Slices to read per stratum: proportional to its size, at least SAMPLE_MIN_SLICES"""
+        strata = self.state["strata"]
+        total = sum(stratum["count"] for stratum in strata)
+        allocation = []
+        for stratum in strata:
+            unread = stratum["slices"] - len(stratum["read"])
+            if not unread:
+                allocation.append(0)
+                continue
+            share = round(pages * stratum["count"] / total)
+            minimum = min(SAMPLE_MIN_SLICES, stratum["slices"]) - len(stratum["read"])
+            allocation.append(min(unread, max(share, minimum, 0)))
+        if not any(allocation) and any(stratum["slices"] > len(stratum["read"]) for stratum in strata):
+            # Tiny budgets still make progress: one slice in the biggest unread stratum
+            biggest = max((n for n, stratum in enumerate(strata) if stratum["slices"] > len(stratum["read"])),
+                          key=lambda n: strata[n]["count"])
+            allocation[biggest] = 1
+        return allocation
+
+    def _round(self, pages):
+        allocation = self._allocate(pages)
+        planned = sum(allocation)
+        if not planned:
+            self.emit("✅ 🦊 Every slice has been read already; the estimate is exact.")
+        else:
+            self.emit(f"🎲 🦊 Reading {planned} random time slice{'s' if planned != 1 else ''}...")
+        picks = []
+        for stratum, count in zip(self.state["strata"], allocation):
+            unread = [n for n in range(stratum["slices"]) if str(n) not in stratum["read"]]
+            picks.extend((stratum, index) for index in self.rng.sample(unread, count))
+        # Read in random order, so running estimates span every month from the start
+        self.rng.shuffle(picks)
+        requests_before = self.stats.requests - self.state["requests"]
+        self._live_emitted_at = time.monotonic()
+        with ThreadPoolExecutor(max_workers=SAMPLE_CONCURRENCY, thread_name_prefix="sample") as executor:
+            futures = {executor.submit(self._read_slice, stratum, index): (stratum, index) for stratum, index in picks}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    stratum, index = futures[future]
+                    stratum["read"][str(index)], slice_pages = future.result()
+                    self.state["pages"] += slice_pages
+                    self.emit(("CURRENT_ACTIVITY", f"🎲 Read slice {done}/{planned} ({stratum['label']})"))
+                    if time.monotonic() - self._live_emitted_at >= LIVE_INTERVAL_SECONDS:
+                        self._live_emitted_at = time.monotonic()
+                        self._publish(requests_before)
+            finally:
+                # A cancelled or failed round still keeps (and reports) the slices it read
+                for future in futures:
+                    future.cancel()
+                self._publish(requests_before)
+        for line in describe_estimate(self.estimate):
+            self.emit(f"🎲 {line}")
+        return self.estimate
+
+    def _publish(self, requests_before):
+        self.state["requests"] = self.stats.requests - requests_before
+        self.estimate = summarize(self.state, time.monotonic() - self.start_time)
+        self.emit(("SAMPLE_ESTIMATE", self.estimate))
+
+    def _read_slice(self, stratum, index):
+        """Every page of one time slice, reduced to its per-rating and remark counts; returns (counts, pages)"""
+        span = stratum["end"] - stratum["start"]
+        start_ts = stratum["start"] + span * index // stratum["slices"]
+        end_ts = stratum["start"] + span * (index + 1) // stratum["slices"]
+        filters = self._slice_filters(self.state["scopes"][stratum["shard"]], start_ts, end_ts)
+        payload = {"query": {"operator": "AND", "value": filters}, "pagination": {"per_page": self.per_page}}
+        counts = [0] * (len(ALL_RATINGS) + 2)
+        pages = 0
+        while True:
+            self._check_cancelled()
+            response = self._post_search(payload)
+            pages += 1
+            response.raise_for_status()
+            with self.timings.time("json_decode"):
+                data = response.json()
+            for convo in data.get("conversations", []):
+                rating_data = convo.get("conversation_rating") or {}
+                if rating_data.get("rating") not in ALL_RATINGS:
+                    continue
+                counts[_RATED] += 1
+                counts[rating_data["rating"]] += 1
+                if rating_data.get("remark") is not None:
+                    counts[_REMARKS] += 1
+            if not self._next_page(data, payload):
+                return counts, pages
@@ -0,0 +1,184 @@
+"""
+Central scheduler for outgoing Intercom requests.
+Every session shares one scheduler, which hands out request slots with
+per-user fair queuing, priority for small interactive queries over bulk
+crawls, and operator-set concurrency caps. Threads take slots with slot(),
+coroutines on the async engine's event loop with aslot().
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+# Queries expected to span more pages than this are scheduled as bulk crawls
+BULK_PAGE_THRESHOLD = 10
+
+
+def user_key_for_token(token):
+    """Stable fair-queuing key for a token without keeping the token itself"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+class _Ticket:
+    def __init__(self, user_key, priority):
+        self.user_key = user_key
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        # (loop, future) for coroutines waiting in aslot(); threads wait on the condition
+        self.waiter = None
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RequestScheduler:
+    """Hands out request slots; callers block until their turn comes up"""
+
+    def __init__(self, max_concurrency=8, per_user_concurrency=2, starvation_seconds=10.0):
+        self.max_concurrency = max_concurrency
+        self.per_user_concurrency = per_user_concurrency
+        # Bulk requests waiting longer than this are served as if interactive
+        self.starvation_seconds = starvation_seconds
+        self._cond = threading.Condition()
+        # priority -> OrderedDict(user_key -> deque of tickets); order gives round-robin
+        self._queues = {PRIORITY_INTERACTIVE: OrderedDict(), PRIORITY_BULK: OrderedDict()}
+        self._active = 0
+        self._active_by_user = {}
+
+    @classmethod
+    def from_env(cls):
+        """Build a scheduler from the operator's environment settings"""
+        return cls(
+            max_concurrency=int(os.environ.get("FDBK_MAX_CONCURRENT_REQUESTS", "8")),
+            per_user_concurrency=int(os.environ.get("FDBK_MAX_REQUESTS_PER_USER", "2")),
+            starvation_seconds=float(os.environ.get("FDBK_BULK_MAX_WAIT_SECONDS", "10"))
+        )
+
+    @contextmanager
+    def slot(self, user_key, priority=PRIORITY_INTERACTIVE):
+        """Hold a request slot for the duration of the block"""
+        ticket = self._acquire(user_key, priority)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, user_key, priority=PRIORITY_INTERACTIVE):
+        """Async version of slot(): waits on the event loop instead of blocking a thread"""
+        loop = asyncio.get_running_loop()
+        ticket = _Ticket(user_key, priority)
+        ticket.waiter = (loop, loop.create_future())
+        with self._cond:
+            self._queues[priority].setdefault(user_key, deque()).append(ticket)
+            self._dispatch()
+        try:
+            await ticket.waiter[1]
+        except asyncio.CancelledError:
+            with self._cond:
+                if not ticket.granted:
+                    self._remove(ticket)
+                    ticket = None
+            if ticket is not None:
+                self._release(ticket)
+            raise
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def try_acquire(self, user_key, priority=PRIORITY_INTERACTIVE):
+        """A slot right now if one is free and nobody is waiting; returns a release callable, or None"""
+        with self._cond:
+            if (self._active >= self.max_concurrency or not self._has_capacity(user_key)
+                    or any(self._queues.values())):
+                return None
+            ticket = _Ticket(user_key, priority)
+            ticket.granted = True
+            self._active += 1
+            self._active_by_user[user_key] = self._active_by_user.get(user_key, 0) + 1
+        return lambda: self._release(ticket)
+
+    def stats(self):
+        """Snapshot of active and queued requests for status displays"""
+        with self._cond:
+            queued = {priority: sum(len(q) for q in users.values())
+                      for priority, users in self._queues.items()}
+            return {"active": self._active, "queued": queued}
+
+    def _acquire(self, user_key, priority):
+        ticket = _Ticket(user_key, priority)
+        with self._cond:
+            self._queues[priority].setdefault(user_key, deque()).append(ticket)
+            self._dispatch()
+            while not ticket.granted:
+                self._cond.wait()
+        return ticket
+
+    def _release(self, ticket):
+        with self._cond:
+            self._active -= 1
+            self._active_by_user[ticket.user_key] -= 1
+            if not self._active_by_user[ticket.user_key]:
+                del self._active_by_user[ticket.user_key]
+            self._dispatch()
+
+    def _dispatch(self):
+        granted_any = False
+        while self._active < self.max_concurrency:
+            ticket = self._pick()
+            if ticket is None:
+                break
+            ticket.granted = True
+            if ticket.waiter is not None:
+                loop, future = ticket.waiter
+                loop.call_soon_threadsafe(_wake, future)
+            self._active += 1
+            self._active_by_user[ticket.user_key] = self._active_by_user.get(ticket.user_key, 0) + 1
+            granted_any = True
+        if granted_any:
+            self._cond.notify_all()
+
+    def _pick(self):
+        now = time.monotonic()
+        bulk = self._queues[PRIORITY_BULK]
+        # Promote starved bulk work so big crawls still make progress under load
+        for user_key, tickets in bulk.items():
+            if now - tickets[0].enqueued_at >= self.starvation_seconds and self._has_capacity(user_key):
+                return self._pop(bulk, user_key)
+        for priority in (PRIORITY_INTERACTIVE, PRIORITY_BULK):
+            users = self._queues[priority]
+            for user_key in list(users):
+                if self._has_capacity(user_key):
+                    return self._pop(users, user_key)
+        return None
+
+    def _remove(self, ticket):
+        users = self._queues[ticket.priority]
+        tickets = users.get(ticket.user_key)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del users[ticket.user_key]
+
+    def _has_capacity(self, user_key):
+        return self._active_by_user.get(user_key, 0) < self.per_user_concurrency
+
+    def _pop(self, users, user_key):
+        tickets = users[user_key]
+        ticket = tickets.popleft()
+        if tickets:
+            # Move this user to the back of the line
+            users.move_to_end(user_key)
+        else:
+            del users[user_key]
+        return ticket
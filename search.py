@@ -0,0 +1,161 @@
+"""
+In-memory full-text search over fetched remarks.
+RemarkIndex keeps an inverted index (token -> ids of the records containing it)
+over each record's original and translated remark, plus adjacent word pairs so
+phrase queries are posting-list intersections too. It's built incrementally:
+sync() indexes whatever records were appended since the last call, so the
+frontends keep it current while the fetch loop is still adding results, and a
+query only touches the posting lists of its own terms, whatever the report's
+size.
+
+Query syntax: words must all match (refund bridge), a trailing * matches a
+prefix (refun*), "double quotes" match a phrase, and OR between clauses
+matches either side (refund OR "money back").
+"""
+import bisect
+import re
+import threading
+
+_TOKEN_RE = re.compile(r"\w+")
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+# Separates the original and translated text in a record's token list, so phrases don't span them
+_FIELD_BREAK = None
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text or "").casefold())
+
+
+def parse_query(query):
+    """[[(kind, value), ...], ...]: OR-ed clauses of AND-ed word/prefix/phrase terms"""
+    clauses = [[]]
+    for phrase, word in _QUERY_RE.findall(query):
+        if word == "OR":
+            clauses.append([])
+        elif phrase:
+            tokens = tokenize(phrase)
+            if len(tokens) == 1:
+                clauses[-1].append(("word", tokens[0]))
+            elif tokens:
+                clauses[-1].append(("phrase", tuple(tokens)))
+        elif word.endswith("*") and tokenize(word):
+            clauses[-1].append(("prefix", tokenize(word)[0]))
+        else:
+            clauses[-1].extend(("word", token) for token in tokenize(word))
+    return [clause for clause in clauses if clause]
+
+
+class RemarkIndex:
+    """Inverted index over records' remark and translated_remark, in record order"""
+
+    def __init__(self):
+        self._postings = {}
+        self._vocabulary = []  # sorted, for prefix lookups
+        self._doc_tokens = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_tokens)
+
+    def add(self, record):
+        """Index one record; returns its id (its position among the indexed records)"""
+        with self._lock:
+            return self._add(record)
+
+    def _add(self, record):
+        tokens = tokenize(record.get("remark"))
+        translated = record.get("translated_remark")
+        if translated:
+            tokens += [_FIELD_BREAK] + tokenize(translated)
+        doc_id = len(self._doc_tokens)
+        self._doc_tokens.append(tuple(tokens))
+        pairs = {f"{a} {b}" for a, b in zip(tokens, tokens[1:]) if a is not _FIELD_BREAK and b is not _FIELD_BREAK}
+        for token in set(tokens) | pairs:
+            if token is _FIELD_BREAK:
+                continue
+            postings = self._postings.get(token)
+            if postings is None:
+                self._postings[token] = [doc_id]
+                if token not in pairs:
+                    bisect.insort(self._vocabulary, token)
+            else:
+                postings.append(doc_id)
+        return doc_id
+
+    def sync(self, records):
+        """Index records appended since the last sync; start over if the list was replaced or cleared
+
+        The whole sync holds the lock, so two threads syncing the same index
+        can't both index the same records.
+        """
+        with self._lock:
+            if len(records) < len(self._doc_tokens):
+                self._clear()
+            # Slice first: the fetch loop may still be appending to the list
+            for record in records[len(self._doc_tokens):]:
+                self._add(record)
+            return len(self._doc_tokens)
+
+    def copy(self, limit=None):
+        """An independent index over the first limit records (all of them by default)"""
+        clone = RemarkIndex()
+        with self._lock:
+            limit = len(self._doc_tokens) if limit is None else min(limit, len(self._doc_tokens))
+            clone._doc_tokens = self._doc_tokens[:limit]
+            for token, postings in self._postings.items():
+                end = bisect.bisect_left(postings, limit)
+                if end:
+                    clone._postings[token] = postings[:end]
+            clone._vocabulary = [token for token in self._vocabulary if token in clone._postings]
+        return clone
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._postings.clear()
+        self._vocabulary.clear()
+        self._doc_tokens.clear()
+
+    def _docs(self, kind, value):
+        if kind == "word":
+            return set(self._postings.get(value, ()))
+        if kind == "prefix":
+            docs = set()
+            start = bisect.bisect_left(self._vocabulary, value)
+            for token in self._vocabulary[start:]:
+                if not token.startswith(value):
+                    break
+                docs.update(self._postings[token])
+            return docs
+        # Phrase: records with every adjacent pair; longer phrases still need their order checked
+        docs = self._intersect([set(self._postings.get(f"{a} {b}", ())) for a, b in zip(value, value[1:])])
+        if len(value) == 2:
+            return docs
+        return {doc for doc in docs if self._has_phrase(self._doc_tokens[doc], value)}
+
+    @staticmethod
+    def _has_phrase(tokens, phrase):
+        first, length = phrase[0], len(phrase)
+        return any(tokens[i:i + length] == phrase for i, token in enumerate(tokens) if token == first)
+
+    @staticmethod
+    def _intersect(sets):
+        if not sets:
+            return set()
+        sets = sorted(sets, key=len)
+        docs = sets[0]
+        for other in sets[1:]:
+            docs = docs & other
+            if not docs:
+                break
+        return docs
+
+    def search(self, query):
+        """Ids of the matching records, in record order"""
+        with self._lock:
+            docs = set()
+            for clause in parse_query(query):
+                docs |= self._intersect([self._docs(kind, value) for kind, value in clause])
+            return sorted(docs)
@@ -0,0 +1,99 @@
+"""
+Per-stage timers for fetch runs.
+The engines time each stage of a run (waiting for a request slot, HTTP, JSON
+decoding, record extraction, translation cache hits and network calls, and
+handing messages to the UI) and report counts and p50/p95/max in the run
+summary, so we can see where a slow run's time actually goes.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Display order and labels; frontends may add their own stages after these
+STAGE_LABELS = {
+    "queue_wait": "Request slot wait",
+    "http_wait": "HTTP wait",
+    "json_decode": "JSON decode",
+    "extract": "Record extraction",
+    "translate_cache": "Translation (cache hit)",
+    "translate_network": "Translation (network)",
+    "live_aggregates": "Live aggregates",
+    "rollups": "Rating rollups",
+    "dispatch": "Log/UI dispatch",
+    "ui_update": "UI update (desktop)",
+}
+
+# Percentiles come from a uniform sample once a stage has more timings than this
+MAX_SAMPLES = 5000
+
+
+class _Stage:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            # Reservoir sampling keeps the sample uniform over the whole run
+            slot = random.randrange(self.count)
+            if slot < MAX_SAMPLES:
+                self.samples[slot] = seconds
+
+
+class StageTimings:
+    """Thread-safe timing samples keyed by stage name"""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self._stages.setdefault(stage, _Stage()).add(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def summary(self):
+        """{stage: {count, p50, p95, max, total}} with times in seconds"""
+        with self._lock:
+            stages = {name: (stage.count, stage.total, stage.max, sorted(stage.samples))
+                      for name, stage in self._stages.items()}
+        summary = {}
+        for name, (count, total, longest, ordered) in stages.items():
+            summary[name] = {
+                "count": count,
+                "p50": ordered[int(len(ordered) * 0.5)],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max": longest,
+                "total": total,
+            }
+        return summary
+
+
+def ordered_stages(summary):
+    """(stage, stats) pairs in display order"""
+    known = [stage for stage in STAGE_LABELS if stage in summary]
+    return [(stage, summary[stage]) for stage in known + sorted(set(summary) - set(known))]
+
+
+def format_stage_table(summary):
+    """Fixed-width table lines for logs"""
+    lines = [f"{'Stage':<25}{'Count':>8}{'p50 ms':>10}{'p95 ms':>10}{'Max ms':>10}{'Total s':>10}"]
+    for stage, stats in ordered_stages(summary):
+        lines.append(f"{STAGE_LABELS.get(stage, stage):<25}{stats['count']:>8}{stats['p50'] * 1000:>10.1f}"
+                     f"{stats['p95'] * 1000:>10.1f}{stats['max'] * 1000:>10.1f}{stats['total']:>10.2f}")
+    return lines
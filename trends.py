@@ -0,0 +1,192 @@
+"""
+Persistent daily rating aggregates for long-range trends.
+Every clean fetch also writes one row per day x team x admin x rating to a
+small SQLite store: how many conversations got that rating, and how many of
+those left a remark. CSAT comes from every rating, not just the ones with a
+remark. The days the fetch fully covered are stored too. Trend views read from
+the store and only the missing days are backfilled from Intercom, so a
+year-long CSAT trend is a single indexed query once its days have been
+fetched. Rows are kept per query scope (workspace, team and admin filter)
+because a team search and an admin search cover different conversations. Today
+is never marked as covered since it isn't over.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from rollups import CSAT_MIN_RATING, RATINGS, records_frame
+
+TRENDS_DB = os.environ.get("FDBK_TRENDS_DB") or os.path.join(os.path.expanduser("~"), ".fdbckfndr", "trends.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_ratings (
+    scope TEXT NOT NULL, day TEXT NOT NULL, team_id TEXT NOT NULL, admin_id TEXT NOT NULL,
+    rating INTEGER NOT NULL, count INTEGER NOT NULL, remarks INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, day, team_id, admin_id, rating)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS daily_ratings_admin ON daily_ratings (scope, admin_id, day);
+CREATE INDEX IF NOT EXISTS daily_ratings_team ON daily_ratings (scope, team_id, day);
+-- daily_ratings summed over teams and admins: what unfiltered trends read
+CREATE TABLE IF NOT EXISTS daily_totals (
+    scope TEXT NOT NULL, day TEXT NOT NULL, rating INTEGER NOT NULL, count INTEGER NOT NULL,
+    remarks INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (scope, day, rating)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS covered_days (
+    scope TEXT NOT NULL, day TEXT NOT NULL, fetched_at REAL NOT NULL,
+    PRIMARY KEY (scope, day)
+) WITHOUT ROWID;
+"""
+
+
+def trend_scope(user_key, admin_id=None, team_id=None):
+    """Store key for a search: same workspace and filters, same conversations"""
+    return f"{user_key}|team:{team_id or ''}|admin:{admin_id or ''}"
+
+
+def _days(start_date, end_date):
+    start = datetime.strptime(start_date, "%Y-%m-%d").date()
+    # Only finished days can be covered
+    end = min(datetime.strptime(end_date, "%Y-%m-%d").date(), date.today() - timedelta(days=1))
+    return [(start + timedelta(days=n)).isoformat() for n in range((end - start).days + 1)]
+
+
+class TrendStore:
+    """Daily rating counts per query scope, persisted in SQLite"""
+
+    def __init__(self, path=None):
+        self.path = path or TRENDS_DB
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+            self._migrate(db)
+
+    @staticmethod
+    def _migrate(db):
+        """Stores from before the remarks column counted remarks only; forget them so the days are backfilled"""
+        columns = {row[1] for row in db.execute("PRAGMA table_info(daily_ratings)")}
+        if "remarks" in columns:
+            return
+        db.execute("ALTER TABLE daily_ratings ADD COLUMN remarks INTEGER NOT NULL DEFAULT 0")
+        db.execute("ALTER TABLE daily_totals ADD COLUMN remarks INTEGER NOT NULL DEFAULT 0")
+        for table in ("daily_ratings", "daily_totals", "covered_days"):
+            db.execute(f"DELETE FROM {table}")
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def record_fetch(self, scope, start_date, end_date, records, unremarked):
+        """Replace the scope's rows for the fetched days and mark them covered; returns the days covered
+
+        records are the fetch's remarks, unremarked the ratings it scanned
+        without one (FetchEngine.unremarked_ratings).
+        """
+        days = _days(start_date, end_date)
+        if not days:
+            return 0
+        frame = records_frame(list(records) + list(unremarked))
+        frame["remark"] = np.arange(len(frame)) < len(records)
+        frame = frame.dropna(subset=["rating"])
+        frame = frame.assign(day=pd.to_datetime(frame["day"]).dt.strftime("%Y-%m-%d"), rating=frame["rating"].astype(int))
+        frame = frame[frame["day"].between(days[0], days[-1])]
+        counts = frame.groupby(["day", "team_id", "admin_id", "rating"])["remark"].agg(["size", "sum"])
+        rows = [(scope, day, team_id, admin_id, int(rating), int(count), int(remarks))
+                for (day, team_id, admin_id, rating), (count, remarks) in counts.iterrows()]
+        fetched_at = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM daily_ratings WHERE scope = ? AND day BETWEEN ? AND ?", (scope, days[0], days[-1]))
+            db.executemany("INSERT INTO daily_ratings VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            db.execute("DELETE FROM daily_totals WHERE scope = ? AND day BETWEEN ? AND ?", (scope, days[0], days[-1]))
+            db.execute("INSERT INTO daily_totals SELECT scope, day, rating, SUM(count), SUM(remarks) FROM daily_ratings "
+                       "WHERE scope = ? AND day BETWEEN ? AND ? GROUP BY day, rating", (scope, days[0], days[-1]))
+            db.executemany("INSERT OR REPLACE INTO covered_days VALUES (?, ?, ?)", [(scope, day, fetched_at) for day in days])
+        return len(days)
+
+    def missing_ranges(self, scope, start_date, end_date):
+        """(start, end) date strings of the uncovered stretches in a range, oldest first"""
+        days = _days(start_date, end_date)
+        if not days:
+            return []
+        covered = {row[0] for row in self._connect().execute(
+            "SELECT day FROM covered_days WHERE scope = ? AND day BETWEEN ? AND ?", (scope, days[0], days[-1]))}
+        ranges = []
+        for day in days:
+            if day in covered:
+                continue
+            if ranges and ranges[-1][1] == (date.fromisoformat(day) - timedelta(days=1)).isoformat():
+                ranges[-1][1] = day
+            else:
+                ranges.append([day, day])
+        return [tuple(r) for r in ranges]
+
+    def trend(self, scope, start_date, end_date, admin_id=None, team_id=None, freq="D"):
+        """Covered days (or weeks, freq="W") with ratings, remarks, csat, avg_rating and rating_1..rating_5
+
+        admin_id/team_id narrow the scope's rows to one assignee, e.g. one
+        admin's trend out of a team's store.
+        """
+        days = _days(start_date, end_date)
+        columns = ["ratings", "remarks", "csat", "avg_rating"] + [f"rating_{r}" for r in RATINGS]
+        if not days:
+            return pd.DataFrame(columns=columns)
+        table, where, params = "daily_totals", "scope = ? AND day BETWEEN ? AND ?", [scope, days[0], days[-1]]
+        if admin_id is not None or team_id is not None:
+            table = "daily_ratings"
+        if admin_id is not None:
+            where += " AND admin_id = ?"
+            params.append(str(admin_id))
+        if team_id is not None:
+            where += " AND team_id = ?"
+            params.append(str(team_id))
+        db = self._connect()
+        rows = db.execute(f"SELECT day, rating, SUM(count), SUM(remarks) FROM {table} WHERE {where} GROUP BY day, rating",
+                          params).fetchall()
+        covered = [row[0] for row in db.execute(
+            "SELECT day FROM covered_days WHERE scope = ? AND day BETWEEN ? AND ? ORDER BY day", (scope, days[0], days[-1]))]
+        index = pd.DatetimeIndex(pd.to_datetime(covered), name="day")
+        daily = pd.DataFrame(rows, columns=["day", "rating", "count", "remarks"])
+        daily = daily.assign(day=pd.to_datetime(daily["day"]))
+        histogram = daily.pivot_table(index="day", columns="rating", values="count", aggfunc="sum", fill_value=0)
+        histogram = histogram.reindex(index=index, columns=RATINGS, fill_value=0)
+        remarks = daily.groupby("day")["remarks"].sum().reindex(index, fill_value=0)
+        if freq == "W":
+            # Weeks start on Monday, like the rollups
+            histogram = histogram.resample("W-MON", label="left", closed="left").sum()
+            remarks = remarks.resample("W-MON", label="left", closed="left").sum()
+        counts = histogram.to_numpy(dtype=np.int64)
+        ratings = counts.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            trend = pd.DataFrame({
+                "ratings": ratings,
+                "remarks": remarks.to_numpy(dtype=np.int64),
+                "csat": np.where(ratings > 0, counts[:, CSAT_MIN_RATING - 1:].sum(axis=1) / ratings, np.nan),
+                "avg_rating": np.where(ratings > 0, counts @ np.array(RATINGS) / ratings, np.nan),
+            }, index=histogram.index)
+        for i, rating in enumerate(RATINGS):
+            trend[f"rating_{rating}"] = counts[:, i]
+        return trend
+
+
+def format_trend(table, width=30):
+    """Text trend for the desktop app: one line per period with a CSAT bar"""
+    lines = []
+    for period, row in table.iterrows():
+        if row["ratings"]:
+            bar = "█" * int(round(row["csat"] * width))
+            lines.append(f"{period:%Y-%m-%d}  {bar:<{width}} {row['csat']:>4.0%}  "
+                         f"({int(row['ratings'])} ratings, {int(row['remarks'])} remarks)")
+        else:
+            lines.append(f"{period:%Y-%m-%d}  {'':<{width}}    -  (0 ratings)")
+    return "\n".join(lines) if lines else "No covered days in this range yet."
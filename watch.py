@@ -0,0 +1,179 @@
+"""
+Watch mode: keep a finished search's results current.
+FetchWatcher polls the search endpoint for conversations updated after a
+high-water mark (the start of the fetch it extends, then the newest updated_at
+it has seen) and appends their remarks to the same results list, translating
+and aggregating just those. A poll is one search request, plus one per extra
+page when a burst of ratings arrives between polls: no date range is re-crawled.
+
+Polls reach back WATCH_OVERLAP_SECONDS past the mark, in case Intercom indexes
+an update a little late; conversations already in the results are skipped.
+Remarks left on older conversations show up too, since rating one updates it.
+"""
+import os
+import time
+from datetime import datetime
+
+import requests
+
+from cancellation import FetchCancelled
+from fetch_engine import ALL_RATINGS, FetchEngine, normalize_ratings
+from query_planner import admin_or_group, known_clause_limit
+from rollups import assignee_id, compute_rollups
+
+WATCH_INTERVAL_SECONDS = int(os.environ.get("FDBK_WATCH_INTERVAL", "60"))
+WATCH_OVERLAP_SECONDS = 120
+# Arrivals the frontends keep on screen
+WATCH_ARRIVALS_SHOWN = 50
+
+
+def watched_admin_ids(admin_id, team_id, team_admin_ids):
+    """Admins a watch covers, the same way FetchEngine._query_shards picks them"""
+    if admin_id and (not team_id or admin_id in team_admin_ids):
+        return [admin_id]
+    return list(team_admin_ids)
+
+
+class FetchWatcher(FetchEngine):
+    """FetchEngine that polls for new remarks instead of crawling a date range
+
+    Emits ("WATCH_UPDATE", update) after every poll, where update has the
+    poll's new records plus running totals (arrivals, polls, requests).
+    """
+    source = "poll"
+
+    def __init__(self, token, emit, **kwargs):
+        super().__init__(token, emit, **kwargs)
+        self.high_water = None
+        self.seen = set()
+        self.filters = None
+        # Team admins checked client-side when the team is too big for one OR group
+        self.scope_admin_ids = None
+        self.polls = 0
+        self.arrivals = 0
+
+    def start_watch(self, admin_id, team_id=None, team_admins_map=None, ratings=None, since=None):
+        """Set up the poll query; returns False if there's nothing to watch
+
+        since is the unix time to watch from, normally when the fetch being
+        extended started; the results already collected are adopted as is.
+        """
+        self.ratings = normalize_ratings(ratings)
+        self.high_water = int(since or time.time())
+        self.seen = {item["id"] for item in self.results}
+        self.adopt(list(self.results))
+        scope = [{"field": "conversation_rating.score", "operator": "IN", "value": self.ratings or ALL_RATINGS}]
+        team_admin_ids = (team_admins_map or {}).get(team_id, []) if team_id else []
+        if team_id and not team_admin_ids:
+            self.emit("⚠️ 🦊 Hmm, no admins in this team? That's sus, fren. Nothing to watch!")
+            return False
+        admin_ids = watched_admin_ids(admin_id, team_id, team_admin_ids)
+        if len(admin_ids) == 1:
+            scope.append({"field": "admin_assignee_id", "operator": "=", "value": admin_ids[0]})
+        elif len(admin_ids) > known_clause_limit():
+            # One workspace-wide query beats a request per admin batch; polls only see a few minutes of updates
+            self.scope_admin_ids = {assignee_id(aid) for aid in admin_ids}
+        elif admin_ids:
+            scope.append(admin_or_group(admin_ids))
+        self.filters = scope
+        since_str = datetime.fromtimestamp(self.high_water).strftime("%Y-%m-%d %H:%M:%S")
+        self.emit(f"👀 🦊 Watching for remarks updated after {since_str}...")
+        return True
+
+    def _in_scope(self, convo):
+        return self.scope_admin_ids is None or assignee_id(convo.get("admin_assignee_id")) in self.scope_admin_ids
+
+    def poll(self):
+        """Fetch everything updated since the high-water mark; returns the new records"""
+        updated_after = {"field": "updated_at", "operator": ">", "value": str(self.high_water - WATCH_OVERLAP_SECONDS)}
+        payload = {"query": {"operator": "AND", "value": [updated_after] + self.filters},
+                   "pagination": {"per_page": self.per_page}}
+        requests_before = self.stats.requests
+        newest = self.high_water
+        new_items = []
+        new_ids = set()
+        while True:
+            self._check_cancelled()
+            response = self._post_search(payload)
+            self.page_calls += 1
+            response.raise_for_status()
+            with self.timings.time("json_decode"):
+                data = response.json()
+            for convo in data.get("conversations", []):
+                newest = max(newest, int(convo.get("updated_at") or 0))
+                if convo.get("id") in self.seen or convo.get("id") in new_ids or not self._in_scope(convo):
+                    continue
+                report_item = self._build_report_item(convo)
+                if report_item is not None:
+                    new_ids.add(report_item["id"])
+                    new_items.append(report_item)
+            if not self._next_page(data, payload):
+                break
+        # Only a complete poll moves the mark; a failed one is retried from the same place
+        self.seen |= new_ids
+        self.high_water = newest
+        self.polls += 1
+        self.arrivals += len(new_items)
+        self._on_arrivals(new_items, self.stats.requests - requests_before)
+        return new_items
+
+    def _on_arrivals(self, new_items, poll_requests):
+        polled_at = datetime.now().strftime("%H:%M:%S")
+        if new_items:
+            self.results.extend(new_items)
+            with self.timings.time("live_aggregates"):
+                self.live.add(new_items)
+            self._emit_live(force=True)
+            with self.timings.time("rollups"):
+                self.rollups = compute_rollups(self.results)
+            self.emit(("ROLLUPS", self.rollups))
+            self.emit(f"🆕 🦊 {len(new_items)} new remark{'s' if len(new_items) != 1 else ''} at {polled_at} "
+                      f"({poll_requests} request{'s' if poll_requests != 1 else ''})")
+            for item in new_items:
+                remark = item.get("translated_remark") or item["remark"]
+                self.emit(f"  🆕 Rating {item['rating']}: {remark[:80]}{'...' if len(remark) > 80 else ''}")
+        self.emit(("CURRENT_ACTIVITY", self._describe_activity(polled_at)))
+        self.emit(("WATCH_UPDATE", {
+            "source": self.source,
+            "new": new_items,
+            "poll_requests": poll_requests,
+            "high_water": self.high_water,
+            "polled_at": time.time(),
+            **self._totals()
+        }))
+
+    def _totals(self):
+        return {"arrivals": self.arrivals, "polls": self.polls, "requests": self.stats.requests}
+
+    def _describe_activity(self, polled_at):
+        return f"👀 Watching: {self.arrivals} new remarks in {self.polls} polls, last poll {polled_at}"
+
+    def _describe_effort(self):
+        return f"in {self.polls} poll{'s' if self.polls != 1 else ''} ({self.stats.requests} requests)"
+
+    def _wait(self, seconds):
+        if self.cancel_token is not None:
+            self.cancel_token.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def watch(self, admin_id, team_id=None, team_admins_map=None, ratings=None, since=None,
+              interval=WATCH_INTERVAL_SECONDS, max_polls=None):
+        """Poll every interval seconds until cancelled (or max_polls polls); returns the results"""
+        if not self.start_watch(admin_id, team_id, team_admins_map, ratings, since):
+            return self.results
+        try:
+            while max_polls is None or self.polls < max_polls:
+                try:
+                    self.poll()
+                except requests.exceptions.RequestException as e:
+                    # Requests are already retried; a failed poll just waits for the next one
+                    self.polls += 1
+                    self.emit(f"⚠️ 🦊 Poll failed, trying again in {interval}s: {e}")
+                if max_polls is None or self.polls < max_polls:
+                    self._wait(interval)
+        except FetchCancelled:
+            self.cancelled = True
+        self.emit(f"👀 🦊 Stopped watching: {self.arrivals} new remark{'s' if self.arrivals != 1 else ''} "
+                  f"{self._describe_effort()}.")
+        return self.results
@@ -0,0 +1,120 @@
+"""
+Replays Intercom rating webhooks against a local receiver.
+Builds ``conversation.rating.added`` notifications, either from a JSON lines
+file (notifications, or bare conversations to wrap) or from mock_intercom's
+synthetic workspace, signs them the way Intercom does and POSTs them at a
+steady rate, so webhook ingest can be tested end to end without Intercom.
+
+    FDBK_WEBHOOK_SECRET=s3cret FDBK_WEBHOOK_PORT=8120 python win8.py
+    python webhook_replay.py --secret s3cret --count 200 --rate 20
+    python webhook_replay.py --secret s3cret --file notifications.jsonl --duplicates 0.1
+
+--admins/--teams match mock_intercom.py's, so replayed conversations belong to
+the teams a mock-backed app loaded.
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+from collections import Counter
+
+import requests
+
+from webhooks import RATING_TOPICS, WEBHOOK_PATH, sign
+
+
+def build_notification(conversation, topic=RATING_TOPICS[0]):
+    """Wrap a conversation the way Intercom's webhook notifications do"""
+    now = int(time.time())
+    return {
+        "type": "notification_event",
+        "app_id": "replay",
+        "id": f"notif_{uuid.uuid4().hex}",
+        "topic": topic,
+        "data": {"type": "notification_event_data", "item": conversation},
+        "delivery_attempts": 1,
+        "first_sent_at": now,
+        "created_at": now,
+    }
+
+
+def load_notifications(path):
+    notifications = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                payload = json.loads(line)
+                notifications.append(payload if payload.get("type") == "notification_event" else build_notification(payload))
+    return notifications
+
+
+def synthetic_notifications(count, admins, teams, seed):
+    """Rated conversations from the mock workspace, stamped as rated just now"""
+    from mock_intercom import SyntheticWorkspace
+    workspace = SyntheticWorkspace(conversations=count, admins=admins, teams=teams, days=1, seed=seed)
+    rng = random.Random(seed)
+    notifications = []
+    for index in range(count):
+        conversation = workspace.conversation(index)
+        # Mock ids are positions in the workspace; replays need ids no fetch has seen
+        conversation["id"] = str(rng.randrange(10 ** 14, 10 ** 15))
+        now = int(time.time())
+        conversation["updated_at"] = now
+        conversation["conversation_rating"]["created_at"] = now
+        notifications.append(build_notification(conversation))
+    return notifications
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay signed Intercom rating webhooks against a local receiver")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{os.environ.get('FDBK_WEBHOOK_PORT', '8120')}{WEBHOOK_PATH}")
+    parser.add_argument("--secret", default=os.environ.get("FDBK_WEBHOOK_SECRET"))
+    parser.add_argument("--file", help="JSON lines of notifications or conversations (default: synthetic)")
+    parser.add_argument("--count", type=int, default=100, help="synthetic deliveries to send")
+    parser.add_argument("--admins", type=int, default=40)
+    parser.add_argument("--teams", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=int(time.time()))
+    parser.add_argument("--rate", type=float, default=10.0, help="deliveries per second, 0 for as fast as possible")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="fraction of deliveries sent twice, like Intercom retries")
+    parser.add_argument("--bad-signatures", type=float, default=0.0, help="fraction of deliveries signed with the wrong secret")
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("--secret (or FDBK_WEBHOOK_SECRET) is required")
+
+    notifications = load_notifications(args.file) if args.file else synthetic_notifications(args.count, args.admins, args.teams, args.seed)
+    rng = random.Random(args.seed)
+    outcomes = Counter()
+    latencies = []
+    started = time.monotonic()
+    with requests.Session() as session:
+        for n, notification in enumerate(notifications):
+            if args.rate:
+                # Keep a steady pace regardless of how long each delivery took
+                time.sleep(max(0.0, started + n / args.rate - time.monotonic()))
+            body = json.dumps(notification).encode("utf-8")
+            secret = args.secret if rng.random() >= args.bad_signatures else args.secret + "-wrong"
+            attempts = 2 if rng.random() < args.duplicates else 1
+            for _ in range(attempts):
+                sent = time.perf_counter()
+                try:
+                    response = session.post(args.url, data=body, timeout=10, headers={
+                        "Content-Type": "application/json", "X-Hub-Signature": sign(body, secret)})
+                    outcomes[f"{response.status_code} {response.text.strip()}"] += 1
+                except requests.exceptions.RequestException as e:
+                    outcomes[f"error {type(e).__name__}"] += 1
+                latencies.append(time.perf_counter() - sent)
+
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    print(f"📬 Sent {len(latencies)} deliveries ({len(notifications)} notifications) in {elapsed:.1f}s to {args.url}")
+    for outcome, count in outcomes.most_common():
+        print(f"  {outcome}: {count}")
+    if latencies:
+        print(f"  latency p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+              f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+Webhook ingest for conversation ratings.
+WebhookReceiver is a small local HTTP listener for Intercom's
+``conversation.rating.added`` notifications. Every delivery's X-Hub-Signature
+(an HMAC-SHA1 of the body with the app's client secret) is checked before
+anything else; accepted conversations are kept in a local SQLite store and
+wake up any WebhookWatcher, which turns them into records exactly like a
+search page would (translation, near-duplicate clusters, live aggregates,
+rollups) and appends them to the watched results. New feedback shows up
+within a second of Intercom sending it, without a single search request.
+
+Intercom retries deliveries it didn't get a 2xx for, with the same
+notification id, so deliveries are stored once per id. The store also keeps
+everything received while nobody was watching; a watch started later picks
+up the deliveries received since the fetch it extends.
+
+    FDBK_WEBHOOK_SECRET=... FDBK_WEBHOOK_PORT=8120 streamlit run app.py
+    python webhook_replay.py --url http://127.0.0.1:8120/webhooks/intercom --secret ...
+"""
+import hashlib
+import hmac
+import http.server
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+from fetch_engine import ALL_RATINGS
+from rollups import assignee_id
+from watch import FetchWatcher, watched_admin_ids
+
+WEBHOOK_PATH = "/webhooks/intercom"
+WEBHOOK_DB = os.environ.get("FDBK_WEBHOOK_DB") or os.path.join(os.path.expanduser("~"), ".fdbckfndr", "webhooks.sqlite3")
+RATING_TOPICS = ("conversation.rating.added",)
+# Intercom notifications are a few KB; anything much bigger isn't one
+MAX_BODY_BYTES = 1024 * 1024
+# A webhook watch checks for a cancel this often while waiting for deliveries
+WEBHOOK_WAIT_SECONDS = 0.25
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS deliveries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    notification_id TEXT UNIQUE,
+    conversation_id TEXT NOT NULL,
+    received_at REAL NOT NULL,
+    conversation TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deliveries_received ON deliveries (received_at);
+"""
+
+
+def sign(body, secret):
+    """X-Hub-Signature header value for a body"""
+    return "sha1=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha1).hexdigest()
+
+
+def verify_signature(body, signature, secret):
+    return bool(signature) and hmac.compare_digest(sign(body, secret), signature.strip())
+
+
+def rating_conversation(notification):
+    """The rated conversation in a rating notification, or None for any other topic"""
+    if notification.get("topic") not in RATING_TOPICS:
+        return None
+    item = (notification.get("data") or {}).get("item") or {}
+    if item.get("type") != "conversation" or not item.get("id") or not item.get("conversation_rating"):
+        return None
+    return item
+
+
+class WebhookStore:
+    """Accepted rating deliveries, in arrival order, persisted in SQLite"""
+
+    def __init__(self, path=None):
+        self.path = path or WEBHOOK_DB
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self):
+        # sqlite3 connections can't be shared across threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def add(self, notification_id, conversation, received_at=None):
+        """Store a delivery; returns its sequence number, or None if the notification was already stored"""
+        with self._connect() as db:
+            cursor = db.execute("INSERT OR IGNORE INTO deliveries (notification_id, conversation_id, received_at, conversation) "
+                                "VALUES (?, ?, ?, ?)", (notification_id, str(conversation["id"]),
+                                                        received_at or time.time(), json.dumps(conversation)))
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def latest(self):
+        return self._connect().execute("SELECT COALESCE(MAX(seq), 0) FROM deliveries").fetchone()[0]
+
+    def read(self, after_seq=0, received_after=0):
+        """[(seq, conversation), ...] stored after a sequence number and a unix time, oldest first"""
+        rows = self._connect().execute("SELECT seq, conversation FROM deliveries WHERE seq > ? AND received_at > ? ORDER BY seq",
+                                       (after_seq, received_after)).fetchall()
+        return [(seq, json.loads(conversation)) for seq, conversation in rows]
+
+
+class WebhookReceiver:
+    """Validates and stores Intercom rating webhooks; watchers wait on it for new deliveries"""
+
+    def __init__(self, store, secret, host="127.0.0.1", port=0):
+        if not secret:
+            raise ValueError("A webhook secret is required to validate deliveries")
+        self.store = store
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.server = None
+        self.sequence = store.latest()
+        self._arrived = threading.Condition()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}{WEBHOOK_PATH}"
+
+    def start(self):
+        """Listen from a daemon thread; returns self"""
+        receiver = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path.split("?")[0] != WEBHOOK_PATH:
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_BYTES:
+                    metrics.webhook_deliveries.inc(result="rejected")
+                    self.send_error(413)
+                    return
+                status, message = receiver.handle(self.rfile.read(length), self.headers.get("X-Hub-Signature"))
+                body = message.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="webhook-http", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def handle(self, body, signature):
+        """Validate and store one delivery; returns (HTTP status, message)"""
+        if not verify_signature(body, signature, self.secret):
+            metrics.webhook_deliveries.inc(result="rejected")
+            return 401, "invalid signature"
+        try:
+            notification = json.loads(body)
+        except ValueError:
+            metrics.webhook_deliveries.inc(result="rejected")
+            return 400, "body is not JSON"
+        conversation = rating_conversation(notification) if isinstance(notification, dict) else None
+        if conversation is None:
+            # Still a 2xx, so Intercom doesn't retry pings and topics we don't use
+            metrics.webhook_deliveries.inc(result="ignored")
+            return 200, "ignored"
+        seq = self.store.add(notification.get("id"), conversation)
+        if seq is None:
+            metrics.webhook_deliveries.inc(result="duplicate")
+            return 200, "duplicate"
+        metrics.webhook_deliveries.inc(result="accepted")
+        with self._arrived:
+            self.sequence = max(self.sequence, seq)
+            self._arrived.notify_all()
+        return 200, "accepted"
+
+    def wait(self, after_seq, timeout):
+        """Block until a delivery newer than after_seq is stored (or timeout); returns the latest sequence"""
+        with self._arrived:
+            self._arrived.wait_for(lambda: self.sequence > after_seq, timeout)
+            return self.sequence
+
+
+def receiver_from_env(store=None):
+    """Start the receiver configured by FDBK_WEBHOOK_PORT / FDBK_WEBHOOK_SECRET; None if not configured"""
+    port = os.environ.get("FDBK_WEBHOOK_PORT")
+    if not port:
+        return None
+    receiver = WebhookReceiver(store or WebhookStore(), os.environ.get("FDBK_WEBHOOK_SECRET"),
+                               os.environ.get("FDBK_WEBHOOK_HOST", "127.0.0.1"), int(port))
+    return receiver.start()
+
+
+class WebhookWatcher(FetchWatcher):
+    """FetchWatcher fed by a WebhookReceiver's deliveries instead of search polls"""
+    source = "webhook"
+
+    def __init__(self, token, emit, receiver, **kwargs):
+        super().__init__(token, emit, **kwargs)
+        self.receiver = receiver
+        self.last_seq = 0
+        self.deliveries = 0
+
+    def start_watch(self, admin_id, team_id=None, team_admins_map=None, ratings=None, since=None):
+        if not super().start_watch(admin_id, team_id, team_admins_map, ratings, since):
+            return False
+        # Deliveries cover the whole workspace, so the watch's filters all apply here
+        team_admin_ids = (team_admins_map or {}).get(team_id, []) if team_id else []
+        admin_ids = watched_admin_ids(admin_id, team_id, team_admin_ids)
+        self.scope_admin_ids = {assignee_id(aid) for aid in admin_ids} if admin_ids else None
+        self.emit(f"📬 🦊 Listening for rating webhooks on {self.receiver.url}")
+        return True
+
+    def _in_scope(self, convo):
+        rating = (convo.get("conversation_rating") or {}).get("rating")
+        return rating in (self.ratings or ALL_RATINGS) and super()._in_scope(convo)
+
+    def poll(self):
+        """Turn the deliveries stored since the last check into records; no search requests"""
+        # The first check also collects what arrived between the fetch and the watch
+        rows = self.receiver.store.read(self.last_seq, self.high_water if self.polls == 0 else 0)
+        new_items = []
+        new_ids = set()
+        for seq, convo in rows:
+            self.last_seq = seq
+            self.high_water = max(self.high_water, int(convo.get("updated_at") or 0))
+            if convo["id"] in self.seen or convo["id"] in new_ids or not self._in_scope(convo):
+                continue
+            report_item = self._build_report_item(convo)
+            if report_item is not None:
+                new_ids.add(report_item["id"])
+                new_items.append(report_item)
+        self.seen |= new_ids
+        self.deliveries += len(rows)
+        first = self.polls == 0
+        self.polls += 1
+        self.arrivals += len(new_items)
+        if rows or first:
+            self._on_arrivals(new_items, 0)
+        return new_items
+
+    def _totals(self):
+        return dict(super()._totals(), deliveries=self.deliveries)
+
+    def _describe_activity(self, polled_at):
+        return f"📬 Listening: {self.arrivals} new remarks from {self.deliveries} webhooks, last at {polled_at}"
+
+    def _describe_effort(self):
+        return f"from {self.deliveries} webhook{'s' if self.deliveries != 1 else ''} (no search requests)"
+
+    def _wait(self, seconds):
+        """Wait until the next delivery (or seconds), waking often enough to notice a cancel"""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self._check_cancelled()
+            if self.receiver.wait(self.last_seq, min(WEBHOOK_WAIT_SECONDS, deadline - time.monotonic())) > self.last_seq:
+                return
+        self._check_cancelled()
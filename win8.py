@@ -1,15 +1,38 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, filedialog, ttk
+import asyncio
 import requests
-import json
 import threading
 import queue
+import os
 import time
 import csv
 from datetime import datetime, timedelta
 from calendar import monthrange
-from deep_translator import GoogleTranslator
-import openai
+
+from ai_analysis import AnalysisCache, AnalysisPipeline, backend_from_env, weighted_lines
+from async_engine import AsyncFetchEngine, EventLoopThread
+from cancellation import CancelToken
+from checkpoints import CheckpointStore, make_run_query
+from dedupe import weighted_remarks
+import insights
+import rollups
+from fetch_engine import ALL_RATINGS, FetchEngine, describe_preview, describe_ratings, format_duration, normalize_ratings
+from intercom_http import INTERCOM_API_BASE, send_with_retry
+from live import format_live
+from scheduler import RequestScheduler, user_key_for_token
+from sampling import SampleEstimator, describe_estimate
+from search import RemarkIndex
+from timings import STAGE_LABELS, StageTimings, ordered_stages
+from trends import TrendStore, format_trend, trend_scope
+from watch import FetchWatcher
+from webhooks import WebhookWatcher, receiver_from_env
+
+# The UI drains the log queue in batches, up to this many messages or this long per tick
+QUEUE_BATCH_MAX = 500
+QUEUE_BATCH_SECONDS = 0.05
+# Matches listed in the Search tab; the count always covers all of them
+SEARCH_RESULTS_SHOWN = 500
 
 class DatePicker:
     """Modern airline-style date picker widget"""
@@ -242,21 +265,40 @@ class ModernIntercomApp:
         # Internal State
         self.log_queue = queue.Queue()
         self.final_report_data = []
+        self.search_index = RemarkIndex()
+        self.rollups = None
         self.admin_map = {}
         self.team_map = {}
         self.team_admins_map = {}  # Maps team_id to list of admin_ids
         self.total_conversations = 0
-        self.total_pages = 0
         self.total_found = 0
-        self.time_per_page = 0
         self.start_time = 0
         self.ai_insights = {}
+        self.ai_cache = AnalysisCache()
         self.translations_cache = {}
-        self.translator = GoogleTranslator(source='auto', target='en')
-        self.openai_api_key = ""  # Set your OpenAI API key here or load from config
+        self.checkpoint_store = CheckpointStore()
+        self.trend_store = TrendStore()
+        self.cancel_token = None
+        # Fetches run as coroutines on one background event loop
+        self.fetch_loop = EventLoopThread()
+        self.request_scheduler = RequestScheduler.from_env()
+        self.fetch_future = None
+        # Query and start time of the last clean fetch, which watch mode keeps current
+        self.last_fetch = None
+        # State of the last sampling estimate, which Refine Estimate continues from
+        self.sample_state = None
+        # Optional rating webhook listener (FDBK_WEBHOOK_PORT); watches use it instead of polling
+        try:
+            self.webhook_receiver = receiver_from_env()
+        except (ValueError, OSError) as e:
+            self.webhook_receiver = None
+            self.log_queue.put(f"⚠️ Webhook receiver not started: {e}")
+        self.ui_timings = StageTimings()
+        self.openai_api_key = ""  # Set your OpenAI API key here, or use OPENAI_API_KEY
         
         self.setup_button_styles()
         self.create_ui()
+        self.refresh_resume_button()
         self.root.after(100, self.process_queue)
         self.root.after(100, self.animate_loading)
     
@@ -320,6 +362,11 @@ class ModernIntercomApp:
         log_tab = tk.Frame(self.notebook, bg=self.colors['bg'])
         self.notebook.add(log_tab, text='  Results Log  ')
         self.create_log_tab(log_tab)
+        
+        # Tab 4: Search
+        search_tab = tk.Frame(self.notebook, bg=self.colors['bg'])
+        self.notebook.add(search_tab, text='  Search Remarks  ')
+        self.create_search_tab(search_tab)
     
     def create_header(self, parent):
         header_frame = tk.Frame(parent, bg=self.colors['bg'])
@@ -458,6 +505,27 @@ class ModernIntercomApp:
         self.end_date_picker = DatePicker(date_frame, initial_date=today)
         self.end_date_picker.pack(side='left')
         
+        # Ratings are pushed into the search query; the limit stops paging early
+        tk.Label(filters_card, text="Ratings & Limit:", font=("Segoe UI", 10, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(anchor='w', pady=(5, 0))
+        options_frame = tk.Frame(filters_card, bg=self.colors['card'])
+        options_frame.pack(fill='x', pady=5)
+        self.rating_vars = {}
+        for rating in ALL_RATINGS:
+            self.rating_vars[rating] = tk.BooleanVar(self.root, value=True)
+            tk.Checkbutton(options_frame, text=f"{rating}★", variable=self.rating_vars[rating], 
+                           font=("Segoe UI", 10, "bold"), bg=self.colors['card'], fg='#000000', 
+                           activebackground=self.colors['card']).pack(side='left')
+        tk.Label(options_frame, text="Max remarks (blank = all):", font=("Segoe UI", 10, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(side='left', padx=(15, 5))
+        self.max_results_entry = tk.Entry(options_frame, font=("Segoe UI", 10), width=8, 
+                                          relief='solid', 
+                                          borderwidth=1,
+                                          bg='white',
+                                          fg='#000000',
+                                          insertbackground='#000000')
+        self.max_results_entry.pack(side='left')
+        
         # Actions Card
         actions_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
         actions_card.pack(fill='x', pady=(10, 10))
@@ -477,6 +545,62 @@ class ModernIntercomApp:
                                        cursor='hand2',
                                        command=self.start_api_thread)
         self.action_button.pack(fill='x', pady=5)
+        self.preview_button = tk.Button(actions_card, text="Preview Cost", 
+                                        font=("Segoe UI", 11, "bold"), 
+                                        bg=self.colors['border'], 
+                                        fg='white',
+                                        activebackground='#6d6499',
+                                        activeforeground='white',
+                                        disabledforeground='#666666',
+                                        relief='flat',
+                                        borderwidth=0,
+                                        padx=10,
+                                        pady=8,
+                                        cursor='hand2',
+                                        command=self.start_preview_thread)
+        self.preview_button.pack(fill='x', pady=5)
+        self.resume_button = tk.Button(actions_card, text="Resume Interrupted Run", 
+                                       font=("Segoe UI", 11, "bold"), 
+                                       bg=self.colors['warning'], 
+                                       fg='white',
+                                       activebackground='#f59e0b',
+                                       activeforeground='white',
+                                       disabledforeground='#666666',
+                                       relief='flat',
+                                       borderwidth=0,
+                                       padx=10,
+                                       pady=8,
+                                       cursor='hand2',
+                                       command=self.start_resume_thread, state="disabled")
+        self.resume_button.pack(fill='x', pady=5)
+        self.watch_button = tk.Button(actions_card, text="Watch for New Remarks", 
+                                      font=("Segoe UI", 11, "bold"), 
+                                      bg=self.colors['success'], 
+                                      fg='white',
+                                      activebackground='#00a865',
+                                      activeforeground='white',
+                                      disabledforeground='#666666',
+                                      relief='flat',
+                                      borderwidth=0,
+                                      padx=10,
+                                      pady=8,
+                                      cursor='hand2',
+                                      command=self.start_watch, state="disabled")
+        self.watch_button.pack(fill='x', pady=5)
+        self.cancel_button = tk.Button(actions_card, text="Cancel Fetch", 
+                                       font=("Segoe UI", 11, "bold"), 
+                                       bg=self.colors['danger'], 
+                                       fg='white',
+                                       activebackground='#f87171',
+                                       activeforeground='white',
+                                       disabledforeground='#666666',
+                                       relief='flat',
+                                       borderwidth=0,
+                                       padx=10,
+                                       pady=8,
+                                       cursor='hand2',
+                                       command=self.cancel_fetch, state="disabled")
+        self.cancel_button.pack(fill='x', pady=5)
         self.progressbar = ttk.Progressbar(actions_card, orient='horizontal', 
                                            mode='determinate', length=100, 
                                            style="Modern.Horizontal.TProgressbar")
@@ -556,6 +680,16 @@ class ModernIntercomApp:
         self.etr_label.pack(fill='x', pady=2)
     
     def create_insights_tab(self, parent):
+        # Live Card (aggregates streamed from the running fetch)
+        live_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
+        live_card.pack(fill='x', pady=(0, 10))
+        tk.Label(live_card, text="Live Insights", font=("Segoe UI", 14, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(anchor='w')
+        self.live_label = tk.Label(live_card, text="Rating mix, CSAT and top terms appear here while a fetch runs.", 
+                                   font=("Courier New", 10, "bold"), bg=self.colors['card'], 
+                                   fg='#000000', anchor='w', justify='left')
+        self.live_label.pack(fill='x', pady=5)
+        
         # AI Insights Card
         ai_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
         ai_card.pack(fill='both', expand=True, pady=(0, 10))
@@ -591,15 +725,142 @@ class ModernIntercomApp:
         self.ai_result_text.pack(fill='both', expand=True, pady=10)
         self.ai_result_text.configure(state='disabled')
         
+        # Offline Themes Card (computed locally after every fetch)
+        themes_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
+        themes_card.pack(fill='both', expand=True, pady=(10, 0))
+        tk.Label(themes_card, text="Themes (offline)", font=("Segoe UI", 14, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(anchor='w')
+        self.themes_text = scrolledtext.ScrolledText(themes_card, font=("Segoe UI", 11), 
+                                                     relief='solid', 
+                                                     borderwidth=1,
+                                                     bg='white',
+                                                     fg='#000000',
+                                                     insertbackground='#000000',
+                                                     selectbackground='#005482',
+                                                     selectforeground='white',
+                                                     height=10, 
+                                                     wrap=tk.WORD)
+        self.themes_text.pack(fill='both', expand=True, pady=10)
+        self.themes_text.configure(state='disabled')
+        
+        # Scorecards Card (rollups the engine computes once per fetch)
+        scorecards_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
+        scorecards_card.pack(fill='both', expand=True, pady=(10, 0))
+        tk.Label(scorecards_card, text="Scorecards", font=("Segoe UI", 14, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(anchor='w')
+        self.scorecards_text = scrolledtext.ScrolledText(scorecards_card, font=("Courier New", 11), 
+                                                         relief='solid', 
+                                                         borderwidth=1,
+                                                         bg='white',
+                                                         fg='#000000',
+                                                         insertbackground='#000000',
+                                                         selectbackground='#005482',
+                                                         selectforeground='white',
+                                                         height=10, 
+                                                         wrap=tk.WORD)
+        self.scorecards_text.pack(fill='both', expand=True, pady=10)
+        self.scorecards_text.configure(state='disabled')
+        
         # Sentiment Summary Card
         sentiment_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
         sentiment_card.pack(fill='x', pady=(10, 0))
         tk.Label(sentiment_card, text="Sentiment Summary", font=("Segoe UI", 14, "bold"), 
                  bg=self.colors['card'], fg='#000000').pack(anchor='w')
-        self.sentiment_label = tk.Label(sentiment_card, text="No analysis yet. Run AI analysis after fetching data.", 
+        self.sentiment_label = tk.Label(sentiment_card, text="No analysis yet. Themes and sentiment appear after a fetch.", 
                                         font=("Segoe UI", 11, "bold"), bg=self.colors['card'], 
-                                        fg='#000000', anchor='w')
+                                        fg='#000000', anchor='w', justify='left')
         self.sentiment_label.pack(fill='x', pady=5)
+        
+        # CSAT Trend Card (served from the trend store, missing days backfilled)
+        trend_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
+        trend_card.pack(fill='both', expand=True, pady=(10, 0))
+        tk.Label(trend_card, text="CSAT Trend", font=("Segoe UI", 14, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(anchor='w')
+        trend_controls = tk.Frame(trend_card, bg=self.colors['card'])
+        trend_controls.pack(fill='x', pady=5)
+        self.trend_range_var = tk.StringVar(self.root, value="Last 180 days")
+        ttk.Combobox(trend_controls, textvariable=self.trend_range_var, font=("Segoe UI", 10), state='readonly', width=16,
+                     values=["Last 30 days", "Last 90 days", "Last 180 days", "Last 365 days"]).pack(side='left')
+        self.trend_freq_var = tk.StringVar(self.root, value="Week")
+        ttk.Combobox(trend_controls, textvariable=self.trend_freq_var, font=("Segoe UI", 10), state='readonly', width=8,
+                     values=["Week", "Day"]).pack(side='left', padx=10)
+        self.trend_button = tk.Button(trend_controls, text="Show Trend", 
+                                      font=("Segoe UI", 11, "bold"), 
+                                      bg=self.colors['primary'], 
+                                      fg='white',
+                                      activebackground='#006ba3',
+                                      activeforeground='white',
+                                      disabledforeground='#666666',
+                                      relief='flat',
+                                      borderwidth=0,
+                                      padx=10,
+                                      pady=4,
+                                      cursor='hand2',
+                                      command=self.start_trend)
+        self.trend_button.pack(side='left', fill='x', expand=True)
+        self.trend_text = scrolledtext.ScrolledText(trend_card, font=("Courier New", 10), 
+                                                    relief='solid', 
+                                                    borderwidth=1,
+                                                    bg='white',
+                                                    fg='#000000',
+                                                    insertbackground='#000000',
+                                                    selectbackground='#005482',
+                                                    selectforeground='white',
+                                                    height=10, 
+                                                    wrap=tk.NONE)
+        self.trend_text.pack(fill='both', expand=True, pady=10)
+        self.trend_text.configure(state='disabled')
+        
+        # Quick Estimate Card (random time slices from every month of the Run Report dates)
+        sample_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
+        sample_card.pack(fill='both', expand=True, pady=(10, 0))
+        tk.Label(sample_card, text="Quick Estimate", font=("Segoe UI", 14, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(anchor='w')
+        tk.Label(sample_card, text="CSAT, remark rate and rating mix for the Run Report dates from a few pages per month.", 
+                 font=("Segoe UI", 10, "bold"), bg=self.colors['card'], 
+                 fg='#000000').pack(anchor='w', pady=(0, 10))
+        sample_controls = tk.Frame(sample_card, bg=self.colors['card'])
+        sample_controls.pack(fill='x', pady=5)
+        self.sample_button = tk.Button(sample_controls, text="Estimate by Sampling", 
+                                       font=("Segoe UI", 11, "bold"), 
+                                       bg=self.colors['primary'], 
+                                       fg='white',
+                                       activebackground='#006ba3',
+                                       activeforeground='white',
+                                       disabledforeground='#666666',
+                                       relief='flat',
+                                       borderwidth=0,
+                                       padx=10,
+                                       pady=4,
+                                       cursor='hand2',
+                                       command=self.start_sample)
+        self.sample_button.pack(side='left', fill='x', expand=True)
+        self.refine_button = tk.Button(sample_controls, text="Refine Estimate", 
+                                       font=("Segoe UI", 11, "bold"), 
+                                       bg=self.colors['border'], 
+                                       fg='white',
+                                       activebackground='#6d6499',
+                                       activeforeground='white',
+                                       disabledforeground='#666666',
+                                       relief='flat',
+                                       borderwidth=0,
+                                       padx=10,
+                                       pady=4,
+                                       cursor='hand2',
+                                       command=self.start_refine, state="disabled")
+        self.refine_button.pack(side='left', fill='x', expand=True, padx=(10, 0))
+        self.sample_text = scrolledtext.ScrolledText(sample_card, font=("Courier New", 10), 
+                                                     relief='solid', 
+                                                     borderwidth=1,
+                                                     bg='white',
+                                                     fg='#000000',
+                                                     insertbackground='#000000',
+                                                     selectbackground='#005482',
+                                                     selectforeground='white',
+                                                     height=7, 
+                                                     wrap=tk.WORD)
+        self.sample_text.pack(fill='both', expand=True, pady=10)
+        self.sample_text.configure(state='disabled')
     
     def create_log_tab(self, parent):
         log_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
@@ -618,6 +879,87 @@ class ModernIntercomApp:
                                                     wrap=tk.WORD)
         self.log_widget.pack(fill='both', expand=True, pady=5)
         self.log_widget.configure(state='disabled')
+        
+        tk.Label(log_card, text="Stage Timings (last run)", font=("Segoe UI", 12, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(anchor='w', pady=(10, 0))
+        self.timings_tree = ttk.Treeview(log_card, columns=("count", "p50", "p95", "max", "total"), height=8)
+        self.timings_tree.heading("#0", text="Stage")
+        self.timings_tree.column("#0", width=200)
+        for column, heading in (("count", "Count"), ("p50", "p50 ms"), ("p95", "p95 ms"), ("max", "Max ms"), ("total", "Total s")):
+            self.timings_tree.heading(column, text=heading)
+            self.timings_tree.column(column, width=80, anchor='e')
+        self.timings_tree.pack(fill='x', pady=5)
+    
+    def create_search_tab(self, parent):
+        search_card = tk.Frame(parent, bg=self.colors['card'], bd=1, relief='solid', padx=15, pady=15)
+        search_card.pack(fill='both', expand=True)
+        tk.Label(search_card, text="Search Remarks", font=("Segoe UI", 14, "bold"), 
+                 bg=self.colors['card'], fg='#000000').pack(anchor='w')
+        tk.Label(search_card, text='Original and translated text. Try: refund · refun* · "money back" · refund OR bridge', 
+                 font=("Segoe UI", 10, "bold"), bg=self.colors['card'], 
+                 fg='#000000').pack(anchor='w', pady=(0, 10))
+        self.search_var = tk.StringVar(self.root)
+        search_entry = tk.Entry(search_card, textvariable=self.search_var, font=("Segoe UI", 11), 
+                                relief='solid', 
+                                borderwidth=1,
+                                bg='white',
+                                fg='#000000',
+                                insertbackground='#000000',
+                                selectbackground='#005482',
+                                selectforeground='white')
+        search_entry.pack(fill='x', pady=5)
+        search_entry.bind('<KeyRelease>', lambda event: self.run_search())
+        self.search_status_label = tk.Label(search_card, text="Results appear here as you type.", 
+                                            font=("Segoe UI", 10, "bold"), bg=self.colors['card'], 
+                                            fg='#000000', anchor='w')
+        self.search_status_label.pack(fill='x')
+        self.search_results_text = scrolledtext.ScrolledText(search_card, font=("Segoe UI", 11), 
+                                                             relief='solid', 
+                                                             borderwidth=1,
+                                                             bg='white',
+                                                             fg='#000000',
+                                                             insertbackground='#000000',
+                                                             selectbackground='#005482',
+                                                             selectforeground='white',
+                                                             height=25, 
+                                                             wrap=tk.WORD)
+        self.search_results_text.pack(fill='both', expand=True, pady=10)
+        self.search_results_text.configure(state='disabled')
+    
+    def run_search(self):
+        """Search the fetched remarks; the index is kept current as pages arrive"""
+        query = self.search_var.get()
+        self.search_results_text.configure(state='normal')
+        self.search_results_text.delete('1.0', 'end')
+        if query.strip():
+            self.search_index.sync(self.final_report_data)
+            started = time.perf_counter()
+            ids = self.search_index.search(query)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            shown = ids[:SEARCH_RESULTS_SHOWN]
+            self.search_status_label.config(
+                text=f"{len(ids)} matching remark{'s' if len(ids) != 1 else ''} in {elapsed_ms:.1f} ms"
+                     + (f" (showing the first {len(shown)})" if len(ids) > len(shown) else ""))
+            for doc_id in shown:
+                item = self.final_report_data[doc_id]
+                date = datetime.fromtimestamp(item['date']).strftime('%Y-%m-%d') if item['date'] else 'N/A'
+                line = f"[{item['rating']}★ {date}] {item['remark']}"
+                if item.get('translated_remark'):
+                    line += f"\n    → {item['translated_remark']}"
+                self.search_results_text.insert('end', line + "\n\n")
+        else:
+            self.search_status_label.config(text="Results appear here as you type.")
+        self.search_results_text.configure(state='disabled')
+    
+    def show_stage_timings(self, stages):
+        """Fill the timings table from the engine's stages plus the UI's own"""
+        stages = dict(stages)
+        stages.update(self.ui_timings.summary())
+        self.timings_tree.delete(*self.timings_tree.get_children())
+        for stage, stats in ordered_stages(stages):
+            self.timings_tree.insert('', 'end', text=STAGE_LABELS.get(stage, stage),
+                                     values=(stats['count'], f"{stats['p50'] * 1000:.1f}", f"{stats['p95'] * 1000:.1f}",
+                                             f"{stats['max'] * 1000:.1f}", f"{stats['total']:.2f}"))
     
     def log_message(self, message):
         self.log_widget.configure(state='normal')
@@ -644,8 +986,8 @@ class ModernIntercomApp:
         
         # Fetch teams
         try:
-            teams_url = "https://api.intercom.io/teams"
-            teams_response = requests.get(teams_url, headers=headers)
+            teams_url = f"{INTERCOM_API_BASE}/teams"
+            teams_response = send_with_retry("GET", teams_url, headers=headers)
             teams_response.raise_for_status()
             teams_data = teams_response.json()
             for team in teams_data.get('teams', []):
@@ -659,11 +1001,11 @@ class ModernIntercomApp:
             self.log_queue.put(f"Note: Could not fetch teams: {e}")
         
         # Fetch admins and map them to teams
-        url = "https://api.intercom.io/admins"
+        url = f"{INTERCOM_API_BASE}/admins"
         params = {"page": 1}
         try:
             while True:
-                response = requests.get(url, headers=headers, params=params)
+                response = send_with_retry("GET", url, headers=headers, params=params)
                 response.raise_for_status()
                 data = response.json()
                 for admin in data.get('admins', []):
@@ -744,7 +1086,72 @@ class ModernIntercomApp:
                 self.admin_var.set("Select an admin...")
             self.admin_dropdown.config(state="normal")
     
-    def start_api_thread(self):
+    def fetch_in_progress(self):
+        """Single-run guard: only one fetch may write into final_report_data at a time"""
+        return self.fetch_future is not None and not self.fetch_future.done()
+    
+    def start_fetch(self, args, options=None):
+        self.cancel_token = CancelToken()
+        self.cancel_button.config(text="Cancel Fetch", state='normal')
+        self.fetch_future = self.fetch_loop.submit(self.run_api_script(*args, **(options or {})))
+        self.fetch_future.add_done_callback(self.on_fetch_finished)
+    
+    def on_fetch_finished(self, future):
+        """Runs on the loop thread; report a crashed fetch so the UI doesn't stay stuck"""
+        if not future.cancelled() and future.exception() is not None:
+            self.log_queue.put(f"❌ 🦊 Fetch crashed: {future.exception()}")
+            self.log_queue.put(("RUN_INTERRUPTED", len(self.final_report_data)))
+            self.log_queue.put(("DONE", len(self.final_report_data)))
+    
+    def cancel_fetch(self):
+        if self.cancel_token is not None and self.fetch_in_progress():
+            self.cancel_token.cancel()
+            self.cancel_button.config(text="Cancelling...", state='disabled')
+            self.status_label.config(text="Cancelling fetch...")
+            self.log_message("🛑 Cancelling fetch...")
+    
+    def start_watch(self):
+        if self.fetch_in_progress():
+            messagebox.showinfo("Fetch Running", "A fetch is already running. Cancel it or wait for it to finish.")
+            return
+        token = self.token_entry.get()
+        if not token:
+            messagebox.showerror("Error", "Please enter an Intercom Token.")
+            return
+        if self.last_fetch is None:
+            messagebox.showinfo("Nothing to Watch", "Fetch a report first; watch mode keeps its results current.")
+            return
+        self.cancel_token = CancelToken()
+        self.cancel_button.config(text="Stop Watching", state='normal')
+        self.action_button.config(state='disabled')
+        self.watch_button.config(text="Watching...", state='disabled')
+        self.status_label.config(text="Watching for new remarks...")
+        self.fetch_future = self.fetch_loop.submit(self.run_watch(token, self.last_fetch))
+        self.fetch_future.add_done_callback(self.on_fetch_finished)
+    
+    async def run_watch(self, intercom_token, last_fetch):
+        query = last_fetch["query"]
+        team_id = query["team_id"]
+        options = dict(translations_cache=self.translations_cache,
+                       results=self.final_report_data,
+                       per_page=150,
+                       scheduler=self.request_scheduler,
+                       user_key=query["user_key"],
+                       cancel_token=self.cancel_token)
+        if self.webhook_receiver is not None:
+            watcher = WebhookWatcher(intercom_token, self.log_queue.put, self.webhook_receiver, **options)
+        else:
+            watcher = FetchWatcher(intercom_token, self.log_queue.put, **options)
+        # Polls are blocking requests with long sleeps in between; keep them off the event loop
+        await asyncio.to_thread(watcher.watch, query["admin_id"], team_id,
+                                {team_id: query["team_admin_ids"]} if team_id else {},
+                                query.get("ratings"), last_fetch["since"])
+        # Watching again picks up where this watch stopped
+        last_fetch["since"] = watcher.high_water
+        self.log_queue.put(("DONE", len(self.final_report_data)))
+    
+    def read_fetch_form(self, require_scope=True):
+        """Validate the Run Report inputs; returns (token, admin_id, start, end, team_id) or None"""
         token = self.token_entry.get()
         start_date_str = self.start_date_picker.get_date()
         end_date_str = self.end_date_picker.get_date()
@@ -762,24 +1169,77 @@ class ModernIntercomApp:
             if admin_name in self.admin_map:
                 admin_id = self.admin_map[admin_name]
         
-        if not team_id and not admin_id:
+        if require_scope and not team_id and not admin_id:
             messagebox.showerror("Error", "Please select either a team or an admin (or both) from the dropdowns.")
-            return
+            return None
         
         if not token:
             messagebox.showerror("Error", "Please enter an Intercom Token.")
-            return
+            return None
         try:
             datetime.strptime(start_date_str, "%Y-%m-%d")
             datetime.strptime(end_date_str, "%Y-%m-%d")
         except ValueError:
             messagebox.showerror("Invalid Date", "Please enter dates in YYYY-MM-DD format.")
+            return None
+        return token, admin_id, start_date_str, end_date_str, team_id
+    
+    def read_search_options(self):
+        """Rating subset and max-results limit; returns a dict of run options or None if invalid"""
+        ratings = [rating for rating, var in self.rating_vars.items() if var.get()]
+        if not ratings:
+            messagebox.showerror("Error", "Please select at least one rating.")
+            return None
+        max_results = self.max_results_entry.get().strip()
+        if max_results and (not max_results.isdigit() or int(max_results) == 0):
+            messagebox.showerror("Error", "Max remarks must be a positive whole number (or blank for no limit).")
+            return None
+        return {"ratings": normalize_ratings(ratings), "max_results": int(max_results) if max_results else None}
+    
+    def start_api_thread(self):
+        if self.fetch_in_progress():
+            messagebox.showinfo("Fetch Running", "A fetch is already running. Cancel it or wait for it to finish.")
+            return
+        form = self.read_fetch_form()
+        if form is None:
             return
+        options = self.read_search_options()
+        if options is None:
+            return
+        self.reset_run_state("Starting... Fetching first page...")
+        self.start_fetch(form, options)
+    
+    def start_preview_thread(self):
+        form = self.read_fetch_form()
+        if form is None:
+            return
+        options = self.read_search_options()
+        if options is None:
+            return
+        form = form + (options["ratings"],)
+        self.preview_button.config(text="Previewing...", state='disabled')
+        self.status_label.config(text="Estimating fetch cost...")
+        threading.Thread(target=self.run_preview, args=form, daemon=True).start()
+    
+    def run_preview(self, intercom_token, admin_id, start_date_str, end_date_str, team_id=None, ratings=None):
+        """Dry run: probe the query's size without fetching or translating anything"""
+        engine = FetchEngine(intercom_token, self.log_queue.put,
+                             translations_cache=self.translations_cache,
+                             per_page=42,
+                             scheduler=self.request_scheduler,
+                             user_key=user_key_for_token(intercom_token))
+        estimate = engine.preview(admin_id, start_date_str, end_date_str, team_id, self.team_admins_map, ratings)
+        self.log_queue.put(("PREVIEW_DONE", estimate))
+    
+    def reset_run_state(self, status_text):
+        """Clear stats and disable actions before a fetch starts"""
         self.log_widget.configure(state='normal')
         self.log_widget.delete('1.0', 'end')
         self.log_widget.configure(state='disabled')
-        self.status_label.config(text="Starting... Fetching first page...")
+        self.status_label.config(text=status_text)
         self.action_button.config(text="Running...", state='disabled')
+        self.resume_button.config(state='disabled')
+        self.watch_button.config(state='disabled')
         self.save_csv_button.config(state='disabled')
         self.copy_ai_button.config(state='disabled')
         self.analyze_button.config(state='disabled')
@@ -788,332 +1248,89 @@ class ModernIntercomApp:
         self.page_label.config(text="Page: 0 / 0")
         self.found_label.config(text="Remarks found: 0")
         self.etr_label.config(text="ETR: Calculating...")
-        self.current_activity_label.config(text="Status: Starting... Fetching first page...")
+        self.current_activity_label.config(text=f"Status: {status_text}")
         self.current_page_info_label.config(text="Current page: Not started")
         self.final_report_data.clear()
+        self.search_index.clear()
+        self.last_fetch = None
+        self.ui_timings = StageTimings()
         self.total_found = 0
         self.start_time = time.monotonic()
         self.start_loading()
-        threading.Thread(target=self.run_api_script, args=(token, admin_id, start_date_str, end_date_str, team_id), daemon=True).start()
     
-    def run_api_script(self, intercom_token, admin_id, start_date_str, end_date_str, team_id=None):
-        try:
-            start_ts = str(int(datetime.strptime(start_date_str, "%Y-%m-%d").timestamp()))
-            end_date_dt = datetime.strptime(end_date_str, "%Y-%m-%d") + timedelta(days=1)
-            end_ts = str(int(end_date_dt.timestamp()))
-        except Exception as e:
-            self.log_queue.put(f"!!! Date conversion error: {e}")
-            self.log_queue.put(("DONE", 0))
-            return
-        intercom_url = "https://api.intercom.io/conversations/search"
-        intercom_headers = {"Authorization": f"Bearer {intercom_token}", "Accept": "application/json", "Content-Type": "application/json"}
-        
-        # Build base filters (date and rating)
-        base_filters = [
-            {"field": "created_at", "operator": ">", "value": start_ts},
-            {"field": "created_at", "operator": "<", "value": end_ts},
-            {"field": "conversation_rating.score", "operator": "IN", "value": [1, 2, 3, 4, 5]}
-        ]
-        
-        # Handle team selection: get all admins in the team
-        if team_id:
-            team_admin_ids = self.team_admins_map.get(team_id, [])
-            if not team_admin_ids:
-                self.log_queue.put(f"!!! WARNING: No admins found for team {team_id}. Cannot search.")
-                self.log_queue.put(("DONE", 0))
-                return
-            
-            # If specific admin is also selected, filter to that admin (must be in team)
-            if admin_id and admin_id in team_admin_ids:
-                # Single admin selected within team
-                admin_filter = {"field": "admin_assignee_id", "operator": "=", "value": admin_id}
-                query_filters = base_filters + [admin_filter]
-                query_operator = "AND"
-            else:
-                if admin_id:
-                    self.log_queue.put(f"!!! WARNING: Selected admin is not in the selected team. Searching all team admins instead.")
-                
-                # Multiple admins - Intercom API has limits on OR query size
-                # If too many admins, we'll need to make multiple queries
-                num_admins = len(team_admin_ids)
-                self.log_queue.put(f"Team has {num_admins} admins. Building query...")
-                
-                # Intercom API typically supports up to ~20 OR conditions
-                # If more than that, we'll split into multiple queries
-                MAX_OR_CONDITIONS = 15
-                
-                if num_admins <= MAX_OR_CONDITIONS:
-                    # Small enough for single query
-                    admin_or_conditions = []
-                    for aid in team_admin_ids:
-                        admin_or_conditions.append({"field": "admin_assignee_id", "operator": "=", "value": aid})
-                    
-                    # Combine: (base_filters AND) AND (admin1 OR admin2 OR ...)
-                    query_filters = [
-                        {"operator": "AND", "value": base_filters},
-                        {"operator": "OR", "value": admin_or_conditions}
-                    ]
-                    query_operator = "AND"
-                else:
-                    # Too many admins - split into multiple queries
-                    self.log_queue.put(f"Splitting {num_admins} admins into batches of {MAX_OR_CONDITIONS}...")
-                    all_results = []
-                    for i in range(0, num_admins, MAX_OR_CONDITIONS):
-                        batch = team_admin_ids[i:i + MAX_OR_CONDITIONS]
-                        self.log_queue.put(f"Processing batch {i//MAX_OR_CONDITIONS + 1} with {len(batch)} admins...")
-                        
-                        admin_or_conditions = []
-                        for aid in batch:
-                            admin_or_conditions.append({"field": "admin_assignee_id", "operator": "=", "value": aid})
-                        
-                        query_filters = [
-                            {"operator": "AND", "value": base_filters},
-                            {"operator": "OR", "value": admin_or_conditions}
-                        ]
-                        query_operator = "AND"
-                        batch_payload = {
-                            "query": {"operator": query_operator, "value": query_filters},
-                            "pagination": {"per_page": 42}
-                        }
-                        
-                        # Process this batch
-                        batch_results = self._process_query_batch(intercom_url, intercom_headers, batch_payload, i//MAX_OR_CONDITIONS + 1)
-                        all_results.extend(batch_results)
-                    
-                    # Combine all results
-                    self.final_report_data.extend(all_results)
-                    self.total_found = len(all_results)
-                    self.log_queue.put(f"\n✅ Fetch complete. Found {len(all_results)} total remarks across all batches.")
-                    if len(all_results) > 50:
-                        self.log_queue.put("(That's a lot of feedback to hunt through!)")
-                    self.log_queue.put(("TRIGGER_ENABLE_EXPORT", len(all_results)))
-                    self.log_queue.put(("DONE", len(all_results)))
-                    return
-        elif admin_id:
-            # No team selected, just filter by admin
-            admin_filter = {"field": "admin_assignee_id", "operator": "=", "value": admin_id}
-            query_filters = base_filters + [admin_filter]
-            query_operator = "AND"
+    def refresh_resume_button(self):
+        """Enable the resume button when an interrupted run has a checkpoint"""
+        interrupted = self.checkpoint_store.list_interrupted()
+        if interrupted:
+            self.resume_button.config(text=f"Resume: {interrupted[0]['query']['label']} ({interrupted[0]['records_count']} saved)",
+                                      state='normal')
         else:
-            # No filters (shouldn't happen due to validation, but handle it)
-            query_filters = base_filters
-            query_operator = "AND"
-        
-        # Only build payload if we haven't already handled team splitting
-        if team_id and len(self.team_admins_map.get(team_id, [])) > 15:
-            # Already handled in the team splitting logic above
+            self.resume_button.config(text="Resume Interrupted Run", state='disabled')
+    
+    def start_resume_thread(self):
+        if self.fetch_in_progress():
+            messagebox.showinfo("Fetch Running", "A fetch is already running. Cancel it or wait for it to finish.")
             return
-        
-        payload = {
-            "query": { "operator": query_operator, "value": query_filters},
-            "pagination": {"per_page": 42}
-        }
-        
-        # Build log message
-        search_info = []
-        if team_id:
-            team_name = [name for name, tid in self.team_map.items() if tid == team_id]
-            search_info.append(f"team: {team_name[0] if team_name else team_id}")
-        if admin_id:
-            admin_name = [name for name, aid in self.admin_map.items() if aid == admin_id]
-            search_info.append(f"admin: {admin_name[0] if admin_name else admin_id}")
-        search_str = ", ".join(search_info) if search_info else "all conversations"
-        self.log_queue.put(f"Fetching remarks for {search_str} from {start_date_str} to {end_date_str}...")
-        
-        # Process the query
-        self._run_single_query(intercom_url, intercom_headers, payload, start_date_str, end_date_str)
+        token = self.token_entry.get()
+        if not token:
+            messagebox.showerror("Error", "Please enter an Intercom Token.")
+            return
+        interrupted = self.checkpoint_store.list_interrupted()
+        if not interrupted:
+            self.refresh_resume_button()
+            return
+        query = interrupted[0]["query"]
+        self.start_date_picker.set_date(query["start_date"])
+        self.end_date_picker.set_date(query["end_date"])
+        self.reset_run_state("Resuming interrupted run...")
+        self.start_fetch((token, query["admin_id"], query["start_date"], query["end_date"], query["team_id"], query))
     
-    def _run_single_query(self, intercom_url, intercom_headers, payload, start_date_str, end_date_str):
-        """Process a single query with pagination"""
-        page = 1
-        is_first_page = True
-        while True:
-            try:
-                self.log_queue.put(f"📄 Fetching page {page}...")
-                self.log_queue.put(("CURRENT_ACTIVITY", f"📄 Fetching page {page}..."))
-                response = requests.post(intercom_url, headers=intercom_headers, data=json.dumps(payload))
-                response.raise_for_status()
-                data = response.json()
-                
-                if is_first_page:
-                    page_1_end_time = time.monotonic()
-                    self.time_per_page = page_1_end_time - self.start_time
-                    total_convos = data.get('total_count', 0)
-                    total_pages = data.get('pages', {}).get('total_pages', 1)
-                    initial_etr = self.time_per_page * (total_pages - 1)
-                    self.log_queue.put(f"📊 Found {total_convos} total conversations across {total_pages} pages")
-                    self.log_queue.put(("STATS_INIT", total_convos, total_pages, initial_etr))
-                    self.log_queue.put(("CURRENT_ACTIVITY", f"📊 Found {total_convos} total conversations across {total_pages} pages"))
-                    is_first_page = False
-                
-                conversations = data.get("conversations", [])
-                if not conversations:
-                    self.log_queue.put("No more conversations found.")
-                    break
-                
-                self.log_queue.put(f"📦 Processing {len(conversations)} conversations from page {page}...")
-                self.log_queue.put(("CURRENT_ACTIVITY", f"📦 Processing {len(conversations)} conversations from page {page}..."))
-                self.log_queue.put(("CURRENT_PAGE_INFO", f"Processing {len(conversations)} conversations..."))
-                found_on_page = 0
-                processed_count = 0
-                
-                for idx, convo in enumerate(conversations, 1):
-                    processed_count += 1
-                    convo_id = convo.get('id', 'Unknown')
-                    convo_date = convo.get('created_at', 0)
-                    readable_date = datetime.fromtimestamp(convo_date).strftime('%Y-%m-%d %H:%M') if convo_date else 'N/A'
-                    
-                    # Check if conversation has a rating with remark
-                    if (convo.get("conversation_rating") and convo["conversation_rating"].get("remark") is not None):
-                        remark = convo['conversation_rating'].get('remark')
-                        rating = convo['conversation_rating'].get('rating', 'N/A')
-                        
-                        self.log_queue.put(f"  ✓ Conversation {idx}/{len(conversations)} (ID: {convo_id[:8]}...): Rating {rating}, Date: {readable_date}")
-                        self.log_queue.put(f"    Processing remark: {remark[:80]}{'...' if len(remark) > 80 else ''}")
-                        
-                        # Translate if needed
-                        translated_remark = self.translate_if_non_english(remark)
-                        if translated_remark != remark:
-                            self.log_queue.put(f"    ✓ Translated to English")
-                        
-                        report_item = {
-                            "id": convo_id,
-                            "rating": rating,
-                            "date": convo_date,
-                            "remark": remark
-                        }
-                        # Only store translated_remark if it's actually different
-                        if translated_remark != remark:
-                            report_item["translated_remark"] = translated_remark
-                        self.final_report_data.append(report_item)
-                        found_on_page += 1
-                    else:
-                        self.log_queue.put(f"  ○ Conversation {idx}/{len(conversations)} (ID: {convo_id[:8]}...): No remark found")
-                
-                self.log_queue.put(f"✅ Page {page} complete: Found {found_on_page} remarks out of {len(conversations)} conversations")
-                self.log_queue.put(("CURRENT_ACTIVITY", f"✅ Page {page} complete: {found_on_page} remarks found"))
-                self.log_queue.put(("CURRENT_PAGE_INFO", f"Page {page}: {found_on_page} remarks found out of {len(conversations)} conversations"))
-                self.log_queue.put(("PAGE_UPDATE", page, found_on_page))
-                
-                # Check for next page
-                pages_data = data.get("pages", {})
-                if pages_data.get("next"):
-                    next_cursor = pages_data["next"].get("starting_after")
-                    if next_cursor:
-                        payload["pagination"] = {"per_page": 42, "starting_after": next_cursor}
-                        page += 1
-                    else:
-                        break
-                else:
-                    break
-            except requests.exceptions.RequestException as e:
-                error_msg = f"!!! INTERCOM API ERROR: {e}"
-                self.log_queue.put(error_msg)
-                if hasattr(e, 'response') and e.response is not None:
-                    try:
-                        error_details = e.response.json()
-                        self.log_queue.put(f"Error response: {json.dumps(error_details, indent=2)}")
-                    except:
-                        self.log_queue.put(f"Error details: {e.response.text}")
-                    self.log_queue.put(f"Request payload was: {json.dumps(payload, indent=2)}")
-                self.log_queue.put(("DONE", 0))
-                return
-        if not self.final_report_data:
-            self.log_queue.put("No remarks found for this query.")
-            self.log_queue.put("(Maybe try a different date range?)")
+    async def run_api_script(self, intercom_token, admin_id, start_date_str, end_date_str, team_id=None, resume_query=None,
+                             ratings=None, max_results=None):
+        if resume_query:
+            # Resume exactly the run that was interrupted, including its team roster
+            query = resume_query
         else:
-            self.log_queue.put(f"\n✅ Fetch complete. Found {self.total_found} total remarks.")
-            if self.total_found > 100:
-                self.log_queue.put("(Solid catch!)")
-            self.log_queue.put(("TRIGGER_ENABLE_EXPORT", self.total_found))
-        self.log_queue.put(("DONE", self.total_found))
-    
-    def _process_query_batch(self, intercom_url, intercom_headers, payload, batch_num):
-        """Process a single batch query and return results"""
-        batch_results = []
-        page = 1
-        
-        while True:
-            try:
-                self.log_queue.put(f"📄 Batch {batch_num} - Fetching page {page}...")
-                response = requests.post(intercom_url, headers=intercom_headers, data=json.dumps(payload))
-                response.raise_for_status()
-                data = response.json()
-                
-                conversations = data.get("conversations", [])
-                if not conversations:
-                    break
-                
-                self.log_queue.put(f"📦 Batch {batch_num} - Processing {len(conversations)} conversations from page {page}...")
-                
-                for idx, convo in enumerate(conversations, 1):
-                    convo_id = convo.get('id', 'Unknown')
-                    convo_date = convo.get('created_at', 0)
-                    readable_date = datetime.fromtimestamp(convo_date).strftime('%Y-%m-%d %H:%M') if convo_date else 'N/A'
-                    
-                    if (convo.get("conversation_rating") and convo["conversation_rating"].get("remark") is not None):
-                        remark = convo['conversation_rating'].get('remark')
-                        rating = convo['conversation_rating'].get('rating', 'N/A')
-                        
-                        self.log_queue.put(f"  ✓ Batch {batch_num} - Conversation {idx}/{len(conversations)} (ID: {convo_id[:8]}...): Rating {rating}")
-                        
-                        translated_remark = self.translate_if_non_english(remark)
-                        
-                        report_item = {
-                            "id": convo_id,
-                            "rating": rating,
-                            "date": convo_date,
-                            "remark": remark
-                        }
-                        # Only store translated_remark if it's actually different
-                        if translated_remark != remark:
-                            report_item["translated_remark"] = translated_remark
-                        batch_results.append(report_item)
-                
-                pages_data = data.get("pages", {})
-                if pages_data.get("next"):
-                    next_cursor = pages_data["next"].get("starting_after")
-                    if next_cursor:
-                        payload["pagination"] = {"per_page": 42, "starting_after": next_cursor}
-                        page += 1
-                    else:
-                        break
-                else:
-                    break
-            except requests.exceptions.RequestException as e:
-                error_msg = f"!!! INTERCOM API ERROR in batch {batch_num}: {e}"
-                self.log_queue.put(error_msg)
-                if hasattr(e, 'response') and e.response is not None:
-                    try:
-                        error_details = e.response.json()
-                        self.log_queue.put(f"Error response: {json.dumps(error_details, indent=2)}")
-                    except:
-                        self.log_queue.put(f"Error details: {e.response.text}")
-                break
-        
-        self.log_queue.put(f"✅ Batch {batch_num} complete: Found {len(batch_results)} remarks")
-        return batch_results
-    
-    def translate_if_non_english(self, text):
-        if not text:
-            return text
+            team_admin_ids = self.team_admins_map.get(team_id, []) if team_id else []
+            search_info = [name for name, tid in self.team_map.items() if tid == team_id][:1]
+            search_info += [name for name, aid in self.admin_map.items() if aid == admin_id][:1]
+            if ratings:
+                search_info.append(describe_ratings(ratings))
+            if max_results:
+                search_info.append(f"first {max_results}")
+            query = make_run_query(user_key_for_token(intercom_token), admin_id, team_id,
+                                   start_date_str, end_date_str, team_admin_ids,
+                                   label=f"{', '.join(search_info)} from {start_date_str} to {end_date_str}",
+                                   ratings=ratings, max_results=max_results)
+        checkpoint = self.checkpoint_store.open(query, resume=resume_query is not None)
+        started_at = time.time()
+        team_admins_map = {query["team_id"]: checkpoint.query["team_admin_ids"]} if query["team_id"] else {}
+        
+        engine = AsyncFetchEngine(intercom_token, self.log_queue.put,
+                                  translations_cache=self.translations_cache,
+                                  results=self.final_report_data,
+                                  per_page=42,
+                                  scheduler=self.request_scheduler,
+                                  user_key=query["user_key"],
+                                  checkpoint=checkpoint,
+                                  hedge=os.environ.get("FDBK_HEDGE_REQUESTS") == "1",
+                                  cancel_token=self.cancel_token,
+                                  trend_store=self.trend_store)
         try:
-            # Check if already translated
-            if text in self.translations_cache:
-                return self.translations_cache[text]
-            # Translate (deep-translator auto-detects language and only translates if needed)
-            translated = self.translator.translate(text)
-            # If translation is the same as original, it's likely already English
-            if translated.lower() == text.lower():
-                self.translations_cache[text] = text
-                return text
-            self.translations_cache[text] = translated
-            # Log translation (this will be queued and processed by the main thread)
-            self.log_queue.put(f"    🌐 Translation: {translated[:60]}{'...' if len(translated) > 60 else ''}")
-            return translated
-        except Exception as e:
-            self.log_queue.put(f"    ⚠️ Translation error: {e}")
-            return text
+            await engine.run_api_search_async(query["admin_id"], query["start_date"], query["end_date"], query["team_id"],
+                                              self.admin_map, self.team_map, team_admins_map,
+                                              ratings=query.get("ratings"), max_results=query.get("max_results"))
+        finally:
+            checkpoint.release()
+        
+        total_found = len(self.final_report_data)
+        if engine.interrupted or engine.cancelled:
+            self.log_queue.put(("RUN_INTERRUPTED", total_found))
+        else:
+            self.last_fetch = {"query": query, "since": started_at}
+            if total_found:
+                self.log_queue.put(("TRIGGER_ENABLE_EXPORT", total_found))
+        self.log_queue.put(("DONE", total_found))
     
     def save_report_to_file(self):
         if not self.final_report_data:
@@ -1130,7 +1347,7 @@ class ModernIntercomApp:
             return
         try:
             with open(file_path, "w", encoding="utf-8", newline='') as f:
-                headers = ["ID", "Rating", "Date", "Remark", "Translated Remark"]
+                headers = ["ID", "Rating", "Date", "Remark", "Translated Remark", "Admin ID", "Team ID", "Cluster ID"]
                 writer = csv.DictWriter(f, fieldnames=headers)
                 writer.writeheader()
                 for item in self.final_report_data:
@@ -1140,7 +1357,10 @@ class ModernIntercomApp:
                         "Rating": item['rating'],
                         "Date": readable_date,
                         "Remark": item['remark'],
-                        "Translated Remark": item.get('translated_remark', '')
+                        "Translated Remark": item.get('translated_remark', ''),
+                        "Admin ID": item.get('admin_assignee_id') or '',
+                        "Team ID": item.get('team_assignee_id') or '',
+                        "Cluster ID": item.get('cluster_id', '')
                     }
                     writer.writerow(row)
             self.log_message(f"\n✅ Report successfully saved to:\n{file_path}")
@@ -1180,110 +1400,312 @@ class ModernIntercomApp:
     
     def run_ai_analysis(self):
         try:
-            remarks = [item.get('translated_remark', item['remark']) for item in self.final_report_data]
-            prompt = f"Analyze the following customer feedback remarks from Intercom for sentiment, common themes, and actionable insights. Provide a summary with bullet points.\n\nFeedback:\n" + "\n".join(remarks)
-            openai.api_key = self.openai_api_key
-            response = openai.Completion.create(
-                engine="text-davinci-003",
-                prompt=prompt,
-                max_tokens=500,
-                temperature=0.7
-            )
-            analysis_text = response.choices[0].text.strip()
-            self.ai_insights = {"summary": analysis_text}
+            # Oldest first, so overlapping reports chunk alike and reuse cached chunk answers
+            ordered = sorted(self.final_report_data, key=lambda item: (item['date'] or 0, item['id']))
+            # One line per near-duplicate cluster, weighted by its size
+            remarks = weighted_lines(weighted_remarks(ordered))
+            # Chunked map-reduce, so big reports neither overflow the context nor get truncated
+            pipeline = AnalysisPipeline(backend_from_env(self.openai_api_key), self.log_queue.put,
+                                        cache=self.ai_cache)
+            analysis_text = pipeline.analyze(remarks)
+            self.ai_insights["summary"] = analysis_text
             self.log_queue.put(("AI_ANALYSIS_DONE", analysis_text))
-            
-            # Simple sentiment calculation (placeholder for more advanced analysis)
-            positive_count = sum(1 for item in self.final_report_data if item['rating'] >= 4)
-            negative_count = sum(1 for item in self.final_report_data if item['rating'] <= 2)
-            neutral_count = sum(1 for item in self.final_report_data if item['rating'] == 3)
-            total = len(self.final_report_data)
-            sentiment_summary = f"Positive: {positive_count} ({positive_count/total*100:.1f}%) | Neutral: {neutral_count} ({neutral_count/total*100:.1f}%) | Negative: {negative_count} ({negative_count/total*100:.1f}%)"
-            self.log_queue.put(("SENTIMENT_SUMMARY", sentiment_summary))
         except Exception as e:
             self.log_queue.put(f"!!! AI ANALYSIS ERROR: {e}")
             self.log_queue.put(("AI_ANALYSIS_FAILED",))
     
-    def process_queue(self):
+    def start_trend(self):
+        if self.fetch_in_progress():
+            messagebox.showinfo("Fetch Running", "A fetch is already running. Cancel it or wait for it to finish.")
+            return
+        form = self.read_fetch_form()
+        if form is None:
+            return
+        token, admin_id, _, _, team_id = form
+        days = int(self.trend_range_var.get().split()[1])
+        end_date_str = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        start_date_str = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        self.cancel_token = CancelToken()
+        self.cancel_button.config(text="Cancel Trend Backfill", state='normal')
+        self.trend_button.config(text="Loading Trend...", state='disabled')
+        self.fetch_future = self.fetch_loop.submit(self.run_trend(token, admin_id, team_id, start_date_str, end_date_str,
+                                                                  self.trend_freq_var.get()[0]))
+    
+    def emit_log_only(self, message):
+        """Emit for side runs (trend backfills): their log lines, but not the progress, rollups or results of a fetch"""
+        if isinstance(message, str):
+            self.log_queue.put(message)
+    
+    async def run_trend(self, intercom_token, admin_id, team_id, start_date_str, end_date_str, freq):
+        """Fetch (ratings only) the days the trend store is missing, then read the trend from it"""
         try:
-            message = self.log_queue.get_nowait()
-            if isinstance(message, tuple):
-                msg_type = message[0]
-                if msg_type == "ADMIN_LIST_DONE":
-                    self.admin_map = message[1]
-                    if len(message) > 2:
-                        self.team_map = message[2]
-                    if len(message) > 3:
-                        self.team_admins_map = message[3]
-                    self.populate_admin_dropdown()
-                elif msg_type == "ADMIN_LOAD_FAILED":
-                    self.log_message("Failed to load teammates. Check token and permissions.")
-                    self.status_label.config(text="Failed to load teammates.")
-                    self.load_teammates_button.config(text="Load Teammates", state="normal")
-                    self.stop_loading()
-                elif msg_type == "STATS_INIT":
-                    self.total_conversations, self.total_pages, etr = message[1], message[2], message[3]
-                    self.progressbar['maximum'] = self.total_conversations
-                    self.scanned_label.config(text=f"Scanned: 0 / {self.total_conversations} conversations")
-                    self.page_label.config(text=f"Page: 0 / {self.total_pages}")
-                    self.etr_label.config(text=f"ETR: {etr:.0f} seconds")
-                elif msg_type == "CURRENT_ACTIVITY":
-                    activity_text = message[1]
-                    self.current_activity_label.config(text=f"Status: {activity_text}")
-                elif msg_type == "CURRENT_PAGE_INFO":
-                    page_info = message[1]
-                    self.current_page_info_label.config(text=f"Current page: {page_info}")
-                elif msg_type == "PAGE_UPDATE":
-                    page_num, found_on_page = message[1], message[2]
-                    self.total_found += found_on_page
-                    scanned_so_far = min(page_num * 42, self.total_conversations)
-                    remaining_pages = self.total_pages - page_num
-                    new_etr = self.time_per_page * remaining_pages
-                    self.progressbar['value'] = scanned_so_far
-                    self.scanned_label.config(text=f"Scanned: {scanned_so_far} / {self.total_conversations} conversations")
-                    self.page_label.config(text=f"Page: {page_num} / {self.total_pages}")
-                    self.found_label.config(text=f"Remarks found: {self.total_found}")
-                    self.etr_label.config(text=f"ETR: {new_etr:.0f} seconds")
-                    # Don't duplicate log message here as it's already logged in the thread
-                elif msg_type == "TRIGGER_ENABLE_EXPORT":
-                    self.status_label.config(text="Fetch complete. Ready to export.")
-                    self.action_button.config(text="Fetch Report Data", state='normal')
-                    self.progressbar['value'] = self.total_conversations
-                    self.etr_label.config(text="ETR: 0 seconds")
-                    self.save_csv_button.config(state='normal')
-                    self.copy_ai_button.config(state='normal')
-                    self.analyze_button.config(state='normal')
-                    self.stop_loading()
-                elif msg_type == "DONE":
-                    total_count = message[1]
-                    self.status_label.config(text=f"Process Complete. Found {total_count} remarks.")
-                    self.action_button.config(text="Fetch Report Data", state='normal')
-                    self.etr_label.config(text="ETR: 0 seconds")
-                    if self.total_conversations > 0:
-                        self.progressbar['value'] = self.total_conversations
-                    self.stop_loading()
-                elif msg_type == "AI_ANALYSIS_DONE":
-                    analysis_text = message[1]
-                    self.ai_result_text.configure(state='normal')
-                    self.ai_result_text.delete('1.0', 'end')
-                    self.ai_result_text.insert('end', analysis_text)
-                    self.ai_result_text.configure(state='disabled')
-                    self.log_message("✅ AI analysis complete.")
-                    self.analyze_button.config(text="Analyze Feedback with AI", state='normal')
-                    self.status_label.config(text="AI analysis complete.")
-                elif msg_type == "SENTIMENT_SUMMARY":
-                    summary = message[1]
-                    self.sentiment_label.config(text=summary)
-                elif msg_type == "AI_ANALYSIS_FAILED":
-                    self.log_message("Failed to run AI analysis. Check API key or connectivity.")
-                    self.analyze_button.config(text="Analyze Feedback with AI", state='normal')
-                    self.status_label.config(text="AI analysis failed.")
+            scope = trend_scope(user_key_for_token(intercom_token), admin_id, team_id)
+            missing = self.trend_store.missing_ranges(scope, start_date_str, end_date_str)
+            if missing:
+                self.log_queue.put(f"📈 Backfilling {len(missing)} missing stretch(es) of days for the trend...")
+            team_admins_map = {team_id: self.team_admins_map.get(team_id, [])} if team_id else {}
+            for range_start, range_end in missing:
+                engine = AsyncFetchEngine(intercom_token, self.emit_log_only,
+                                          per_page=42,
+                                          scheduler=self.request_scheduler,
+                                          user_key=user_key_for_token(intercom_token),
+                                          trend_store=self.trend_store,
+                                          cancel_token=self.cancel_token,
+                                          translate=False)
+                await engine.run_api_search_async(admin_id, range_start, range_end, team_id, {}, {}, team_admins_map)
+                if engine.interrupted or engine.cancelled:
+                    break
+            started = time.perf_counter()
+            trend = self.trend_store.trend(scope, start_date_str, end_date_str, freq=freq)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.log_queue.put(("TREND_DONE", trend, elapsed_ms, bool(self.trend_store.missing_ranges(scope, start_date_str, end_date_str))))
+        except Exception as e:
+            self.log_queue.put(f"!!! TREND ERROR: {e}")
+            self.log_queue.put(("TREND_DONE", None, 0, True))
+    
+    def start_sample(self):
+        if self.fetch_in_progress():
+            messagebox.showinfo("Fetch Running", "A fetch is already running. Cancel it or wait for it to finish.")
+            return
+        # No team or admin samples the whole workspace
+        form = self.read_fetch_form(require_scope=False)
+        if form is None:
+            return
+        self.sample_button.config(text="Sampling...", state='disabled')
+        self.refine_button.config(state='disabled')
+        self.status_label.config(text="Estimating from random time slices...")
+        self.submit_sample(*form)
+    
+    def start_refine(self):
+        if self.fetch_in_progress():
+            messagebox.showinfo("Fetch Running", "A fetch is already running. Cancel it or wait for it to finish.")
+            return
+        token = self.token_entry.get()
+        if not token or self.sample_state is None:
+            return
+        self.sample_button.config(state='disabled')
+        self.refine_button.config(text="Refining...", state='disabled')
+        self.status_label.config(text="Refining the estimate...")
+        self.submit_sample(token, state=self.sample_state)
+    
+    def submit_sample(self, *args, **kwargs):
+        """Run a sampling round under the single-run guard; refining until exact is a full crawl"""
+        self.cancel_token = CancelToken()
+        self.cancel_button.config(text="Cancel Sampling", state='normal')
+        self.fetch_future = self.fetch_loop.submit(asyncio.to_thread(self.run_sample, *args, **kwargs))
+    
+    def run_sample(self, intercom_token, admin_id=None, start_date_str=None, end_date_str=None, team_id=None, state=None):
+        """Estimate ratings from random time slices, or read another round of slices for an earlier estimate"""
+        estimate = None
+        try:
+            sampler = SampleEstimator(intercom_token, self.log_queue.put,
+                                      state=state,
+                                      scheduler=self.request_scheduler,
+                                      user_key=user_key_for_token(intercom_token),
+                                      cancel_token=self.cancel_token)
+            if state is None:
+                team_admins_map = {team_id: self.team_admins_map.get(team_id, [])} if team_id else {}
+                estimate = sampler.sample(admin_id, start_date_str, end_date_str, team_id, team_admins_map)
             else:
-                self.log_message(str(message))
+                estimate = sampler.refine()
+        except Exception as e:
+            self.log_queue.put(f"!!! SAMPLING ERROR: {e}")
+        finally:
+            self.log_queue.put(("SAMPLE_DONE", estimate))
+    
+    def show_sample_estimate(self, estimate):
+        self.sample_text.configure(state='normal')
+        self.sample_text.delete('1.0', 'end')
+        self.sample_text.insert('end', "\n".join(describe_estimate(estimate)))
+        self.sample_text.configure(state='disabled')
+    
+    def start_offline_insights(self):
+        """Themes and sentiment for the fetched remarks, computed locally in the background"""
+        if not self.final_report_data:
+            return
+        threading.Thread(target=self.run_offline_insights, args=(list(self.final_report_data),), daemon=True).start()
+    
+    def run_offline_insights(self, records):
+        try:
+            report = insights.analyze(records)
+            self.log_queue.put(("INSIGHTS_DONE", report))
+        except Exception as e:
+            self.log_queue.put(f"!!! OFFLINE INSIGHTS ERROR: {e}")
+    
+    def process_queue(self):
+        # Drain a batch per tick: one message per tick fell far behind busy fetches
+        deadline = time.perf_counter() + QUEUE_BATCH_SECONDS
+        handled = 0
+        try:
+            while handled < QUEUE_BATCH_MAX and time.perf_counter() < deadline:
+                message = self.log_queue.get_nowait()
+                started = time.perf_counter()
+                self.handle_queue_message(message)
+                self.ui_timings.record("ui_update", time.perf_counter() - started)
+                handled += 1
         except queue.Empty:
             pass
         self.root.after(100, self.process_queue)
     
+    def handle_queue_message(self, message):
+        if isinstance(message, tuple):
+            msg_type = message[0]
+            if msg_type == "ADMIN_LIST_DONE":
+                self.admin_map = message[1]
+                if len(message) > 2:
+                    self.team_map = message[2]
+                if len(message) > 3:
+                    self.team_admins_map = message[3]
+                self.populate_admin_dropdown()
+            elif msg_type == "ADMIN_LOAD_FAILED":
+                self.log_message("Failed to load teammates. Check token and permissions.")
+                self.status_label.config(text="Failed to load teammates.")
+                self.load_teammates_button.config(text="Load Teammates", state="normal")
+                self.stop_loading()
+            elif msg_type == "CURRENT_ACTIVITY":
+                activity_text = message[1]
+                self.current_activity_label.config(text=f"Status: {activity_text}")
+            elif msg_type == "CURRENT_PAGE_INFO":
+                page_info = message[1]
+                self.current_page_info_label.config(text=f"Current page: {page_info}")
+            elif msg_type == "PROGRESS_UPDATE":
+                # Aggregated over every batch by the engine's ProgressModel
+                progress = message[1]
+                approx = "~" if progress["estimated"] else ""
+                # Index each page's remarks as they arrive so searching never waits on a full build
+                self.search_index.sync(self.final_report_data)
+                self.total_conversations = progress["total"]
+                self.total_found = progress["found"]
+                # The fraction also accounts for a max-results limit, which can end the run before the total
+                self.progressbar['maximum'] = max(progress["total"], 1)
+                self.progressbar['value'] = progress["fraction"] * max(progress["total"], 1)
+                self.scanned_label.config(text=f"Scanned: {progress['scanned']} / {approx}{progress['total']} conversations"
+                                               + (f" ({progress['rate']:.1f}/s)" if progress["rate"] else ""))
+                self.page_label.config(text=f"Page: {progress['pages']} / {approx}{progress['total_pages']}")
+                self.found_label.config(text=f"Remarks found: {self.total_found}")
+                etr = f"ETR: {format_duration(progress['etr'])}" if progress["etr"] is not None else "ETR: Calculating..."
+                if progress["translation_backlog"]:
+                    etr += f" ({progress['translation_backlog']} translations queued)"
+                self.etr_label.config(text=etr)
+            elif msg_type == "RESUMED":
+                self.total_found = message[1]
+                self.found_label.config(text=f"Remarks found: {self.total_found}")
+            elif msg_type == "RUN_INTERRUPTED":
+                self.log_message(f"⚠️ Run interrupted with {message[1]} remarks collected. Click Resume to continue.")
+                if message[1]:
+                    self.save_csv_button.config(state='normal')
+                    self.copy_ai_button.config(state='normal')
+                    self.analyze_button.config(state='normal')
+            elif msg_type == "TRIGGER_ENABLE_EXPORT":
+                self.status_label.config(text="Fetch complete. Ready to export.")
+                self.action_button.config(text="Fetch Report Data", state='normal')
+                self.progressbar['value'] = self.progressbar['maximum']
+                self.etr_label.config(text="ETR: 0s")
+                self.save_csv_button.config(state='normal')
+                self.copy_ai_button.config(state='normal')
+                self.analyze_button.config(state='normal')
+                self.stop_loading()
+            elif msg_type == "DONE":
+                total_count = message[1]
+                self.status_label.config(text=f"Process Complete. Found {total_count} remarks.")
+                self.action_button.config(text="Fetch Report Data", state='normal')
+                self.cancel_button.config(text="Cancel Fetch", state='disabled')
+                self.watch_button.config(text="Watch for New Remarks", state='normal' if self.last_fetch else 'disabled')
+                self.refresh_resume_button()
+                self.etr_label.config(text="ETR: 0s")
+                if self.total_conversations > 0:
+                    self.progressbar['value'] = self.progressbar['maximum']
+                self.stop_loading()
+                if total_count:
+                    self.start_offline_insights()
+            elif msg_type == "PREVIEW_DONE":
+                estimate = message[1]
+                self.preview_button.config(text="Preview Cost", state='normal')
+                if estimate is None:
+                    self.status_label.config(text="Preview failed. See the log for details.")
+                else:
+                    self.status_label.config(text=f"Preview: ~{estimate['conversations']} conversations, "
+                                                  f"~{format_duration(estimate['estimated_seconds'])}")
+                    messagebox.showinfo("Fetch Preview", "\n".join(describe_preview(estimate)))
+            elif msg_type == "RUN_SUMMARY":
+                self.show_stage_timings(message[1].get("stages", {}))
+            elif msg_type == "WATCH_UPDATE":
+                update = message[1]
+                self.search_index.sync(self.final_report_data)
+                self.found_label.config(text=f"Remarks found: {len(self.final_report_data)} ({update['arrivals']} new while watching)")
+                if update["source"] == "webhook":
+                    self.page_label.config(text=f"Webhooks: {update['deliveries']} (no search requests)")
+                else:
+                    self.page_label.config(text=f"Polls: {update['polls']} ({update['requests']} requests)")
+                if update["new"]:
+                    newest = update["new"][-1]
+                    remark = newest.get("translated_remark") or newest["remark"]
+                    self.current_page_info_label.config(text=f"Newest: {newest['rating']}★ {remark[:100]}")
+                    self.save_csv_button.config(state='normal')
+                    self.copy_ai_button.config(state='normal')
+                    self.analyze_button.config(state='normal')
+            elif msg_type == "LIVE_AGGREGATES":
+                self.live_label.config(text=format_live(message[1]))
+            elif msg_type == "TREND_DONE":
+                trend, elapsed_ms, incomplete = message[1], message[2], message[3]
+                self.trend_button.config(text="Show Trend", state='normal')
+                self.cancel_button.config(text="Cancel Fetch", state='disabled')
+                if trend is not None:
+                    text = format_trend(trend)
+                    if incomplete:
+                        text += "\n\nSome days are still missing; click Show Trend again to fetch them."
+                    self.trend_text.configure(state='normal')
+                    self.trend_text.delete('1.0', 'end')
+                    self.trend_text.insert('end', text)
+                    self.trend_text.configure(state='disabled')
+                    self.log_message(f"📈 Trend served from the trend store in {elapsed_ms:.0f} ms.")
+            elif msg_type == "SAMPLE_ESTIMATE":
+                self.show_sample_estimate(message[1])
+            elif msg_type == "SAMPLE_DONE":
+                estimate = message[1]
+                self.sample_button.config(text="Estimate by Sampling", state='normal')
+                self.cancel_button.config(text="Cancel Fetch", state='disabled')
+                self.refine_button.config(text="Refine Estimate")
+                if estimate is None:
+                    self.status_label.config(text="Sampling failed. See the log for details.")
+                    self.refine_button.config(state='normal' if self.sample_state is not None else 'disabled')
+                else:
+                    self.sample_state = estimate["state"]
+                    self.refine_button.config(state='disabled' if estimate["exact"] else 'normal')
+                    self.status_label.config(text=f"Estimate ready: {estimate['fraction_read']:.1%} of the data read.")
+                    self.show_sample_estimate(estimate)
+            elif msg_type == "ROLLUPS":
+                self.rollups = message[1]
+                self.scorecards_text.configure(state='normal')
+                self.scorecards_text.delete('1.0', 'end')
+                self.scorecards_text.insert('end', rollups.format_scorecards(
+                    self.rollups, rollups.name_lookup(self.admin_map), rollups.name_lookup(self.team_map)))
+                self.scorecards_text.configure(state='disabled')
+            elif msg_type == "AI_ANALYSIS_DONE":
+                analysis_text = message[1]
+                self.ai_result_text.configure(state='normal')
+                self.ai_result_text.delete('1.0', 'end')
+                self.ai_result_text.insert('end', analysis_text)
+                self.ai_result_text.configure(state='disabled')
+                self.log_message("✅ AI analysis complete.")
+                self.analyze_button.config(text="Analyze Feedback with AI", state='normal')
+                self.status_label.config(text="AI analysis complete.")
+            elif msg_type == "INSIGHTS_DONE":
+                report = message[1]
+                self.ai_insights["themes"] = report["themes"]
+                self.themes_text.configure(state='normal')
+                self.themes_text.delete('1.0', 'end')
+                self.themes_text.insert('end', insights.format_report(report))
+                self.themes_text.configure(state='disabled')
+                self.sentiment_label.config(text=insights.sentiment_summary(report))
+                self.log_message(f"🧩 Found {len(report['themes'])} theme{'s' if len(report['themes']) != 1 else ''} in {report['remarks']} remarks ({report['seconds']:.1f}s, offline).")
+            elif msg_type == "AI_ANALYSIS_FAILED":
+                self.log_message("Failed to run AI analysis. Check API key or connectivity.")
+                self.analyze_button.config(text="Analyze Feedback with AI", state='normal')
+                self.status_label.config(text="AI analysis failed.")
+        else:
+            self.log_message(str(message))
+    
     def start_loading(self):
         """Start the loading animation"""
         self.loading_active = True